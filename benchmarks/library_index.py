@@ -0,0 +1,79 @@
+# Micro-benchmark of `scidock open` lookups: full WRatio scan over the titles vs. the persisted n-gram index
+# Usage: python benchmarks/library_index.py [--papers N] [--repeat N]
+
+import argparse
+import json
+import random
+import tempfile
+import timeit
+from pathlib import Path
+
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from scidock.library import FUZZY_MATCH_RATE, LibraryEntry, load_entries
+from scidock.library_index import load_index, search_indexes
+
+WORDS = ('neural', 'network', 'quantum', 'graph', 'learning', 'deep', 'stochastic', 'optimization', 'protein', 'folding', 'language',
+         'model', 'transformer', 'attention', 'gradient', 'descent', 'bayesian', 'inference', 'sparse', 'representation', 'topological',
+         'insulator', 'reinforcement', 'policy', 'molecular', 'dynamics', 'convex', 'estimation', 'robust', 'adversarial', 'diffusion',
+         'kernel', 'spectral', 'clustering', 'causal', 'discovery', 'federated', 'privacy', 'entropy', 'manifold')
+
+
+def rank_entries(query: str, entries: list[LibraryEntry]) -> list[tuple[LibraryEntry, float]]:
+    # the lookup `scidock open` used to do before the index: WRatio against every title of the library
+    # noinspection PyTypeChecker
+    title_matches = process.extract(query, [entry.title for entry in entries], scorer=fuzz.WRatio, score_cutoff=FUZZY_MATCH_RATE,
+                                    processor=default_process, limit=1)
+    return [(entries[index], score) for _, score, index in title_matches]
+
+
+def make_repository(repository_path: Path, papers: int) -> list[str]:
+    random.seed(0)
+    titles = [' '.join(random.choices(WORDS, k=random.randint(4, 12))).capitalize() + f' {index}' for index in range(papers)]
+
+    (repository_path / '.scidock').mkdir()
+    content = {'local': {f'10.1000/{index}.pdf': {'title': title, 'DOI': f'10.1000/{index}'} for index, title in enumerate(titles)},
+               'recent_searches': {}}
+    (repository_path / '.scidock' / 'content.json').write_text(json.dumps(content), encoding='utf-8')
+
+    return titles
+
+
+def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument('--papers', type=int, default=100_000)
+    argument_parser.add_argument('--repeat', type=int, default=20)
+    arguments = argument_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as repository_path:
+        titles = make_repository(Path(repository_path), arguments.papers)
+        queries = [titles[index].lower().replace('network', 'netwrk') for index in range(0, arguments.papers, arguments.papers // 10)]
+
+        build_time = timeit.timeit(lambda: load_index(repository_path), number=1)
+        print(f'index build: {build_time * 1000:.0f} ms for {arguments.papers} papers')
+
+        # every `scidock open` loads the library from scratch and answers a single query
+        def full_scan():
+            return [rank_entries(query, load_entries(repository_path)) for query in queries]
+
+        def indexed():
+            return [search_indexes(query, None, [load_index(repository_path)]) for query in queries]
+
+        def indexed_query():
+            return [search_indexes(query, None, indexes) for query in queries]
+
+        indexes = [load_index(repository_path)]
+        if [match[0][0].filename for match in full_scan()] != [match[0][0].filename for match in indexed()]:
+            raise SystemExit('The index and the full scan disagree on the best matches')
+
+        load_time = timeit.timeit(lambda: load_index(repository_path), number=arguments.repeat) / arguments.repeat
+        print(f'index load: {load_time * 1000:.1f} ms')
+
+        for name, function in (('full scan', full_scan), ('index (load + query)', indexed), ('index (query only)', indexed_query)):
+            elapsed = timeit.timeit(function, number=arguments.repeat) / arguments.repeat / len(queries)
+            print(f'{name}: {elapsed * 1000:.1f} ms per query')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Micro-benchmark of the mirror preview parsing: full parse of the whole page vs. streamed, strainer-restricted parse
+# Usage: python benchmarks/mirror_parsing.py [--repeat N]
+#
+# The pages are SYNTHETIC, not captures of real mirrors: the elements SciDock reads are surrounded by filler scripts and
+# "related" blocks. The speed-up of the partial parse depends almost entirely on how much of the page follows these elements,
+# so the numbers only show the mechanism. Each page is therefore also measured with the filler stripped ("bare"),
+# which is the lower bound of the gain.
+
+import argparse
+import io
+import re
+import timeit
+from pathlib import Path
+
+import requests
+from bs4 import BeautifulSoup
+
+from scidock.search_engines.scihub_engine import SCIDB_LAYOUT, SCIHUB_LAYOUT, parse_preview, parse_scidb, parse_scihub
+
+PAGES_PATH = Path(__file__).parent / 'pages'
+DOI = '10.1000/benchmark'
+FILLER_PATTERN = re.compile(rb'<script>var config\d+ = .*?</script>\n|<div class="related">.*?</div>\n')
+
+
+def make_response(content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.raw = io.BytesIO(content)
+    response.encoding = 'utf-8'
+    response.status_code = 200
+    return response
+
+
+def full_parse(content: bytes, parser) -> tuple:
+    return parser(BeautifulSoup(make_response(content).text, 'html.parser'))
+
+
+def partial_parse(content: bytes, parser, layout) -> tuple:
+    soup, _ = parse_preview(make_response(content), layout)
+    return parser(soup)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument('--repeat', type=int, default=200)
+    arguments = argument_parser.parse_args()
+
+    cases = {
+        'synthetic_scihub_preview.html': (lambda soup: parse_scihub(soup, DOI, 'https://sci-hub.ru'), SCIHUB_LAYOUT),
+        'synthetic_scidb_preview.html': (lambda soup: parse_scidb(soup, DOI), SCIDB_LAYOUT),
+    }
+
+    for page_name, (parser, layout) in cases.items():
+        page = (PAGES_PATH / page_name).read_bytes()
+
+        for variant, content in (('padded', page), ('bare', FILLER_PATTERN.sub(b'', page))):
+            assert full_parse(content, parser) == partial_parse(content, parser, layout), f'Parsing results differ for {page_name}'  # noqa: S101
+
+            full_time = timeit.timeit(lambda: full_parse(content, parser), number=arguments.repeat) / arguments.repeat  # noqa: B023
+            partial_time = timeit.timeit(lambda: partial_parse(content, parser, layout), number=arguments.repeat) / arguments.repeat  # noqa: B023
+
+            print(f'{page_name}, {variant} ({len(content) / 1024:.1f} KB): full parse {full_time * 1000:.2f} ms, '
+                  f'partial parse {partial_time * 1000:.2f} ms ({full_time / partial_time:.1f}x)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# Micro-benchmark of ID extraction from large pasted reference lists: per-ID regex substitutions vs. the one-pass tokenizer
+# Usage: python benchmarks/query_parser.py [--references N] [--repeat N]
+
+import argparse
+import random
+import re
+import timeit
+
+from scidock.parsers import query_parser
+from scidock.parsers.query_parser import ARXIV_PATTERN, DOI_PATTERN, join_text, tokenize_query
+
+WORDS = ('neural', 'network', 'quantum', 'graph', 'learning', 'deep', 'stochastic', 'optimization', 'protein', 'folding', 'language',
+         'model', 'transformer', 'attention', 'gradient', 'descent', 'bayesian', 'inference', 'sparse', 'representation')
+
+
+def make_references(references: int) -> str:
+    random.seed(0)
+    lines = []
+    for index in range(references):
+        title = ' '.join(random.choices(WORDS, k=random.randint(5, 12))).capitalize()
+        line = f'[{index + 1}] A. Author, B. Author. {title}. Journal of Things {random.randint(1, 99)}, {2000 + index % 24}. '
+        if index % 3:
+            line += f'doi: 10.{random.randint(1000, 9999)}/j.things.{2000 + index % 24}.{index:05d}'
+        else:
+            line += f'arXiv.{random.randint(1000, 2499)}.{random.randint(10000, 99999)}v{random.randint(1, 3)}'
+        lines.append(line)
+
+    return '\n'.join(lines)
+
+
+def legacy_clear_ids(query: str) -> tuple[list[str], list[str], str]:
+    # the implementation before the tokenizer, without the name removal (which requires the NLP server)
+    dois = re.findall(DOI_PATTERN, query)
+    for doi in dois:
+        query = re.sub(f' *{doi} *', ' ', query)
+
+    arxiv_ids = [match.group(0) for match in re.finditer(ARXIV_PATTERN, query)]
+    for arxiv_id in arxiv_ids:
+        query = re.sub(f' *{arxiv_id} *', ' ', query)
+
+    return dois, arxiv_ids, query
+
+
+def tokenized_clear_ids(query: str) -> tuple[list[str], list[str], str]:
+    # the cache of `tokenize_query` is bypassed, as every pasted block is different in practice
+    spans = tokenize_query.__wrapped__(query)
+    dois = [span.text for span in spans if span.kind == query_parser.DOI]
+    arxiv_ids = [span.text for span in spans if span.kind == query_parser.ARXIV_ID]
+
+    return dois, arxiv_ids, join_text(spans)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument('--references', type=int, default=1000)
+    argument_parser.add_argument('--repeat', type=int, default=3)
+    arguments = argument_parser.parse_args()
+
+    references = make_references(arguments.references)
+
+    legacy_result, tokenized_result = legacy_clear_ids(references), tokenized_clear_ids(references)
+    if legacy_result[:2] != tokenized_result[:2]:
+        raise SystemExit('The tokenizer and the legacy implementation disagree on the IDs')
+
+    print(f'{len(references) // 1024} KB of references, {len(tokenized_result[0])} DOIs, {len(tokenized_result[1])} arXiv IDs')
+
+    for name, function in (('legacy', legacy_clear_ids), ('tokenizer', tokenized_clear_ids)):
+        elapsed = timeit.timeit(lambda function=function: function(references), number=arguments.repeat) / arguments.repeat
+        print(f'{name}: {elapsed * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
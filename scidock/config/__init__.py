@@ -1,4 +1,5 @@
 import inspect
+import json
 import logging
 import sys
 from functools import cache
@@ -6,10 +7,20 @@ from pathlib import Path
 
 from loguru import logger
 
-__all__ = ('logger',)
+__all__ = ('load_config', 'logger')
 
 Path('~/.scidock/logs').expanduser().mkdir(parents=True, exist_ok=True)
 
+# records below these levels are dropped by the standard `logging` machinery before reaching `InterceptHandler`
+DEFAULT_LIBRARY_LEVELS = {
+    'urllib3': 'WARNING',
+    'requests': 'WARNING',
+    'charset_normalizer': 'WARNING',
+    'filelock': 'WARNING',
+    'arxiv': 'INFO',
+}
+DEFAULT_LOGGING_CONFIG = {'default_level': 'INFO', 'file_level': 'INFO', 'levels': {}, 'json': False}
+
 
 # source: https://loguru.readthedocs.io/en/stable/overview.html#entirely-compatible-with-standard-logging
 class InterceptHandler(logging.Handler):
@@ -30,15 +41,37 @@ class InterceptHandler(logging.Handler):
         logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
 
 
+def load_config() -> dict:
+    # `scidock.utils.load_json` cannot be used here, as the utilities themselves depend on the logger
+    try:
+        with open(Path('~/.scidock/config.json').expanduser(), encoding='utf-8') as config_file:
+            return json.load(config_file)
+    except (json.decoder.JSONDecodeError, FileNotFoundError):
+        return {}
+
+
+def load_logging_config() -> dict:
+    return DEFAULT_LOGGING_CONFIG | load_config().get('logging', {})
+
+
 @cache  # ensure that the function gets called only once
 def setup_logging():
+    logging_config = load_logging_config()
+
     logger.remove()
     logger.add(sys.stderr, level='WARNING', format='<level>{level}: {message}</level>')
-    logger.add(Path('~/.scidock/logs/scidock.log').expanduser(), level='DEBUG',
+    logger.add(Path('~/.scidock/logs/scidock.log').expanduser(), level=logging_config['file_level'],
                format='[{level}|{module}|L{line}] {time:DD.MM.YYYY HH:mm:ss}: {message}',
                rotation='10 MB', enqueue=True)
 
-    logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
+    if logging_config['json']:
+        logger.add(Path('~/.scidock/logs/scidock.jsonl').expanduser(), level=logging_config['file_level'],
+                   serialize=True, rotation='10 MB', enqueue=True)
+
+    logging.basicConfig(handlers=[InterceptHandler()], level=logging_config['default_level'], force=True)
+
+    for library, level in (DEFAULT_LIBRARY_LEVELS | logging_config['levels']).items():
+        logging.getLogger(library).setLevel(level)
 
 
 setup_logging()
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+
+__all__ = ('DeadlineExceededError', 'check_deadline', 'clamp_timeout', 'expired', 'remaining', 'set_deadline', 'share_budget',
+           'until_deadline')
+
+# every command runs in a process of its own, so a single budget is shared by all of its threads
+deadline: float | None = None
+local_deadlines = threading.local()
+
+Timeout = float | tuple[float | None, float | None] | None
+
+
+class DeadlineExceededError(Exception):
+    # deliberately not a `requests` exception: the handlers of failed sources must not mistake it for a missing copy
+    pass
+
+
+def set_deadline(budget: float | None):
+    # `None` lifts the limit
+    global deadline  # noqa: PLW0603 - the budget is process-wide on purpose
+    deadline = None if budget is None else time.monotonic() + budget
+
+
+def remaining() -> float | None:
+    deadlines = [value for value in (deadline, getattr(local_deadlines, 'deadline', None)) if value is not None]
+    if not deadlines:
+        return None
+
+    return max(min(deadlines) - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    return remaining() == 0.0
+
+
+def check_deadline():
+    if expired():
+        raise DeadlineExceededError('The time budget of the command has run out')
+
+
+def clamp_timeout(timeout: Timeout) -> Timeout:
+    # no single request may outlive the budget, be it the connection or a read
+    budget = remaining()
+    if budget is None:
+        return timeout
+
+    check_deadline()
+    if timeout is None:
+        return budget
+    if isinstance(timeout, tuple):
+        return tuple(budget if value is None else min(value, budget) for value in timeout)
+    return min(timeout, budget)
+
+
+@contextmanager
+def share_budget(share: float) -> Iterator[None]:
+    # the calling thread spends at most this share of the remaining budget, the rest is left for the following stages
+    budget = remaining()
+    previous_deadline = getattr(local_deadlines, 'deadline', None)
+    if budget is not None:
+        local_deadlines.deadline = time.monotonic() + budget * share
+
+    try:
+        yield
+    finally:
+        local_deadlines.deadline = previous_deadline
+
+
+def until_deadline(iterable: Iterable) -> Iterator:
+    # the rest of the items is not even requested once the budget has run out
+    iterator = iter(iterable)
+    while not expired():
+        try:
+            item = next(iterator)
+        except (StopIteration, DeadlineExceededError):
+            return
+        yield item
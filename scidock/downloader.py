@@ -0,0 +1,119 @@
+import time
+from typing import BinaryIO
+
+import requests
+import urllib3
+
+from scidock.config import logger
+from scidock.deadline import check_deadline, remaining
+from scidock.network import get_bandwidth_limiter
+from scidock.ui import progress_bar
+
+__all__ = ('stream_pdf',)
+
+KB = 1024
+MB = 1024 * KB
+
+# the PDF header has to appear within the first 1024 bytes of the file
+PDF_SIGNATURE = b'%PDF-'
+SIGNATURE_WINDOW = 1 * KB
+
+INITIAL_CHUNK_SIZE = 16 * KB
+MIN_CHUNK_SIZE = 8 * KB
+MAX_CHUNK_SIZE = 1 * MB
+# chunks are cut down to what is expected to arrive before the deadline, but not below this size
+MIN_DEADLINE_CHUNK_SIZE = 512
+
+# chunk size is adjusted so that reading a chunk takes roughly this long
+TARGET_CHUNK_DURATION = 0.25
+PROGRESS_UPDATE_INTERVAL = 0.2
+
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if size < KB:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= KB
+    return f'{size:.1f} GB'
+
+
+def adapt_chunk_size(chunk_size: int, chunk_duration: float) -> int:
+    if chunk_duration < TARGET_CHUNK_DURATION / 2:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    if chunk_duration > TARGET_CHUNK_DURATION * 2:
+        return max(chunk_size // 2, MIN_CHUNK_SIZE)
+    return chunk_size
+
+
+def fit_chunk_size(chunk_size: int, speed: float) -> int:
+    # a read only returns once the whole chunk has arrived, so a chunk must not outlast the remaining budget
+    budget = remaining()
+    if budget is None:
+        return chunk_size
+
+    check_deadline()
+    return max(min(chunk_size, int(speed * budget)), MIN_DEADLINE_CHUNK_SIZE)
+
+
+def read_head(response: requests.Response) -> bytes:
+    # a compressed read may decode to nothing (e.g. a long gzip header), which does not mean that the body has ended
+    head = b''
+    while len(head) < SIGNATURE_WINDOW and not response.raw.closed:
+        head += response.raw.read(SIGNATURE_WINDOW - len(head), decode_content=True)
+    return head
+
+
+def check_length(response: requests.Response):
+    # a dropped connection looks just like the end of the body, so the amount of bytes received is checked explicitly
+    expected_length = response.headers.get('Content-Length')
+    if expected_length is None or not expected_length.isdigit():
+        return
+
+    received_length = response.raw.tell()
+    if received_length < int(expected_length):
+        raise urllib3.exceptions.IncompleteRead(received_length, int(expected_length) - received_length)
+
+
+def stream_pdf(response: requests.Response, paper_file: BinaryIO) -> bool:
+    # returns False without reading the rest of the response if it does not start like a PDF
+    bandwidth_limiter = get_bandwidth_limiter()
+    start_time = last_update_time = time.monotonic()
+
+    head = read_head(response)
+    if PDF_SIGNATURE not in head:
+        logger.info(f'Download aborted as the response is not a PDF: {head[:64]!r}')
+        response.close()
+        return False
+
+    paper_file.write(head)
+
+    downloaded_size = len(head)
+    chunk_size = INITIAL_CHUNK_SIZE
+
+    while True:
+        read_size = fit_chunk_size(chunk_size, downloaded_size / max(time.monotonic() - start_time, 1e-6))
+        if bandwidth_limiter is not None:
+            bandwidth_limiter.acquire(read_size)
+
+        chunk_start_time = time.monotonic()
+        chunk = response.raw.read(read_size, decode_content=True)
+        if not chunk:
+            if response.raw.closed:
+                break
+            continue
+
+        paper_file.write(chunk)
+        downloaded_size += len(chunk)
+
+        now = time.monotonic()
+        chunk_size = adapt_chunk_size(chunk_size, now - chunk_start_time)
+
+        if now - last_update_time > PROGRESS_UPDATE_INTERVAL:
+            speed = downloaded_size / (now - start_time)
+            progress_bar.update(f'Downloading the paper: {format_size(downloaded_size)} at {format_size(speed)}/s...')
+            last_update_time = now
+
+    check_length(response)
+    logger.info(f'Downloaded {format_size(downloaded_size)} in {time.monotonic() - start_time:.2f} s')
+
+    return True
@@ -0,0 +1,211 @@
+import re
+from collections import defaultdict
+from collections.abc import Iterator
+from itertools import islice
+
+import arxiv
+import requests
+
+from scidock.config import logger
+from scidock.library import LibraryEntry
+from scidock.search_engines import arxiv_engine
+from scidock.search_engines import crossref_engine as crossref
+from scidock.utils import edit_json, load_json
+
+__all__ = ('export_bibtex', 'export_csl', 'to_bibtex')
+
+ENRICHMENT_BATCH_SIZE = 50
+ARXIV_DOI_PREFIX = '10.48550/arxiv.'
+
+CROSSREF_FIELDS = ('DOI', 'type', 'title', 'author', 'issued', 'container-title', 'volume', 'issue', 'page', 'publisher', 'URL')
+
+# see https://docs.citationstyles.org/en/stable/specification.html#appendix-iii-types
+CSL_TYPES = {
+    'journal-article': 'article-journal',
+    'proceedings-article': 'paper-conference',
+    'book-chapter': 'chapter',
+    'book': 'book',
+    'monograph': 'book',
+    'edited-book': 'book',
+    'posted-content': 'article',
+    'report': 'report',
+    'dissertation': 'thesis',
+    'dataset': 'dataset',
+}
+
+BIBTEX_TYPES = {
+    'article-journal': 'article',
+    'paper-conference': 'inproceedings',
+    'chapter': 'incollection',
+    'book': 'book',
+    'report': 'techreport',
+    'thesis': 'phdthesis',
+}
+
+BIBTEX_FIELDS = {
+    'title': 'title',
+    'container-title': 'journal',
+    'volume': 'volume',
+    'issue': 'number',
+    'page': 'pages',
+    'publisher': 'publisher',
+    'DOI': 'doi',
+    'URL': 'url',
+}
+# biblatex and hyperref read these as they are, so escapes would end up in the links
+VERBATIM_FIELDS = {'doi', 'url'}
+
+BIBTEX_ESCAPES = {'\\': r'\textbackslash{}', '{': r'\{', '}': r'\}', **{character: f'\\{character}' for character in '&%$#_'}}
+BIBTEX_SPECIAL_CHARACTERS = re.compile('|'.join(map(re.escape, BIBTEX_ESCAPES)))
+
+
+def csl_from_crossref(work: dict) -> dict:
+    csl = {
+        'id': work['DOI'],
+        'type': CSL_TYPES.get(work.get('type'), 'article'),
+        'title': ' / '.join(work.get('title', ())),
+        'author': [{key: author[key] for key in ('family', 'given', 'literal') if key in author} for author in work.get('author', ())],
+        'DOI': work['DOI'],
+    }
+
+    if work.get('issued', {}).get('date-parts', [[None]])[0][0] is not None:
+        csl['issued'] = work['issued']
+    if work.get('container-title'):
+        csl['container-title'] = work['container-title'][0]
+    for field in ('volume', 'issue', 'page', 'publisher', 'URL'):
+        if work.get(field):
+            csl[field] = work[field]
+
+    return csl
+
+
+def csl_from_arxiv(paper: arxiv.Result) -> dict:
+    doi = f'10.48550/arXiv.{paper.get_short_id()}'
+    return {
+        'id': doi,
+        'type': 'article',
+        'title': paper.title,
+        'author': [{'literal': author.name} for author in paper.authors],
+        'issued': {'date-parts': [[paper.published.year, paper.published.month, paper.published.day]]},
+        'publisher': 'arXiv',
+        'DOI': doi,
+        'URL': paper.entry_id,
+    }
+
+
+def csl_from_entry(entry: LibraryEntry) -> dict:
+    csl = {'id': entry.DOI or entry.filename, 'type': 'article', 'title': entry.title}
+    if entry.DOI is not None:
+        csl['DOI'] = entry.DOI
+    return csl
+
+
+def fetch_metadata(dois: list[str]) -> dict[str, dict]:
+    arxiv_ids = [doi[len(ARXIV_DOI_PREFIX):] for doi in dois if doi.startswith(ARXIV_DOI_PREFIX)]
+    crossref_dois = [doi for doi in dois if not doi.startswith(ARXIV_DOI_PREFIX)]
+
+    metadata = {}
+    if crossref_dois:
+        for work in crossref.fetch_works(crossref_dois, CROSSREF_FIELDS):
+            metadata[work['DOI'].lower()] = csl_from_crossref(work)
+    if arxiv_ids:
+        for paper in arxiv_engine.fetch_papers(arxiv_ids):
+            csl = csl_from_arxiv(paper)
+            metadata[csl['DOI'].lower()] = csl
+
+    return metadata
+
+
+def enrich(entries: list[LibraryEntry], metadata_caches: dict[str, dict]) -> list[dict]:
+    for entry in entries:
+        if entry.repository_path not in metadata_caches:
+            metadata_caches[entry.repository_path] = load_json(f'{entry.repository_path}/.scidock/metadata.json')
+
+    missing_dois = {entry.DOI.lower() for entry in entries
+                    if entry.DOI is not None and entry.DOI.lower() not in metadata_caches[entry.repository_path]}
+
+    fetched_metadata = {}
+    if missing_dois:
+        logger.info(f'Enriching the metadata of {len(missing_dois)} papers')
+        try:
+            fetched_metadata = fetch_metadata(sorted(missing_dois))
+        except (requests.exceptions.RequestException, arxiv.ArxivError) as e:
+            logger.warning(f'Could not enrich the metadata: {e!r}')
+            missing_dois = set()  # nothing is persisted, so that the next export retries
+
+    new_records = defaultdict(dict)
+    records = []
+    for entry in entries:
+        doi = entry.DOI.lower() if entry.DOI is not None else None
+        csl = metadata_caches[entry.repository_path].get(doi) or fetched_metadata.get(doi) or csl_from_entry(entry)
+
+        # DOIs unknown to the sources are persisted as well, so that they are not requested on every export
+        if doi in missing_dois:
+            new_records[entry.repository_path][doi] = csl
+        records.append(csl)
+
+    for repository_path, repository_records in new_records.items():
+        metadata_caches[repository_path].update(repository_records)
+        with edit_json(f'{repository_path}/.scidock/metadata.json') as metadata:
+            metadata.update(repository_records)
+
+    return records
+
+
+def export_csl(entries: list[LibraryEntry]) -> Iterator[dict]:
+    metadata_caches = {}
+    entries_iterator = iter(entries)
+
+    while batch := list(islice(entries_iterator, ENRICHMENT_BATCH_SIZE)):
+        yield from enrich(batch, metadata_caches)
+
+
+def escape_bibtex(value: str) -> str:
+    # a single pass, so that the backslashes of the escapes are not escaped again
+    return BIBTEX_SPECIAL_CHARACTERS.sub(lambda match: BIBTEX_ESCAPES[match[0]], str(value))
+
+
+def format_author(author: dict) -> str:
+    if 'family' in author:
+        return ', '.join(escape_bibtex(name) for name in (author['family'], author.get('given')) if name)
+    return f'{{{escape_bibtex(author.get("literal", ""))}}}'
+
+
+def bibtex_key(csl: dict, used_keys: set[str]) -> str:
+    authors = csl.get('author') or [{}]
+    surname = authors[0].get('family') or authors[0].get('literal', '').split(' ')[-1] or 'unknown'
+    year = str(csl.get('issued', {}).get('date-parts', [['']])[0][0])
+    first_word = next(iter(re.findall(r'\w+', csl.get('title', ''))), '')
+
+    key = base_key = re.sub(r'\W', '', f'{surname}{year}{first_word}'.lower()) or 'paper'
+    suffix = 1
+    while key in used_keys:
+        suffix += 1
+        key = f'{base_key}{suffix}'
+    used_keys.add(key)
+
+    return key
+
+
+def to_bibtex(csl: dict, used_keys: set[str]) -> str:
+    fields = []
+    if csl.get('author'):
+        fields.append(('author', ' and '.join(map(format_author, csl['author']))))
+
+    for csl_field, bibtex_field in BIBTEX_FIELDS.items():
+        if csl.get(csl_field):
+            value = csl[csl_field] if bibtex_field in VERBATIM_FIELDS else escape_bibtex(csl[csl_field])
+            fields.append((bibtex_field, value))
+
+    date_parts = csl.get('issued', {}).get('date-parts', [[None]])[0]
+    if date_parts[0] is not None:
+        fields.append(('year', str(date_parts[0])))
+
+    formatted_fields = ',\n'.join(f'  {name} = {{{value}}}' for name, value in fields)
+    return f'@{BIBTEX_TYPES.get(csl.get("type"), "misc")}{{{bibtex_key(csl, used_keys)},\n{formatted_fields}\n}}\n'
+
+
+def export_bibtex(entries: list[LibraryEntry]) -> Iterator[str]:
+    used_keys = set()
+    for csl in export_csl(entries):
+        yield to_bibtex(csl, used_keys)
@@ -0,0 +1,276 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+
+from scidock.config import logger
+from scidock.pipeline import download_paper
+from scidock.proxy_pool import Proxies
+from scidock.retry import TRANSIENT_ERRORS, backoff_delay
+
+__all__ = ('JOB_STATES', 'Job', 'add_jobs', 'cancel_jobs', 'list_jobs', 'recover_stale_jobs', 'run_queue')
+
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+ACTIVE_STATES = ('queued', 'running')
+
+# a running job whose worker has not reported for this long is assumed to be abandoned (crash, sleep, dropped SSH session)
+HEARTBEAT_INTERVAL = 15.0
+STALE_HEARTBEAT = 4 * HEARTBEAT_INTERVAL
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    doi TEXT NOT NULL,
+    title TEXT,
+    state TEXT NOT NULL DEFAULT 'queued',
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL,
+    source TEXT,
+    last_error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, priority DESC, id);
+CREATE INDEX IF NOT EXISTS jobs_by_doi ON jobs (doi COLLATE NOCASE);
+'''
+
+
+@dataclass
+class Job:
+    id: int
+    doi: str
+    title: str | None
+    state: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    not_before: float
+    worker: str | None
+    heartbeat: float | None
+    source: str | None
+    last_error: str | None
+    created: float
+    updated: float
+
+    def __str__(self):
+        return f'{self.title.rstrip(".")}. DOI: {self.doi}' if self.title else f'DOI: {self.doi}'
+
+
+def get_queue_path(repository_path: str) -> str:
+    return f'{repository_path}/.scidock/queue.sqlite3'
+
+
+def connect(repository_path: str) -> sqlite3.Connection:
+    # every thread opens its own connection; WAL lets `status` read while workers write
+    connection = sqlite3.connect(get_queue_path(repository_path), timeout=30, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+@contextmanager
+def transaction(connection: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # IMMEDIATE takes the write lock up front, so that two workers can never claim the same job
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield connection
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def add_jobs(repository_path: str, papers: list[tuple[str, str | None]], priority: int = 0,
+             max_attempts: int = 3) -> tuple[list[int], list[str]]:
+    # returns the IDs of the added (or re-prioritized) jobs and the DOIs that have already been downloaded
+    job_ids, completed = [], []
+    now = time.time()
+
+    with closing(connect(repository_path)) as connection, transaction(connection):
+        for doi, title in papers:
+            existing = connection.execute('SELECT id, state FROM jobs WHERE doi = ? COLLATE NOCASE AND state IN (?, ?, ?)',
+                                          (doi, 'done', *ACTIVE_STATES)).fetchall()
+            if any(job['state'] == 'done' for job in existing):
+                completed.append(doi)
+                continue
+
+            if existing:
+                job_id = existing[0]['id']
+                connection.execute('UPDATE jobs SET priority = max(priority, ?), updated = ? WHERE id = ?', (priority, now, job_id))
+            else:
+                job_id = connection.execute('INSERT INTO jobs (doi, title, priority, max_attempts, created, updated) '
+                                            'VALUES (?, ?, ?, ?, ?, ?)', (doi, title, priority, max_attempts, now, now)).lastrowid
+            job_ids.append(job_id)
+
+    return job_ids, completed
+
+
+def cancel_jobs(repository_path: str, job_ids: list[int] | None = None) -> int:
+    # running downloads are not interrupted, but their result is discarded; `None` cancels every active job
+    query = 'UPDATE jobs SET state = ?, updated = ? WHERE state IN (?, ?)'
+    params = ['cancelled', time.time(), *ACTIVE_STATES]
+    if job_ids is not None:
+        query += f' AND id IN ({", ".join("?" * len(job_ids))})'
+        params += job_ids
+
+    with closing(connect(repository_path)) as connection, transaction(connection):
+        return connection.execute(query, params).rowcount
+
+
+def list_jobs(repository_path: str, states: tuple[str, ...] = JOB_STATES) -> list[Job]:
+    with closing(connect(repository_path)) as connection:
+        rows = connection.execute(f'SELECT * FROM jobs WHERE state IN ({", ".join("?" * len(states))}) '  # noqa: S608 - only placeholders
+                                  'ORDER BY priority DESC, id', states).fetchall()
+
+    return [Job(**row) for row in rows]
+
+
+def is_worker_alive(worker: str) -> bool:
+    # workers of this machine can be checked directly, the others are judged by their heartbeat only
+    host, pid = worker.split('/', maxsplit=1)[0].rsplit(':', 1)
+    if host != socket.gethostname() or os.name != 'posix':
+        return True
+
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def recover_stale_jobs(repository_path: str) -> int:
+    # jobs of dead workers are put back in the queue; the interrupted attempt still counts
+    now = time.time()
+    with closing(connect(repository_path)) as connection, transaction(connection):
+        running_jobs = connection.execute('SELECT id, worker, heartbeat FROM jobs WHERE state = ?', ('running',)).fetchall()
+        stale_job_ids = [job['id'] for job in running_jobs
+                         if job['worker'] is None or job['heartbeat'] < now - STALE_HEARTBEAT or not is_worker_alive(job['worker'])]
+
+        for job_id in stale_job_ids:
+            connection.execute('UPDATE jobs SET state = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, '
+                               'last_error = coalesce(last_error, ?), worker = NULL, updated = ? WHERE id = ?',
+                               ('queued', 'failed', 'Interrupted', now, job_id))
+
+    if stale_job_ids:
+        logger.info(f'Recovered {len(stale_job_ids)} jobs abandoned by the previous workers')
+    return len(stale_job_ids)
+
+
+def claim_job(connection: sqlite3.Connection, worker: str) -> Job | float | None:
+    # returns the claimed job, the time when the next queued job becomes due or None if the queue is drained
+    now = time.time()
+    with transaction(connection):
+        row = connection.execute('SELECT * FROM jobs WHERE state = ? AND not_before <= ? ORDER BY priority DESC, id LIMIT 1',
+                                 ('queued', now)).fetchone()
+        if row is None:
+            return connection.execute('SELECT min(not_before) FROM jobs WHERE state = ?', ('queued',)).fetchone()[0]
+
+        connection.execute('UPDATE jobs SET state = ?, attempts = attempts + 1, worker = ?, heartbeat = ?, updated = ? WHERE id = ?',
+                           ('running', worker, now, now, row['id']))
+
+    return Job(**dict(row) | {'state': 'running', 'attempts': row['attempts'] + 1, 'worker': worker, 'heartbeat': now})
+
+
+def finish_job(connection: sqlite3.Connection, job: Job, source: str | None, error: str | None):
+    now = time.time()
+    if error is None:
+        state, not_before = 'done', job.not_before
+    elif job.attempts < job.max_attempts:
+        state, not_before = 'queued', now + backoff_delay(job.attempts - 1)
+    else:
+        state, not_before = 'failed', job.not_before
+
+    # a job that has been cancelled (or recovered by another run) in the meantime keeps its state
+    with transaction(connection):
+        connection.execute('UPDATE jobs SET state = ?, not_before = ?, source = ?, last_error = ?, worker = NULL, updated = ? '
+                           'WHERE id = ? AND state = ? AND worker = ?',
+                           (state, not_before, source, error, now, job.id, 'running', job.worker))
+
+
+def process_job(job: Job, proxies: Proxies | None) -> tuple[str | None, str | None]:
+    # returns the source of the PDF and the reason of the failure
+    try:
+        outcome = download_paper(job.doi, proxies, job.title)
+    except TRANSIENT_ERRORS as e:
+        return None, repr(e)
+
+    if outcome.success:
+        return outcome.source, None
+
+    reason = 'No downloadable copy found'
+    if outcome.recommended_url:
+        reason += f', try {outcome.recommended_url}'
+    return None, reason
+
+
+def keep_alive(repository_path: str, worker: str, stop_event: threading.Event):
+    with closing(connect(repository_path)) as connection:
+        while not stop_event.wait(HEARTBEAT_INTERVAL):
+            connection.execute('UPDATE jobs SET heartbeat = ? WHERE state = ? AND worker LIKE ?', (time.time(), 'running', f'{worker}/%'))
+
+
+def run_worker(repository_path: str, worker: str, proxies: Proxies | None, stop_event: threading.Event) -> Counter:
+    results = Counter()
+
+    with closing(connect(repository_path)) as connection:
+        while not stop_event.is_set():
+            job = claim_job(connection, worker)
+            if job is None:
+                break
+
+            if not isinstance(job, Job):
+                # only jobs waiting for their backoff are left
+                stop_event.wait(max(job - time.time(), 0) + 0.1)
+                continue
+
+            logger.info(f'Worker {worker} started job #{job.id} ({job.doi}), attempt {job.attempts}/{job.max_attempts}')
+            try:
+                source, error = process_job(job, proxies)
+            except Exception as e:  # one broken job should not stop the worker
+                source, error = None, repr(e)
+
+            finish_job(connection, job, source, error)
+            logger.info(f'Job #{job.id} ({job.doi}) ' + (f'is done via {source}' if error is None else f'failed: {error}'))
+            results['done' if error is None else 'failed'] += 1
+
+    return results
+
+
+def release_jobs(repository_path: str, worker: str):
+    # an interrupted run gives its jobs back right away instead of waiting for them to become stale
+    with closing(connect(repository_path)) as connection, transaction(connection):
+        connection.execute('UPDATE jobs SET state = ?, attempts = attempts - 1, worker = NULL, updated = ? '
+                           'WHERE state = ? AND worker LIKE ?', ('queued', time.time(), 'running', f'{worker}/%'))
+
+
+def run_queue(repository_path: str, proxies: Proxies | None = None, jobs: int = 4) -> Counter:
+    # processes the queue until no job is left; safe to interrupt and to run again
+    recover_stale_jobs(repository_path)
+
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    stop_event = threading.Event()
+    threading.Thread(target=keep_alive, args=(repository_path, worker, stop_event), daemon=True).start()
+
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    futures = [pool.submit(run_worker, repository_path, f'{worker}/{index}', proxies, stop_event) for index in range(jobs)]
+    try:
+        return sum((future.result() for future in futures), Counter())
+    except BaseException:
+        release_jobs(repository_path, worker)
+        raise
+    finally:
+        stop_event.set()
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,44 @@
+import hashlib
+import json
+from pathlib import Path, PurePosixPath
+
+__all__ = ('LAYOUTS', 'get_layout', 'place_paper', 'set_layout')
+
+# `flat` keeps every PDF in the root of the repository; `sharded` spreads them over 256 directories named by the hash of the DOI
+LAYOUTS = ('flat', 'sharded')
+DEFAULT_LAYOUT = 'flat'
+SHARD_WIDTH = 2
+
+
+def get_settings_path(repository_path: str) -> Path:
+    return Path(repository_path) / '.scidock' / 'settings.json'
+
+
+def get_layout(repository_path: str) -> str:
+    try:
+        settings = json.loads(get_settings_path(repository_path).read_text(encoding='utf-8'))
+    except (json.decoder.JSONDecodeError, FileNotFoundError):
+        settings = {}
+    return settings.get('layout', DEFAULT_LAYOUT)
+
+
+def set_layout(repository_path: str, layout: str) -> None:
+    settings_path = get_settings_path(repository_path)
+    try:
+        settings = json.loads(settings_path.read_text(encoding='utf-8'))
+    except (json.decoder.JSONDecodeError, FileNotFoundError):
+        settings = {}
+
+    settings['layout'] = layout
+    settings_path.write_text(json.dumps(settings), encoding='utf-8')
+
+
+def place_paper(layout: str, filename: str, doi: str | None) -> str:
+    # returns the path of the paper relative to the root of the repository, as it is stored in `content.json`
+    filename = PurePosixPath(filename).name
+    if layout == 'flat':
+        return filename
+
+    # papers without a DOI (e.g. added by `sync`) are sharded by their filename
+    shard_key = (doi or filename).lower().encode()
+    return f'{hashlib.sha1(shard_key, usedforsecurity=False).hexdigest()[:SHARD_WIDTH]}/{filename}'
@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from scidock.utils import get_default_repository_path, load_json
+
+__all__ = ('LibraryEntry', 'get_repository_paths', 'load_library')
+
+FUZZY_MATCH_RATE = 75
+
+
+@dataclass(slots=True)
+class LibraryEntry:
+    repository_path: str
+    filename: str
+    title: str
+    DOI: str | None
+
+    @property
+    def path(self) -> str:
+        return str(Path(self.repository_path) / self.filename)
+
+    def __str__(self):
+        return f'{self.title.rstrip(".")}. DOI: {self.DOI}'
+
+
+def get_repository_paths(all_repositories: bool = False) -> list[str]:
+    if not all_repositories:
+        return [get_default_repository_path()]
+
+    current_config = load_json(Path('~/.scidock/config.json').expanduser())
+    return [repository['path'] for repository in current_config.get('repositories', {}).values() if Path(repository['path']).exists()]
+
+
+def load_entries(repository_path: str) -> list[LibraryEntry]:
+    repository_content = load_json(f'{repository_path}/.scidock/content.json')
+    return [LibraryEntry(repository_path, filename, entry['title'], entry['DOI'])
+            for filename, entry in repository_content.get('local', {}).items()]
+
+
+def load_library(repository_paths: list[str]) -> list[LibraryEntry]:
+    if len(repository_paths) == 1:
+        return load_entries(repository_paths[0])
+
+    with ThreadPoolExecutor() as pool:
+        return [entry for entries in pool.map(load_entries, repository_paths) for entry in entries]
+
@@ -0,0 +1,270 @@
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import accumulate
+from pathlib import Path
+
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from scidock.config import logger
+from scidock.library import FUZZY_MATCH_RATE, LibraryEntry, load_entries
+
+__all__ = ('LibraryIndex', 'build_index', 'load_index', 'load_indexes', 'search_indexes')
+
+INDEX_FORMAT_VERSION = 1
+INDEX_MAGIC = b'SDIX'
+HEADER_FORMAT = '<4sII'  # magic, format version, length of the JSON header
+SECTION_ALIGNMENT = 8
+
+NGRAM_SIZE = 3
+
+# only the rarest n-grams of the query are looked up; common ones ("the", "ing") select nearly every title anyway
+MAX_QUERY_NGRAMS = 16
+# share of the looked up n-grams a title has to contain to be scored at all
+MIN_NGRAM_SHARE = 0.5
+MAX_CANDIDATES = 256
+
+TERMINATOR = '\0'
+
+COLUMNS = ('filenames', 'titles', 'dois', 'normalized_titles', 'ngrams')
+
+Spans = dict[str, tuple[int, int]]
+
+
+def extract_ngrams(normalized_text: str) -> set[str]:
+    padded_text = f' {normalized_text} '
+    return {padded_text[i:i + NGRAM_SIZE] for i in range(len(padded_text) - NGRAM_SIZE + 1)}
+
+
+def get_content_stamp(repository_path: str) -> list[int]:
+    try:
+        content_stat = (Path(repository_path) / '.scidock' / 'content.json').stat()
+    except FileNotFoundError:
+        return [0, 0]
+    return [content_stat.st_size, content_stat.st_mtime_ns]
+
+
+def align(position: int) -> int:
+    return -(-position // SECTION_ALIGNMENT) * SECTION_ALIGNMENT
+
+
+@dataclass(slots=True)
+class StringColumn:
+    # strings are stored back to back (each one is terminated) and decoded only when accessed
+    data: memoryview
+    offsets: memoryview
+
+    @staticmethod
+    def encode(strings: list[str]) -> tuple[bytes, bytes]:
+        encoded_strings = [f'{string}{TERMINATOR}'.encode() for string in strings]
+        return b''.join(encoded_strings), array('I', accumulate(map(len, encoded_strings), initial=0)).tobytes()
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return str(self.data[self.offsets[index]:self.offsets[index + 1] - 1], 'utf-8')
+
+    def to_list(self) -> list[str]:
+        return str(self.data, 'utf-8').split(TERMINATOR)[:-1]
+
+
+@dataclass(slots=True)
+class LibraryIndex:
+    # all of the columns are views into a single buffer (usually a memory-mapped file), so loading costs next to nothing
+    repository_path: str
+    stamp: list[int]
+    filenames: StringColumn
+    titles: StringColumn
+    dois: StringColumn
+    normalized_titles: StringColumn
+    ngrams: dict[str, int]
+    # indices of the titles containing the i-th n-gram are `postings[postings_offsets[i]:postings_offsets[i + 1]]`
+    postings_offsets: memoryview
+    postings: memoryview
+
+    @classmethod
+    def from_buffer(cls, repository_path: str, stamp: list[int], buffer, spans: Spans) -> 'LibraryIndex':
+        buffer = memoryview(buffer)
+        sections = {name: buffer[start:end] for name, (start, end) in spans.items()}
+        columns = {column: StringColumn(sections[column], sections[f'{column}_offsets'].cast('I')) for column in COLUMNS}
+
+        ngrams = {ngram: ngram_index for ngram_index, ngram in enumerate(columns['ngrams'].to_list())}
+        return cls(repository_path, stamp, columns['filenames'], columns['titles'], columns['dois'], columns['normalized_titles'], ngrams,
+                   sections['postings_offsets'].cast('I'), sections['postings'].cast('I'))
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    def entry(self, entry_index: int) -> LibraryEntry:
+        return LibraryEntry(self.repository_path, self.filenames[entry_index], self.titles[entry_index], self.dois[entry_index] or None)
+
+    def find_candidates(self, normalized_query: str) -> list[int] | None:
+        # returns None if the query is too short to be filtered by n-grams
+        query_ngrams = [ngram for ngram in extract_ngrams(normalized_query) if ngram.strip()]
+        if not query_ngrams:
+            return None
+
+        spans = [(self.postings_offsets[ngram_index], self.postings_offsets[ngram_index + 1])
+                 for ngram_index in (self.ngrams.get(ngram) for ngram in query_ngrams) if ngram_index is not None]
+        spans = sorted(spans, key=lambda span: span[1] - span[0])[:MAX_QUERY_NGRAMS]
+
+        hits = Counter()
+        for start, end in spans:
+            hits.update(self.postings[start:end])
+
+        min_hits = math.ceil(min(len(query_ngrams), MAX_QUERY_NGRAMS) * MIN_NGRAM_SHARE)
+        return [entry_index for entry_index, count in hits.most_common(MAX_CANDIDATES) if count >= min_hits]
+
+    def match_ids(self, query_id: str, limit: int | None) -> list[tuple[int, float]]:
+        dois = self.dois.to_list()
+
+        normalized_id = query_id.lower()
+        exact_matches = [entry_index for entry_index, doi in enumerate(dois) if doi.lower() == normalized_id]
+        if exact_matches:
+            return [(entry_index, 100.0) for entry_index in exact_matches[:limit]]
+
+        # noinspection PyTypeChecker
+        id_matches = process.extract(query_id, dois, scorer=fuzz.WRatio, score_cutoff=FUZZY_MATCH_RATE, processor=default_process,
+                                     limit=limit)
+        return [(entry_index, score) for _, score, entry_index in id_matches]
+
+    def match_titles(self, query: str, limit: int | None) -> list[tuple[int, float]]:
+        normalized_query = default_process(query)
+
+        candidates = self.find_candidates(normalized_query)
+        if candidates is None:
+            candidates = range(len(self))
+            candidate_titles = self.normalized_titles.to_list()
+        else:
+            candidate_titles = [self.normalized_titles[entry_index] for entry_index in candidates]
+
+        # noinspection PyTypeChecker
+        # titles are normalized in advance, so no processor is needed
+        title_matches = process.extract(normalized_query, candidate_titles, scorer=fuzz.WRatio, score_cutoff=FUZZY_MATCH_RATE,
+                                        processor=None, limit=limit)
+        return [(candidates[candidate_index], score) for _, score, candidate_index in title_matches]
+
+
+def build_index(repository_path: str) -> tuple[list[int], bytes, Spans]:
+    stamp = get_content_stamp(repository_path)
+    entries = load_entries(repository_path)
+
+    normalized_titles = [default_process(entry.title) for entry in entries]
+
+    ngram_postings = {}
+    for entry_index, normalized_title in enumerate(normalized_titles):
+        for ngram in extract_ngrams(normalized_title):
+            ngram_postings.setdefault(ngram, []).append(entry_index)
+
+    postings = array('I')
+    postings_offsets = array('I', [0])
+    for entry_indices in ngram_postings.values():
+        postings.extend(entry_indices)
+        postings_offsets.append(len(postings))
+
+    columns = {
+        'filenames': [entry.filename for entry in entries],
+        'titles': [entry.title for entry in entries],
+        'dois': [entry.DOI or '' for entry in entries],
+        'normalized_titles': normalized_titles,
+        'ngrams': list(ngram_postings),
+    }
+
+    sections = {'postings_offsets': postings_offsets.tobytes(), 'postings': postings.tobytes()}
+    for column, strings in columns.items():
+        sections[column], sections[f'{column}_offsets'] = StringColumn.encode(strings)
+
+    # sections are aligned, so that the integer ones can be viewed in place
+    body = bytearray()
+    spans = {}
+    for name, section in sections.items():
+        body.extend(bytes(align(len(body)) - len(body)))
+        spans[name] = (len(body), len(body) + len(section))
+        body.extend(section)
+
+    return stamp, bytes(body), spans
+
+
+def write_index(path: Path, stamp: list[int], body: bytes, spans: Spans):
+    header = json.dumps({'stamp': stamp, 'byteorder': sys.byteorder, 'spans': spans}).encode()
+    prefix = struct.pack(HEADER_FORMAT, INDEX_MAGIC, INDEX_FORMAT_VERSION, len(header)) + header
+
+    temporary_path = path.with_suffix('.tmp')
+    with open(temporary_path, 'wb') as index_file:
+        index_file.write(prefix)
+        index_file.write(bytes(align(len(prefix)) - len(prefix)))
+        index_file.write(body)
+    temporary_path.replace(path)
+
+
+def read_index(repository_path: str, path: Path) -> LibraryIndex | None:
+    with open(path, 'rb') as index_file:
+        index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    prefix_size = struct.calcsize(HEADER_FORMAT)
+    magic, version, header_size = struct.unpack_from(HEADER_FORMAT, index_map)
+    if magic != INDEX_MAGIC or version != INDEX_FORMAT_VERSION:
+        return None
+
+    header = json.loads(index_map[prefix_size:prefix_size + header_size])
+    if header['byteorder'] != sys.byteorder:
+        return None
+
+    body = memoryview(index_map)[align(prefix_size + header_size):]
+    return LibraryIndex.from_buffer(repository_path, header['stamp'], body, {name: tuple(span) for name, span in header['spans'].items()})
+
+
+def load_index(repository_path: str) -> LibraryIndex:
+    # the index is rebuilt whenever `content.json` has changed since it was written
+    index_path = Path(repository_path) / '.scidock' / 'index.bin'
+
+    index = None
+    try:
+        index = read_index(repository_path, index_path)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        logger.warning(f'Library index of {repository_path} is corrupted, rebuilding: {e!r}')
+
+    if index is not None and index.stamp == get_content_stamp(repository_path):
+        return index
+    del index  # releases the mapping of the outdated file, so that it can be replaced
+
+    stamp, body, spans = build_index(repository_path)
+    index = LibraryIndex.from_buffer(repository_path, stamp, body, spans)
+    logger.info(f'Rebuilt the library index of {repository_path} with {len(index)} papers')
+
+    try:
+        write_index(index_path, stamp, body, spans)
+    except OSError as e:
+        logger.warning(f'Could not save the library index of {repository_path}: {e!r}')
+
+    return index
+
+
+def load_indexes(repository_paths: list[str]) -> list[LibraryIndex]:
+    if len(repository_paths) == 1:
+        return [load_index(repository_paths[0])]
+
+    with ThreadPoolExecutor() as pool:
+        return list(pool.map(load_index, repository_paths))
+
+
+def search_indexes(query: str, query_id: str | None, indexes: list[LibraryIndex],
+                   limit: int | None = 1) -> list[tuple[LibraryEntry, float]]:
+    # matches by ID take precedence over matches by title, as the former are unambiguous
+    if query_id is not None:
+        id_matches = [(index.entry(entry_index), score) for index in indexes for entry_index, score in index.match_ids(query_id, limit)]
+        if id_matches:
+            return sorted(id_matches, key=lambda match: match[1], reverse=True)[:limit]
+
+    title_matches = [(index.entry(entry_index), score) for index in indexes for entry_index, score in index.match_titles(query, limit)]
+    return sorted(title_matches, key=lambda match: match[1], reverse=True)[:limit]
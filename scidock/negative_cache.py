@@ -0,0 +1,73 @@
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from scidock.config import logger
+from scidock.utils import edit_json, load_json
+
+__all__ = ('forget_dead_ends', 'lookup_dead_end', 'record_dead_end', 'suppress_dead_ends')
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# how long a source is assumed to still have nothing for a DOI; mirrors rarely get new papers, publishers change their pages more often
+DEAD_END_TTLS = {'publisher': 3 * DAY}
+DEFAULT_DEAD_END_TTL = 7 * DAY
+
+local_state = threading.local()
+
+
+def get_negative_cache_path() -> Path:
+    return Path('~/.scidock/negative_cache.json').expanduser()
+
+
+def lookup_dead_end(source: str, doi: str) -> dict | None:
+    dead_end = load_json(get_negative_cache_path()).get(source, {}).get(doi.lower())
+    if dead_end is None or dead_end['expires'] <= time.time():
+        return None
+
+    logger.info(f'Skipping {source} for {doi = } as a known dead end: {dead_end["reason"]}')
+    return dead_end
+
+
+@contextmanager
+def suppress_dead_ends() -> Iterator[None]:
+    # the calling thread only probes the sources (see `pipeline.SourceSpeculator`); the actual download repeats the probe and records it
+    previous_state = getattr(local_state, 'suppressed', False)
+    local_state.suppressed = True
+    try:
+        yield
+    finally:
+        local_state.suppressed = previous_state
+
+
+def record_dead_end(source: str, doi: str, reason: str, **details):
+    if getattr(local_state, 'suppressed', False):
+        logger.debug(f'Not recording {source} as a dead end for {doi = } during a speculative probe: {reason}')
+        return
+
+    now = time.time()
+    with edit_json(get_negative_cache_path()) as negative_cache:
+        # expired entries are dropped on every write, so that the file does not grow indefinitely
+        for source_entries in negative_cache.values():
+            for expired_doi in [entry_doi for entry_doi, entry in source_entries.items() if entry['expires'] <= now]:
+                del source_entries[expired_doi]
+
+        negative_cache.setdefault(source, {})[doi.lower()] = {
+            'reason': reason,
+            'recorded': now,
+            'expires': now + DEAD_END_TTLS.get(source, DEFAULT_DEAD_END_TTL),
+            **details,
+        }
+
+
+def forget_dead_ends(doi: str):
+    negative_cache_path = get_negative_cache_path()
+    if not negative_cache_path.exists():
+        return
+
+    with edit_json(negative_cache_path) as negative_cache:
+        for source_entries in negative_cache.values():
+            source_entries.pop(doi.lower(), None)
@@ -0,0 +1,232 @@
+import threading
+import time
+import weakref
+from functools import cache
+from urllib.parse import urlsplit
+
+import requests
+
+from scidock.config import load_config, logger
+from scidock.deadline import DeadlineExceededError, clamp_timeout, expired, remaining
+from scidock.proxy_pool import PROXY_ERRORS, ProxyPool
+
+__all__ = ('RateLimitedSession', 'concurrency_limiter', 'get_bandwidth_limiter', 'rate_limiter', 'session')
+
+KB = 1024
+
+# (requests, interval in seconds) per host before the server tells us otherwise
+DEFAULT_RATE_LIMITS = {
+    'api.crossref.org': (50, 1.0),  # polite pool, see https://api.crossref.org/swagger-ui/index.html
+    'export.arxiv.org': (1, 3.0),  # see https://info.arxiv.org/help/api/tou.html
+}
+
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60}
+
+# so that concurrent jobs (e.g. `scidock retry`) do not hammer a single mirror
+MAX_CONCURRENT_REQUESTS_PER_HOST = 4
+
+
+class TokenBucket:
+    def __init__(self, limit: int, interval: float):
+        self.lock = threading.Lock()
+        self.rate = limit / interval
+        self.capacity = float(limit)
+        self.tokens = float(limit)
+        self.timestamp = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+        self.timestamp = now
+
+    def acquire(self, amount: float = 1):
+        # tokens are reserved immediately (the balance may go negative), so concurrent callers queue up fairly
+        with self.lock:
+            self._refill()
+            self.tokens -= amount
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if delay > 0:
+            budget = remaining()
+            if budget is not None and delay > budget:
+                # the request would not be made in time anyway, so the reservation is given back
+                with self.lock:
+                    self.tokens += amount
+                raise DeadlineExceededError('The time budget of the command has run out while waiting for the rate limit')
+
+            time.sleep(delay)
+
+    def update(self, limit: int, interval: float):
+        with self.lock:
+            self._refill()
+            self.rate = limit / interval
+            self.capacity = float(limit)
+            self.tokens = min(self.tokens, self.capacity)
+
+    def block(self, duration: float):
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - duration * self.rate
+
+
+class RateLimiter:
+    def __init__(self, default_limits: dict[str, tuple[int, float]]):
+        self.lock = threading.Lock()
+        self.buckets = {host: TokenBucket(*limits) for host, limits in default_limits.items()}
+
+    def acquire(self, url: str):
+        bucket = self.buckets.get(urlsplit(url).hostname)
+        if bucket is not None:
+            bucket.acquire()
+
+    def adapt(self, url: str, response: requests.Response):
+        host = urlsplit(url).hostname
+
+        limits = parse_rate_limit_headers(response.headers)
+        if limits is not None:
+            with self.lock:
+                bucket = self.buckets.get(host)
+                if bucket is None:
+                    self.buckets[host] = TokenBucket(*limits)
+                elif (bucket.capacity, bucket.capacity / bucket.rate) != limits:
+                    logger.debug(f'Rate limit for {host} changed to {limits[0]} requests per {limits[1]} s')
+                    bucket.update(*limits)
+
+        if response.status_code == 429:  # noqa: PLR2004 - Too Many Requests
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            logger.warning(f'{host} throttled the request, backing off for {retry_after} s')
+            with self.lock:
+                bucket = self.buckets.setdefault(host, TokenBucket(1, retry_after))
+            bucket.block(retry_after)
+
+
+class Slot:
+    # a place taken within the limit of a host; it is given back exactly once, whichever way the request ends
+    def __init__(self, semaphore: threading.BoundedSemaphore):
+        self.semaphore = semaphore
+        self.lock = threading.Lock()
+        self.released = False
+
+    def release(self):
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+
+        self.semaphore.release()
+
+    def hold(self, response: requests.Response):
+        # the body of a streamed response still occupies the connection, so the slot is kept until it is read or closed
+        release_conn = response.raw.release_conn
+
+        def release_connection():
+            release_conn()
+            self.release()
+
+        response.raw.release_conn = release_connection
+        # as well as when a half-read response is simply dropped
+        weakref.finalize(response, self.release)
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int):
+        self.lock = threading.Lock()
+        self.limit = limit
+        self.semaphores = {}
+
+    def acquire(self, url: str) -> Slot:
+        host = urlsplit(url).hostname
+        with self.lock:
+            semaphore = self.semaphores.setdefault(host, threading.BoundedSemaphore(self.limit))
+
+        if not semaphore.acquire(timeout=remaining()):
+            raise DeadlineExceededError(f'The time budget of the command has run out while waiting for {host}')
+        return Slot(semaphore)
+
+
+def parse_rate_limit_headers(headers) -> tuple[int, float] | None:
+    limit, interval = headers.get('X-Rate-Limit-Limit'), headers.get('X-Rate-Limit-Interval')
+    if limit is None or interval is None:
+        return None
+
+    try:
+        interval_unit = INTERVAL_UNITS.get(interval[-1], 1)
+        interval_value = float(interval.rstrip(''.join(INTERVAL_UNITS))) * interval_unit
+        limit_value = int(limit)
+    except ValueError:
+        return None
+
+    if limit_value <= 0 or interval_value <= 0:
+        return None
+
+    return limit_value, interval_value
+
+
+def parse_retry_after(value: str | None, default: float = 1.0) -> float:
+    try:
+        return max(float(value), default)
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimitedSession(requests.Session):
+    def request(self, method, url, *args, **kwargs):
+        proxy_pool = kwargs.get('proxies')
+        if isinstance(proxy_pool, ProxyPool):
+            if proxy_pool:
+                return self.request_through_pool(proxy_pool, method, url, *args, **kwargs)
+            # there is nothing to pick from, so the request goes out directly
+            kwargs['proxies'] = {}
+
+        slot = concurrency_limiter.acquire(url)
+        try:
+            rate_limiter.acquire(url)
+            # see `scidock.deadline`: the hard-coded timeouts of the callers are cut down to the remaining budget
+            kwargs['timeout'] = clamp_timeout(kwargs.get('timeout'))
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.Timeout as e:
+            slot.release()
+            if expired():
+                raise DeadlineExceededError(f'The time budget of the command has run out while requesting {url}') from e
+            raise
+        except BaseException:
+            slot.release()
+            raise
+
+        if kwargs.get('stream'):
+            slot.hold(response)
+        else:
+            slot.release()
+
+        rate_limiter.adapt(url, response)
+        return response
+
+
+    def request_through_pool(self, proxy_pool: ProxyPool, method, url, *args, **kwargs):
+        proxy = proxy_pool.select()
+        kwargs['proxies'] = proxy.requests_proxies
+
+        start_time = time.monotonic()
+        try:
+            response = self.request(method, url, *args, **kwargs)
+        except PROXY_ERRORS:
+            proxy_pool.report(proxy, None)
+            raise
+
+        proxy_pool.report(proxy, time.monotonic() - start_time)
+        return response
+
+
+@cache
+def get_bandwidth_limiter() -> TokenBucket | None:
+    # shared by all of the downloads of the process; one token per byte
+    bandwidth_limit = load_config().get('bandwidth_limit')
+    if not bandwidth_limit:
+        return None
+
+    return TokenBucket(bandwidth_limit * KB, 1.0)
+
+
+rate_limiter = RateLimiter(DEFAULT_RATE_LIMITS)
+concurrency_limiter = ConcurrencyLimiter(MAX_CONCURRENT_REQUESTS_PER_HOST)
+session = RateLimitedSession()
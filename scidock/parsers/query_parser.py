@@ -1,57 +1,175 @@
+import os
 import re
+from dataclasses import dataclass
 from typing import Any
 
-import requests
-
+from scidock.config import logger
+from scidock.deadline import DeadlineExceededError, share_budget
+from scidock.network import session
 from scidock.ui import progress_bar
-from scidock.utils import responsive_cache
+from scidock.utils import BoundedCache, responsive_cache
 
-__all__ = ('extract_dois', 'extract_arxiv_ids', 'extract_names', 'extract_keywords', 'simplify_query', 'clear_query')
+__all__ = ('Span', 'analyze_queries', 'clear_query', 'extract_arxiv_ids', 'extract_dois', 'extract_keywords', 'extract_names',
+           'simplify_query', 'split_names', 'tokenize_query')
 
-NLP_SERVER = 'https://kgleba-scidock-nlp.hf.space'
+NLP_SERVER = os.environ.get('SCIDOCK_NLP_SERVER', 'https://kgleba-scidock-nlp.hf.space')
 
 # following CrossRef's recommendation: https://www.crossref.org/blog/dois-and-matching-regular-expressions
 DOI_PATTERN = re.compile(r'10.\d{4,9}/[-._;()/:a-zA-Z0-9]+')
 
 # source: https://info.arxiv.org/help/arxiv_identifier_for_services.html
-ARXIV_PATTERN = re.compile(r'(\d{4}.\d{4,5}|[a-z\-]+(\.[A-Z]{2})?/\d{7})(v\d+)?')
-STRICT_ARXIV_PATTERN = re.compile(fr'arXiv\.{ARXIV_PATTERN.pattern}')
+ARXIV_PATTERN = re.compile(r'(?:\d{4}.\d{4,5}|[a-z\-]+(?:\.[A-Z]{2})?/\d{7})(?:v\d+)?')
+STRICT_ARXIV_PATTERN = re.compile(fr'arXiv\.(?P<arxiv_id>{ARXIV_PATTERN.pattern})')
+
+# a single scan finds both kinds of IDs; DOIs go first, so that arXiv DOIs are not split into an arXiv ID and garbage
+TOKEN_PATTERN = re.compile(fr'(?P<doi>{DOI_PATTERN.pattern})|(?:arXiv\.)?(?P<arxiv_id>{ARXIV_PATTERN.pattern})')
+
+DOI = 'doi'
+ARXIV_ID = 'arxiv_id'
+NAME = 'name'
+TEXT = 'text'
+
+ANALYSIS_BATCH_SIZE = 100
+ANALYSIS_CACHE_SIZE = 8192
+# with a deadline, the engines are left at least the rest of the budget after the query has been parsed
+ANALYSIS_BUDGET_SHARE = 0.5
+
+# analysis results for the query itself and for `clear_query(query)`, as returned by the NLP server
+remote_data = BoundedCache(ANALYSIS_CACHE_SIZE)
 
-remote_data = {}
+
+@dataclass(frozen=True, slots=True)
+class Span:
+    kind: str
+    text: str  # for arXiv IDs, the ID without the optional "arXiv." prefix that is still covered by `start` and `end`
+    start: int
+    end: int
+
+
+def _text_span(query: str, start: int, end: int) -> Span:
+    return Span(TEXT, query[start:end], start, end)
 
 
 @responsive_cache
-def _retrieve_remote_data(query: str, operation: str) -> Any:
-    # updates relevant info about the `query` itself and `clear_query(query)`
-    if remote_data.get(query) is None:
-        if progress_bar.status != 'Parsing your query using AI...':
-            progress_bar.update('Parsing your query using AI...')
+def tokenize_query(query: str) -> tuple[Span, ...]:
+    # splits the query into DOIs, arXiv IDs and the free text in between
+    spans = []
+    position = 0
+
+    for match in TOKEN_PATTERN.finditer(query):
+        if match.start() > position:
+            spans.append(_text_span(query, position, match.start()))
+
+        kind = DOI if match.group(DOI) is not None else ARXIV_ID
+        spans.append(Span(kind, match.group(kind), match.start(), match.end()))
+        position = match.end()
+
+    if position < len(query):
+        spans.append(_text_span(query, position, len(query)))
+
+    return tuple(spans)
+
+
+def split_names(query: str, spans: tuple[Span, ...], names: list[str]) -> tuple[Span, ...]:
+    # names come from the NLP server, so they are located in the free text after the IDs are known
+    if not names:
+        return spans
+
+    name_pattern = re.compile('|'.join(map(re.escape, sorted(names, key=len, reverse=True))))
+
+    split_spans = []
+    for span in spans:
+        if span.kind != TEXT:
+            split_spans.append(span)
+            continue
+
+        position = span.start
+        for match in name_pattern.finditer(query, span.start, span.end):
+            if match.start() > position:
+                split_spans.append(_text_span(query, position, match.start()))
+            split_spans.append(Span(NAME, match.group(0), match.start(), match.end()))
+            position = match.end()
 
-        response = requests.post(f'{NLP_SERVER}/complex_analysis', json={'query': query}, timeout=10)
-        remote_data.update(response.json())
+        if position < span.end:
+            split_spans.append(_text_span(query, position, span.end))
 
+    return tuple(split_spans)
+
+
+def join_text(spans: tuple[Span, ...]) -> str:
+    # every removed span swallows the spaces around it and leaves a single one in its place
+    text = ''
+    after_removed = False
+
+    for span in spans:
+        if span.kind == TEXT:
+            text += span.text.lstrip(' ') if after_removed else span.text
+            after_removed = False
+        else:
+            text = text.rstrip(' ') + ' '
+            after_removed = True
+
+    return text
+
+
+def _request_analysis(queries: list[str]) -> dict[str, Any]:
+    if len(queries) > 1:
+        response = session.post(f'{NLP_SERVER}/batch_analysis', json={'queries': queries}, timeout=10 + len(queries) // 10)
+        if response.status_code not in (404, 405):
+            response.raise_for_status()
+            return response.json()
+
+        logger.warning('NLP server does not support batch analysis, falling back to one request per query')
+
+    analysis = {}
+    for query in queries:
+        response = session.post(f'{NLP_SERVER}/complex_analysis', json={'query': query}, timeout=10)
+        response.raise_for_status()
+        analysis.update(response.json())
+
+    return analysis
+
+
+def analyze_queries(queries: list[str]) -> None:
+    # fetches the analysis of every query that is not cached yet, `ANALYSIS_BATCH_SIZE` queries per request
+    pending_queries = list(dict.fromkeys(query for query in queries if query not in remote_data))
+    if not pending_queries:
+        return
+
+    if progress_bar.status != 'Parsing your query using AI...':
+        progress_bar.update('Parsing your query using AI...')
+
+    try:
+        with share_budget(ANALYSIS_BUDGET_SHARE):
+            for batch_start in range(0, len(pending_queries), ANALYSIS_BATCH_SIZE):
+                remote_data.update(_request_analysis(pending_queries[batch_start:batch_start + ANALYSIS_BATCH_SIZE]))
+    except DeadlineExceededError:
+        # the queries are used as they are; empty results keep the following lookups from spending the budget again
+        logger.warning(f'Ran out of time while parsing {len(pending_queries)} queries, proceeding without the analysis')
+        remote_data.update({query: {} for query in pending_queries if query not in remote_data})
+    finally:
         progress_bar.revert_status()
 
-    return remote_data[query].get(operation)
+
+def _retrieve_remote_data(query: str, operation: str) -> Any:
+    analyze_queries([query])
+    return remote_data.get(query, {}).get(operation)
 
 
 @responsive_cache
 def extract_dois(query: str) -> list[str]:
-    return re.findall(DOI_PATTERN, query)
+    return [span.text for span in tokenize_query(query) if span.kind == DOI]
 
 
 @responsive_cache
 def extract_arxiv_ids(query: str, strict: bool = False, allow_overlap: bool = False) -> list[str]:
-    if not allow_overlap:
-        dois = extract_dois(query)
-        for doi in dois:
-            query = re.sub(f' *{doi} *', ' ', query)
+    if allow_overlap:
+        # IDs inside of DOIs (e.g. 10.48550/arXiv.1912.01412) count as well
+        if strict:
+            return [match.group('arxiv_id') for match in STRICT_ARXIV_PATTERN.finditer(query)]
+        return [match.group(0) for match in ARXIV_PATTERN.finditer(query)]
 
-    pattern = ARXIV_PATTERN
-    if strict:
-        pattern = STRICT_ARXIV_PATTERN
-
-    return [''.join(match) for match in re.findall(pattern, query)]
+    return [span.text for span in tokenize_query(query) if span.kind == ARXIV_ID and (not strict or query.startswith('arXiv.', span.start))]
 
 
 def extract_names(query: str) -> list[str] | None:
@@ -68,17 +186,12 @@ def simplify_query(query: str) -> str | None:
 
 @responsive_cache
 def clear_query(query: str) -> str:
-    dois = extract_dois(query)
-    for doi in dois:
-        query = re.sub(f' *{doi} *', ' ', query)
-
-    arxiv_ids = extract_arxiv_ids(query)
-    for arxiv_id in arxiv_ids:
-        query = re.sub(f' *{arxiv_id} *', ' ', query)
+    # names are extracted from the query without IDs, as before the tokenizer
+    spans = tokenize_query(query)
+    query_without_ids = join_text(spans)
 
-    names = extract_names(query)
+    names = extract_names(query_without_ids)
     if names is not None:
-        for name in names:
-            query = re.sub(f' *{name} *', ' ', query)
+        return join_text(split_names(query_without_ids, (_text_span(query_without_ids, 0, len(query_without_ids)),), names))
 
-    return query
+    return query_without_ids
@@ -1,68 +1,226 @@
 import json
 import re
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from scidock.config import logger
-from scidock.utils import filename_from_metadata, save_file_to_repo
+from scidock.network import session
+from scidock.proxy_pool import Proxies
+from scidock.search_engines import arxiv_engine
+from scidock.utils import BoundedCache, extract_domain, filename_from_metadata, save_file_to_repo, single_flight
 
-__all__ = ('attempt_download',)
+__all__ = ('attempt_download', 'prefetch_landing_page', 'register_publisher')
 
+PDF_CONTENT_TYPES = ('application/pdf', 'application/octet-stream')
+LANDING_CACHE_SIZE = 64
 
-def attempt_download(doi: str, proxies: dict[str, str] | None = None) -> tuple[bool, str]:
-    if proxies is None:
-        proxies = {}
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.3'}
-    logger.info(f'Attempting to follow a DOI redirect with DOI = {doi} and proxy configuration: {proxies}')
 
-    publisher_page = requests.get(f'https://doi.org/{doi}', proxies=proxies, headers=headers, timeout=5)
-    soup = BeautifulSoup(publisher_page.text, 'html.parser')
+class LandingPage:
+    # the publisher's page behind the DOI, fetched only as far as the handlers actually need it
+    def __init__(self, doi: str, proxies: Proxies):
+        self.doi = doi
+        self.proxies = proxies
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.3'}
+        # the page may be prefetched in the background while the download is already waiting for it
+        self.lock = threading.RLock()
+        self._response = None
+        self._text = None
 
-    if publisher_page.headers.get('Content-Type') in ('application/pdf', 'application/octet-stream'):
-        logger.info('DOI redirected to a page with plain PDF')
-        title = soup.title.text
-        filename = filename_from_metadata(doi, title)
+    @property
+    def response(self) -> requests.Response:
+        # the body is not downloaded until `text` is accessed
+        with self.lock:
+            if self._response is None:
+                logger.info(f'Following a DOI redirect with DOI = {self.doi} and proxy configuration: {self.proxies}')
+                self._response = session.get(f'https://doi.org/{self.doi}', proxies=self.proxies, headers=self.headers, timeout=5,
+                                             stream=True)
+            return self._response
 
-        return save_file_to_repo(publisher_page.url, filename, doi, title, 'DOI redirect', proxies), publisher_page.url
+    @property
+    def url(self) -> str:
+        return self.response.url
 
-    if doi.startswith('10.1109') or 'IEEE' in soup.title.text:  # IEEE publisher
-        logger.info('DOI redirected to a page of a known publisher: IEEE')
+    @property
+    def content_type(self) -> str | None:
+        return self.response.headers.get('Content-Type')
 
-        metadata_pattern = re.compile(r'xplGlobal.document.metadata=(.*?});', re.MULTILINE | re.DOTALL)
-        script = soup.find('script', string=metadata_pattern)
-        metadata = json.loads(metadata_pattern.search(script.string).group(1))
+    @property
+    def text(self) -> str:
+        with self.lock:
+            if self._text is None:
+                self._text = self.response.text
+            return self._text
 
-        download_link = 'https://ieeexplore.ieee.org' + metadata['pdfPath']
-        download_link = download_link.replace('iel', 'ielx')  # might be unstable
-        title = metadata['displayDocTitle']
-        filename = filename_from_metadata(doi, title)
+    def close(self):
+        # gives the pooled connection back if the body has not been read in full
+        with self.lock:
+            if self._response is not None:
+                self._response.close()
 
-        return save_file_to_repo(download_link, filename, doi, title, 'IEEE', proxies), download_link
+    def soup(self, *args, **kwargs) -> BeautifulSoup:
+        # with arguments, only the matching elements are parsed (see `bs4.SoupStrainer`)
+        parse_only = SoupStrainer(*args, **kwargs) if args or kwargs else None
+        return BeautifulSoup(self.text, 'html.parser', parse_only=parse_only)
 
-    if doi.startswith('10.5772') or 'intechopen' in soup.title.text:  # IntechOpen publisher
-        logger.info('DOI redirected to a page of a known publisher: IntechOpen')
 
-        chapter_id = re.search(r'/chapters/(\d+)', publisher_page.url).group(1)
-        download_link = 'https://www.intechopen.com' + '/chapter/pdf-download/' + chapter_id
-        title = soup.find('h1', class_='title').text
-        filename = filename_from_metadata(doi, title)
+# returns the download link and the title of the paper, or `None` if the publisher's page does not offer one
+PublisherHandler = Callable[[str, str | None, LandingPage], tuple[str, str] | None]
+
+
+@dataclass
+class Publisher:
+    name: str
+    doi_prefixes: tuple[str, ...]
+    domain: str | None
+    handler: PublisherHandler
+
+
+publishers: list[Publisher] = []
+landing_pages = BoundedCache(LANDING_CACHE_SIZE)
+
+
+def register_publisher(name: str, doi_prefixes: tuple[str, ...], domain: str | None = None):
+    def decorator(handler: PublisherHandler) -> PublisherHandler:
+        publishers.append(Publisher(name, doi_prefixes, domain, handler))
+        return handler
+
+    return decorator
+
+
+def find_publisher(doi: str | None = None, domain: str | None = None) -> Publisher | None:
+    for publisher in publishers:
+        if doi is not None and doi.startswith(publisher.doi_prefixes):
+            return publisher
+        if domain is not None and domain == publisher.domain:
+            return publisher
+
+    return None
+
+
+def extract_page_title(landing: LandingPage) -> str | None:
+    title_container = landing.soup('h1', class_='title').find('h1')
+    if title_container is None:
+        return None
+    return title_container.text.strip()
+
+
+@register_publisher('arXiv', ('10.48550/arXiv.',))
+def locate_arxiv(doi: str, title: str | None, _landing: LandingPage) -> tuple[str, str] | None:
+    arxiv_id = doi.removeprefix('10.48550/arXiv.')
+    if title is None:
+        paper = arxiv_engine.lookup(arxiv_id)
+        if paper is None:
+            return None
+        title = paper.title
+
+    return f'https://arxiv.org/pdf/{arxiv_id}', title
+
+
+@register_publisher('IEEE', ('10.1109/',), 'ieee.org')
+def locate_ieee(_doi: str, _title: str | None, landing: LandingPage) -> tuple[str, str] | None:
+    metadata_pattern = re.compile(r'xplGlobal.document.metadata=(.*?});', re.MULTILINE | re.DOTALL)
+    metadata_match = metadata_pattern.search(landing.text)
+    if metadata_match is None:
+        return None
+
+    metadata = json.loads(metadata_match.group(1))
 
-        return save_file_to_repo(download_link, filename, doi, title, 'IntechOpen', proxies), download_link
+    download_link = 'https://ieeexplore.ieee.org' + metadata['pdfPath']
+    download_link = download_link.replace('iel', 'ielx')  # might be unstable
 
-    if doi.startswith('10.3390') or 'mdpi' in soup.title.text:  # MDPI publisher
-        logger.info('DOI redirected to a page of a known publisher: MDPI')
+    return download_link, metadata['displayDocTitle']
 
-        download_link = publisher_page.url.rstrip('/') + '/pdf'
-        title = soup.find('h1', class_='title').text
+
+@register_publisher('IntechOpen', ('10.5772/',), 'intechopen.com')
+def locate_intechopen(doi: str, title: str | None, landing: LandingPage) -> tuple[str, str] | None:
+    chapter_match = re.search(r'/chapters/(\d+)', landing.url)
+    if chapter_match is None:
+        return None
+
+    download_link = 'https://www.intechopen.com' + '/chapter/pdf-download/' + chapter_match.group(1)
+    return download_link, title or extract_page_title(landing) or doi
+
+
+@register_publisher('MDPI', ('10.3390/',), 'mdpi.com')
+def locate_mdpi(doi: str, title: str | None, landing: LandingPage) -> tuple[str, str]:
+    download_link = landing.url.rstrip('/') + '/pdf'
+    # the title only names the file, so the DOI does if the page has none
+    return download_link, title or extract_page_title(landing) or doi
+
+
+def download_from_publisher(publisher: Publisher, doi: str, title: str | None, landing: LandingPage,
+                            proxies: Proxies) -> tuple[bool, str] | None:
+    logger.info(f'Attempting to download the paper from a known publisher: {publisher.name}')
+
+    download_target = publisher.handler(doi, title, landing)
+    if download_target is None:
+        return None
+
+    download_link, title = download_target
+    filename = filename_from_metadata(doi, title)
+
+    return save_file_to_repo(download_link, filename, doi, title, publisher.name, proxies), download_link
+
+
+@single_flight(landing_pages)
+def get_landing_page(doi: str, proxies: Proxies) -> LandingPage:
+    return LandingPage(doi, proxies)
+
+
+def prefetch_landing_page(doi: str, proxies: Proxies | None = None):
+    landing = get_landing_page(doi, proxies or {})
+    if landing.content_type in PDF_CONTENT_TYPES:
+        landing.response.close()
+    else:
+        _ = landing.text
+
+
+def attempt_download(doi: str, proxies: Proxies | None = None, title: str | None = None) -> tuple[bool, str]:
+    if proxies is None:
+        proxies = {}
+
+    # a prefetched page serves a single download, so that retries request it anew
+    landing = get_landing_page(doi, proxies)
+    try:
+        return download_from_landing(doi, title, landing, proxies)
+    finally:
+        landing_pages.discard(doi)
+        landing.close()
+
+
+def download_from_landing(doi: str, title: str | None, landing: LandingPage, proxies: Proxies) -> tuple[bool, str]:
+    # known DOI prefixes often allow to skip downloading (or even requesting) the landing page altogether
+    prefix_publisher = find_publisher(doi=doi)
+    if prefix_publisher is not None:
+        download_result = download_from_publisher(prefix_publisher, doi, title, landing, proxies)
+        if download_result is not None:
+            return download_result
+
+    if landing.content_type in PDF_CONTENT_TYPES:
+        logger.info('DOI redirected to a page with plain PDF')
+        landing.response.close()
+        if title is None:
+            title = doi
         filename = filename_from_metadata(doi, title)
 
-        return save_file_to_repo(download_link, filename, doi, title, 'MDPI', proxies), download_link
+        return save_file_to_repo(landing.url, filename, doi, title, 'DOI redirect', proxies), landing.url
+
+    publisher = find_publisher(domain=extract_domain(landing.url))
+    if publisher is not None and publisher is not prefix_publisher:
+        logger.info(f'DOI redirected to a page of a known publisher: {publisher.name}')
+        download_result = download_from_publisher(publisher, doi, title, landing, proxies)
+        if download_result is not None:
+            return download_result
 
+    soup = landing.soup()
     download_text_match = soup.find(string=re.compile(r'\bdownload\b', re.IGNORECASE))
     pdf_text_match = soup.find(string=re.compile('PDF', re.IGNORECASE))
     if download_text_match is not None or pdf_text_match is not None:
-        return False, publisher_page.url
+        return False, landing.url
 
     return False, ''
@@ -0,0 +1,172 @@
+import threading
+from dataclasses import dataclass
+
+import requests
+
+from scidock import storage
+from scidock.config import logger
+from scidock.deadline import DeadlineExceededError
+from scidock.negative_cache import forget_dead_ends, lookup_dead_end, record_dead_end, suppress_dead_ends
+from scidock.parsers.web_parser import attempt_download, prefetch_landing_page
+from scidock.proxy_pool import Proxies
+from scidock.search_engines import arxiv_engine as arxiv
+from scidock.search_engines import crossref_engine as crossref
+from scidock.search_engines import scihub_engine as scihub
+from scidock.utils import filename_from_metadata, materialize_stored_paper, save_file_to_repo
+
+__all__ = ('DownloadOutcome', 'SourceSpeculator', 'download_paper', 'prefetch_sources')
+
+# how long a search result has to stay highlighted before its sources are resolved
+DWELL_TIME = 0.6
+
+
+@dataclass
+class DownloadOutcome:
+    success: bool
+    source: str | None = None
+    recommended_url: str | None = None
+    timed_out: bool = False
+
+
+def download_open_access(doi: str, proxies: Proxies | None) -> bool:
+    # links deposited in CrossRef point straight to a PDF, so neither mirrors nor HTML parsing are involved
+    if lookup_dead_end('open access', doi) is not None:
+        return False
+
+    try:
+        open_access = crossref.lookup_open_access(doi)
+    except requests.exceptions.RequestException as e:
+        logger.info(f'Could not retrieve open access links for {doi = }: {e!r}')
+        return False
+
+    if not open_access:
+        record_dead_end('open access', doi, 'CrossRef lists no PDF links or preprints')
+        return False
+
+    filename = filename_from_metadata(doi, open_access.title)
+    candidates = [(link, 'CrossRef link', proxies) for link in open_access.pdf_links]
+    # the version of record goes first and the preprint is the fallback; arXiv is reached without proxies, as in `arxiv_engine`
+    candidates += [(arxiv.ArXivItem(open_access.title, arxiv_id).pdf_url, 'arXiv preprint', None)
+                   for arxiv_id in open_access.preprint_arxiv_ids]
+
+    for download_link, caller_id, link_proxies in candidates:
+        try:
+            if save_file_to_repo(download_link, filename, doi, open_access.title, caller_id, link_proxies):
+                return True
+        except requests.exceptions.RequestException as e:
+            logger.info(f'Download from {download_link} failed: {e!r}')
+
+    record_dead_end('open access', doi, 'None of the links listed by CrossRef leads to a PDF')
+    return False
+
+
+def download_paper(doi: str, proxies: Proxies | None = None, title: str | None = None) -> DownloadOutcome:
+    try:
+        return try_sources(doi, proxies, title)
+    except DeadlineExceededError as e:
+        # the sources that have not been reached in time are not recorded as dead ends, so that the next attempt tries them
+        logger.warning(f'Stopped looking for a copy of {doi = }: {e}')
+        dead_end = lookup_dead_end('publisher', doi)
+        recommended_url = dead_end.get('url') if dead_end is not None else f'https://doi.org/{doi}'
+        return DownloadOutcome(False, recommended_url=recommended_url, timed_out=True)
+
+
+def try_sources(doi: str, proxies: Proxies | None, title: str | None) -> DownloadOutcome:
+    # sources are tried from the cheapest and most reliable to the least predictable one
+    if materialize_stored_paper(doi):
+        return DownloadOutcome(True, 'store')
+
+    # arXiv DOIs are registered with DataCite rather than CrossRef, so they go straight to arXiv
+    arxiv_ids = arxiv.extract_arxiv_ids(doi, allow_overlap=True, strict=True)
+    if arxiv_ids:
+        if arxiv.download(arxiv_ids[0]):
+            return DownloadOutcome(True, 'arXiv')
+    elif download_open_access(doi, proxies):
+        forget_dead_ends(doi)
+        return DownloadOutcome(True, 'open access')
+
+    if scihub.download(doi, proxies):
+        forget_dead_ends(doi)
+        return DownloadOutcome(True, 'Sci-Hub')
+
+    dead_end = lookup_dead_end('publisher', doi)
+    if dead_end is not None:
+        return DownloadOutcome(False, recommended_url=dead_end.get('url'))
+
+    attempt_success, recommended_url = attempt_download(doi, proxies, title)
+    if attempt_success:
+        forget_dead_ends(doi)
+        return DownloadOutcome(True, 'publisher')
+
+    record_dead_end('publisher', doi, 'Publisher page has no PDF', url=recommended_url)
+    return DownloadOutcome(False, recommended_url=recommended_url)
+
+
+def prefetch_sources(doi: str, proxies: Proxies | None, title: str | None, cancelled: threading.Event):
+    # walks through the stages of `download_paper` without downloading, so that the probes of the mirrors and of the
+    # publisher's page are cached by the time the paper is chosen; stops between the stages once `cancelled` is set
+    if cancelled.is_set() or storage.lookup(doi) is not None:
+        return
+
+    with suppress_dead_ends():
+        arxiv_ids = arxiv.extract_arxiv_ids(doi, allow_overlap=True, strict=True)
+        if arxiv_ids:
+            if not cancelled.is_set():
+                arxiv.lookup(arxiv_ids[0])
+            return
+
+        if cancelled.is_set() or (lookup_dead_end('open access', doi) is None and crossref.lookup_open_access(doi)):
+            return
+
+        if cancelled.is_set() or scihub.locate(doi, proxies or {}) is not None:
+            return
+
+        if cancelled.is_set() or lookup_dead_end('publisher', doi) is not None:
+            return
+
+        prefetch_landing_page(doi, proxies)
+
+
+class SourceSpeculator:
+    # resolves the sources of the highlighted search result in the background while the user is still choosing
+    def __init__(self, proxies: Proxies | None, dwell_time: float = DWELL_TIME):
+        self.proxies = proxies
+        self.dwell_time = dwell_time
+        self.lock = threading.Lock()
+        self.highlighted_doi = None
+        self.timer = None
+        self.cancelled = threading.Event()
+
+    def highlight(self, doi: str | None, title: str | None = None):
+        with self.lock:
+            if doi == self.highlighted_doi:
+                return
+
+            # requests that are already in flight are completed (and cached), but the following stages are skipped
+            self.cancel_pending()
+            self.highlighted_doi = doi
+            if doi is None:
+                return
+
+            self.cancelled = threading.Event()
+            self.timer = threading.Timer(self.dwell_time, self.prefetch, args=(doi, title, self.cancelled))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def prefetch(self, doi: str, title: str | None, cancelled: threading.Event):
+        logger.debug(f'Resolving the sources of {doi = } in advance')
+        try:
+            prefetch_sources(doi, self.proxies, title, cancelled)
+        except Exception as e:  # failures are left for the actual download to report
+            logger.debug(f'Could not resolve the sources of {doi = } in advance: {e!r}')
+
+    def cancel_pending(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.cancelled.set()
+
+    def stop(self):
+        # the resolution that is already running for the chosen paper is kept, the download joins it
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import cache
+
+import requests
+
+from scidock.config import load_config, logger
+
+__all__ = ('Proxies', 'ProxyPool', 'ProxyState', 'format_proxy_url', 'get_proxy_pool', 'load_proxy_settings')
+
+PROBE_URL = 'https://doi.org/'
+PROBE_TIMEOUT = 5
+
+# weight of the latest observation in the moving averages
+SMOOTHING = 0.2
+INITIAL_LATENCY = 1.0
+
+# a proxy is ejected after this many consecutive connection failures and re-probed with exponential backoff
+MAX_CONSECUTIVE_FAILURES = 3
+INITIAL_EJECTION_TIME = 30.0
+MAX_EJECTION_TIME = 15 * 60.0
+
+# only connection-level problems are the proxy's fault; HTTP errors come from the target website
+PROXY_ERRORS = (requests.exceptions.ProxyError, requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def format_proxy_url(proxy_setting: dict) -> str:
+    return f'{proxy_setting["type"]}://{proxy_setting["ip"]}:{proxy_setting["port"]}'
+
+
+@dataclass
+class ProxyState:
+    url: str
+    latency: float = INITIAL_LATENCY
+    error_rate: float = 0.0
+    consecutive_failures: int = 0
+    ejection_time: float = INITIAL_EJECTION_TIME
+    ejected_until: float | None = None
+    probing: bool = field(default=False, repr=False)
+
+    @property
+    def requests_proxies(self) -> dict[str, str]:
+        return {'http': self.url, 'https': self.url}
+
+    @property
+    def weight(self) -> float:
+        return (1 - self.error_rate) / self.latency + 1e-6
+
+    def is_healthy(self, now: float) -> bool:
+        return self.ejected_until is None or self.ejected_until <= now
+
+
+class ProxyPool:
+    # passed as `proxies` to `scidock.network.session`, which picks a proxy for every request and reports how it went
+    def __init__(self, proxy_urls: list[str]):
+        self.lock = threading.Lock()
+        self.states = [ProxyState(url) for url in proxy_urls]
+
+    def __bool__(self) -> bool:
+        return bool(self.states)
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def __repr__(self) -> str:
+        return f'ProxyPool({", ".join(state.url for state in self.states)})'
+
+    def select(self) -> ProxyState:
+        now = time.monotonic()
+        with self.lock:
+            healthy_states = [state for state in self.states if state.is_healthy(now)]
+            if not healthy_states:
+                # everything is down; the proxy that is going to be re-probed first is the best bet
+                return min(self.states, key=lambda state: state.ejected_until)
+
+            return random.choices(healthy_states, weights=[state.weight for state in healthy_states], k=1)[0]
+
+    def report(self, state: ProxyState, latency: float | None):
+        # `latency` is None if the request failed because of the proxy
+        with self.lock:
+            if latency is not None:
+                state.latency = (1 - SMOOTHING) * state.latency + SMOOTHING * latency
+                state.error_rate *= 1 - SMOOTHING
+                state.consecutive_failures = 0
+                state.ejection_time = INITIAL_EJECTION_TIME
+                state.ejected_until = None
+                return
+
+            state.error_rate = (1 - SMOOTHING) * state.error_rate + SMOOTHING
+            state.consecutive_failures += 1
+            if state.consecutive_failures < MAX_CONSECUTIVE_FAILURES or state.ejected_until is not None:
+                return
+
+            state.ejected_until = time.monotonic() + state.ejection_time
+            logger.warning(f'Proxy {state.url} is ejected for {state.ejection_time:.0f} s after {state.consecutive_failures} failures')
+
+        self.schedule_probe(state)
+
+    def schedule_probe(self, state: ProxyState):
+        def probe_later():
+            time.sleep(max(state.ejected_until - time.monotonic(), 0))
+            latency = self.probe(state)
+
+            with self.lock:
+                state.probing = False
+                if latency is None:
+                    state.ejection_time = min(state.ejection_time * 2, MAX_EJECTION_TIME)
+                    state.ejected_until = time.monotonic() + state.ejection_time
+                    logger.info(f'Proxy {state.url} is still unavailable, next probe in {state.ejection_time:.0f} s')
+
+            if latency is None:
+                self.schedule_probe(state)
+            else:
+                logger.info(f'Proxy {state.url} is back with latency of {latency:.2f} s')
+                self.report(state, latency)
+
+        with self.lock:
+            if state.probing:
+                return
+            state.probing = True
+
+        threading.Thread(target=probe_later, daemon=True).start()
+
+    @staticmethod
+    def probe(state: ProxyState) -> float | None:
+        start_time = time.monotonic()
+        try:
+            requests.head(PROBE_URL, proxies=state.requests_proxies, timeout=PROBE_TIMEOUT)
+        except PROXY_ERRORS as e:
+            logger.debug(f'Probe of {state.url} failed: {e!r}')
+            return None
+        return time.monotonic() - start_time
+
+    def probe_all(self) -> list[tuple[ProxyState, float | None]]:
+        if not self.states:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(self.states)) as pool:
+            latencies = list(pool.map(self.probe, self.states))
+
+        for state, latency in zip(self.states, latencies, strict=True):
+            self.report(state, latency)
+
+        return list(zip(self.states, latencies, strict=True))
+
+
+# what the network functions accept as `proxies`: a pool to pick from or a plain `requests` mapping
+Proxies = ProxyPool | dict[str, str]
+
+
+def load_proxy_settings(config: dict) -> list[dict]:
+    # configurations written before proxy pools existed store a single `proxy`
+    if 'proxies' in config:
+        return config['proxies']
+    return [config['proxy']] if config.get('proxy') else []
+
+
+@cache
+def get_proxy_pool() -> ProxyPool:
+    return ProxyPool([format_proxy_url(proxy_setting) for proxy_setting in load_proxy_settings(load_config())])
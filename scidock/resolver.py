@@ -0,0 +1,69 @@
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+
+import requests
+from arxiv import ArxivError
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from scidock.config import logger
+from scidock.deadline import DeadlineExceededError
+from scidock.parsers.query_parser import analyze_queries
+from scidock.search_engines import arxiv_engine as arxiv
+from scidock.search_engines import crossref_engine as crossref
+
+__all__ = ('Resolution', 'resolve_titles')
+
+CANDIDATES_PER_ENGINE = 5
+
+
+@dataclass
+class Resolution:
+    title: str
+    DOI: str | None = None
+    matched_title: str | None = None
+    confidence: float = 0.0
+    reason: str | None = None
+
+
+def best_match(title: str, candidates: list) -> Resolution:
+    # noinspection PyTypeChecker
+    match = process.extractOne(title, [candidate.title for candidate in candidates], scorer=fuzz.token_sort_ratio,
+                               processor=default_process)
+    if match is None:
+        return Resolution(title)
+
+    _, score, index = match
+    return Resolution(title, candidates[index].DOI, candidates[index].title, round(score / 100, 3))
+
+
+def resolve_title(title: str, threshold: float) -> Resolution:
+    try:
+        resolution = best_match(title, list(islice(crossref.search(title), CANDIDATES_PER_ENGINE)))
+
+        # arXiv is only asked when CrossRef has nothing suitable, as its rate limit is much stricter
+        if resolution.confidence < threshold:
+            arxiv_resolution = best_match(title, list(islice(arxiv.search(title), CANDIDATES_PER_ENGINE)))
+            resolution = max(resolution, arxiv_resolution, key=lambda candidate: candidate.confidence)
+    except (requests.exceptions.RequestException, ArxivError, DeadlineExceededError, ValueError) as e:
+        # a single failed title must not abort the rest of the batch
+        logger.warning(f'Failed to resolve "{title}": {e!r}')
+        return Resolution(title, reason=f'{type(e).__name__}: {e}')
+
+    if resolution.confidence < threshold:
+        logger.info(f'Best match for "{title}" is below the threshold: {resolution}')
+        return Resolution(title, confidence=resolution.confidence)
+
+    return resolution
+
+
+def resolve_titles(titles: Iterable[str], threshold: float, max_workers: int) -> Iterator[Resolution]:
+    titles = [title.strip() for title in titles if title.strip()]
+
+    # query analysis is fetched for all of the titles at once rather than one request per title
+    analyze_queries(titles)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        yield from pool.map(lambda title: resolve_title(title, threshold), titles)
@@ -0,0 +1,107 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import arxiv
+import requests
+import urllib3
+
+from scidock.config import logger
+from scidock.pipeline import download_paper
+from scidock.proxy_pool import Proxies
+from scidock.utils import edit_json, load_json
+
+__all__ = ('RetryReport', 'backoff_delay', 'retry_recent_searches')
+
+BACKOFF_BASE = 2.0
+BACKOFF_CAP = 60.0
+
+TRANSIENT_ERRORS = (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, arxiv.ArxivError)
+
+
+@dataclass
+class RetryReport:
+    succeeded: list[str] = field(default_factory=list)
+    failed: dict[str, str] = field(default_factory=dict)
+
+
+def backoff_delay(attempt: int) -> float:
+    # "full jitter", so that entries failing on the same mirror do not retry in lockstep
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def retry_entry(doi: str, title: str, proxies: Proxies | None, attempts: int) -> str | None:
+    # returns the reason of the last failure or None if the paper has been downloaded
+    reason = None
+
+    for attempt in range(attempts):
+        if attempt:
+            time.sleep(backoff_delay(attempt - 1))
+
+        try:
+            outcome = download_paper(doi, proxies, title)
+        except TRANSIENT_ERRORS as e:
+            reason = repr(e)
+            logger.info(f'Retry {attempt + 1}/{attempts} of {doi = } failed: {reason}')
+            continue
+
+        if outcome.success:
+            return None
+
+        reason = 'No downloadable copy found'
+        if outcome.recommended_url:
+            reason += f', try {outcome.recommended_url}'
+        logger.info(f'Retry {attempt + 1}/{attempts} of {doi = } failed: {reason}')
+
+    return reason
+
+
+def record_result(repository_path: str, key: str, reason: str | None, attempts: int):
+    with edit_json(f'{repository_path}/.scidock/content.json') as repository_content:
+        recent_searches = repository_content.setdefault('recent_searches', {})
+        if key not in recent_searches:
+            return
+
+        if reason is None:
+            del recent_searches[key]
+            return
+
+        entry = recent_searches[key]
+        entry['attempts'] = entry.get('attempts', 0) + attempts
+        entry['last_attempt'] = datetime.now(timezone.utc).isoformat(timespec='seconds')  # noqa: UP017 - `datetime.UTC` requires Python 3.11
+        entry['last_error'] = reason
+
+
+def retry_recent_searches(repository_path: str, proxies: Proxies | None = None, jobs: int = 4, attempts: int = 3) -> RetryReport:
+    report = RetryReport()
+    recent_searches = load_json(f'{repository_path}/.scidock/content.json').get('recent_searches', {})
+    if not recent_searches:
+        return report
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for key, entry in recent_searches.items():
+            if entry.get('DOI') in (None, 'None'):
+                report.failed[key] = 'Entry has no DOI'
+                continue
+            futures[pool.submit(retry_entry, entry['DOI'], entry.get('title'), proxies, attempts)] = key
+
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                reason = future.result()
+            except Exception as e:  # one broken entry should not abort the rest of the retries
+                reason = repr(e)
+
+            # every result is persisted as soon as it is known, so an interrupted run loses nothing
+            record_result(repository_path, key, reason, attempts)
+            if reason is None:
+                report.succeeded.append(key)
+            else:
+                report.failed[key] = reason
+
+    logger.info(f'Retried {len(recent_searches)} entries: {len(report.succeeded)} succeeded, {len(report.failed)} failed')
+
+    return report
@@ -1,29 +1,45 @@
+import csv
+import json
 import platform
 import re
 import subprocess
+import threading
+from collections import Counter
 from collections.abc import Iterator
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import asdict
+from dataclasses import asdict, astuple, fields
 from ipaddress import IPv4Address, IPv6Address
-from itertools import chain
+from itertools import islice, takewhile
 from pathlib import Path
 from pprint import pformat
 
 import click
 import questionary
+import requests
 from click_params import IP_ADDRESS
 from rapidfuzz import fuzz, process
 from rapidfuzz.utils import default_process
 
 from scidock.config import logger
-from scidock.parsers.web_parser import attempt_download
+from scidock.deadline import DeadlineExceededError, expired, remaining, set_deadline, until_deadline
+from scidock.export import export_bibtex, export_csl
+from scidock.job_queue import JOB_STATES, add_jobs, cancel_jobs, list_jobs, run_queue
+from scidock.layout import LAYOUTS, get_layout
+from scidock.library import get_repository_paths, load_library
+from scidock.library_index import load_indexes, search_indexes
+from scidock.parsers.query_parser import clear_query
+from scidock.pipeline import SourceSpeculator, download_paper
+from scidock.proxy_pool import Proxies, get_proxy_pool, load_proxy_settings
+from scidock.resolver import Resolution, resolve_titles
+from scidock.retry import retry_recent_searches
 from scidock.search_engines import arxiv_engine as arxiv
 from scidock.search_engines import crossref_engine as crossref
-from scidock.search_engines import scihub_engine as scihub
 from scidock.search_engines.metadata import Metadata
-from scidock.ui import progress_bar
+from scidock.sync import migrate_repository, sync_repository
+from scidock.ui import LiveChoices, progress_bar
 from scidock.utils import (
     dump_json,
+    edit_json,
     get_current_proxy_setting,
     get_default_repository_path,
     load_json,
@@ -32,67 +48,129 @@ from scidock.utils import (
     require_initialized_repository,
 )
 
-FUZZY_MATCH_RATE = 75
+
+def extract_title(paper: str) -> str | None:
+    # search results are rendered as "<title>. DOI: <DOI>"
+    split_location = re.search(r'\. DOI: ', paper)
+    if split_location is None:
+        return None
+    return paper[:split_location.start()]
 
 
 def update_recent_searches(paper: str):
     split_location = re.search(r'\. DOI: ', paper)
     title, doi = paper[:split_location.start()], paper[split_location.end():]
 
-    repository_path = get_default_repository_path()
-    content_path = f'{repository_path}/.scidock/content.json'
+    with edit_json(f'{get_default_repository_path()}/.scidock/content.json') as repository_content:
+        repository_content['recent_searches'][title] = asdict(Metadata(title, doi))
 
-    repository_content = load_json(content_path)
-    repository_content['recent_searches'][title] = asdict(Metadata(title, doi))
-    dump_json(repository_content, content_path)
 
+LOGGING_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
 
-def precalculate_lazy_iterator(iterator: Iterator) -> Iterator:
-    first_element = next(iterator, None)
-    if first_element is None:
-        return iterator
-    return chain((first_element,), iterator)
+# number of leading results of each engine that get re-ranked against the query before being shown
+CROSSREF_WINDOW_SIZE = 8
+ARXIV_WINDOW_SIZE = 5
 
+# share of the title similarity in the blended score (the rest is the engine's own relevance)
+SIMILARITY_WEIGHT = 0.7
 
-def split_search_results(query: str, arxiv_results: Iterator, search_results: Iterator) -> tuple[list, Iterator]:
-    # approach of defining the cutoff value for CrossRef relevance scores
-    search_prefix = []
-    prefix_score_ratios = []
-    prefix_max = -1
-    previous_score = 0
+CSL_SEPARATOR = ',\n'
 
-    progress_bar.update('Searching the CrossRef database...')
 
-    arxiv_ids = arxiv.extract_arxiv_ids(query)
+def rerank_search_window(query: str, crossref_window: list, arxiv_window: list) -> list[tuple[object, float]]:
+    candidates = crossref_window + arxiv_window
+    if not candidates:
+        return []
+
+    # CrossRef provides comparable relevance scores, while arXiv only provides the order of its results
+    max_crossref_score = max((result.relevance_score or 0 for result in crossref_window), default=1) or 1
+    engine_scores = [(result.relevance_score or 0) / max_crossref_score for result in crossref_window]
+    engine_scores += [1 - index / len(arxiv_window) for index in range(len(arxiv_window))]
 
-    if arxiv_ids:
-        search_prefix += list(map(str, arxiv_results))
+    similarities = [0.0] * len(candidates)
+    query_text = clear_query(query).strip()
+    if query_text:
+        # noinspection PyTypeChecker
+        for _, similarity, index in process.extract(query_text, [result.title for result in candidates], scorer=fuzz.WRatio,
+                                                    processor=default_process, limit=None):
+            similarities[index] = similarity / 100
+
+    query_dois = {doi.lower() for doi in crossref.extract_dois(query)}
 
-    with ThreadPoolExecutor() as pool:
-        arxiv_future = pool.submit(precalculate_lazy_iterator, arxiv_results)
-        search_future = pool.submit(precalculate_lazy_iterator, search_results)
+    scored_candidates = []
+    for result, similarity, engine_score in zip(candidates, similarities, engine_scores, strict=True):
+        score = SIMILARITY_WEIGHT * similarity + (1 - SIMILARITY_WEIGHT) * engine_score
+        if result.DOI is not None and result.DOI.lower() in query_dois:
+            score += 1  # explicitly requested papers always come first
+        scored_candidates.append((result, score))
 
-        arxiv_results = arxiv_future.result()
-        progress_bar.update('Searching through the arXiv preprints...')
-        search_results = search_future.result()
+    return sorted(scored_candidates, key=lambda candidate: candidate[1], reverse=True)
 
-    for search_result in search_results:
-        search_prefix.append(str(search_result))
 
-        prefix_max = max(prefix_max, search_result.relevance_score)
-        prefix_score_ratios.append((search_result.relevance_score - previous_score) / prefix_max)
-        if len(search_prefix) >= 8:  # noqa: PLR2004 - arbitrary number, should be tweaked afterwards
-            best_score_ratio = prefix_score_ratios.index(max(prefix_score_ratios[1:]))
-            insert_point = best_score_ratio + 2
-            search_prefix.insert(insert_point, questionary.Separator())
-            search_prefix[insert_point:insert_point] = [str(next(arxiv_results, '')) for _ in range(5)]
-            search_prefix = list(filter(lambda result: result, search_prefix))
+def divide_search_window(ranked_window: list[tuple[object, float]]) -> list:
+    choices = [str(result) for result, _ in ranked_window]
 
-            break
+    # the dividing line goes where the blended score drops the most
+    if len(ranked_window) > 1:
+        score_drops = [ranked_window[i][1] - ranked_window[i + 1][1] for i in range(len(ranked_window) - 1)]
+        choices.insert(score_drops.index(max(score_drops)) + 1, questionary.Separator())
 
-    search_results = random_chain(search_results, arxiv_results, weights=[0.4, 0.6])
+    return choices
 
-    return search_prefix, search_results
+
+def split_search_results(query: str, arxiv_results: Iterator, search_results: Iterator) -> tuple[LiveChoices, Iterator]:
+    # both engines fill their windows in the background; the prompt opens with the first result and is re-ranked on every next one
+    arxiv_ids = arxiv.extract_arxiv_ids(query)
+    live_results = LiveChoices(len(arxiv_ids) + CROSSREF_WINDOW_SIZE + ARXIV_WINDOW_SIZE + 1)
+
+    lock = threading.Lock()
+    id_results, crossref_window, arxiv_window = [], [], []
+    pending_engines = ['CrossRef', 'arXiv']
+
+    def publish():
+        with lock:
+            ranked_window = rerank_search_window(query, list(crossref_window), list(arxiv_window))
+            live_results.update([str(result) for result in id_results] + divide_search_window(ranked_window))
+
+    def collect(engine_name: str, results: Iterator, window: list, window_size: int):
+        try:
+            if engine_name == 'arXiv' and arxiv_ids:
+                id_results.extend(results)
+
+            # the prompt may stop waiting for this engine, see `search`
+            for result in takewhile(lambda _: not live_results.finished.is_set(), islice(results, window_size)):
+                with lock:
+                    window.append(result)
+                publish()
+        except requests.exceptions.RequestException as e:
+            logger.warning(f'{engine_name} search failed: {e!r}')
+        except DeadlineExceededError:
+            logger.warning(f'{engine_name} search ran out of time with {len(window)} results')
+        except Exception:
+            # a malformed response or an unexpected error of the client, which would otherwise just leave the engine empty
+            logger.exception(f'{engine_name} search failed unexpectedly')
+        finally:
+            with lock:
+                pending_engines.remove(engine_name)
+                finished = not pending_engines
+
+            if finished:
+                try:
+                    # every result has already been published on arrival, unless the prompt has stopped waiting for it
+                    if not live_results.finished.is_set():
+                        publish()
+                finally:
+                    live_results.finish()
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    pool.submit(collect, 'CrossRef', search_results, crossref_window, CROSSREF_WINDOW_SIZE)
+    pool.submit(collect, 'arXiv', arxiv_results, arxiv_window, ARXIV_WINDOW_SIZE)
+    pool.shutdown(wait=False)
+
+    # the engines are not asked for more results once the deadline has passed, see `search`
+    search_results = until_deadline(random_chain(search_results, arxiv_results, weights=[0.4, 0.6]))
+
+    return live_results, search_results
 
 
 @click.group()
@@ -105,19 +183,200 @@ def config():
     pass
 
 
-# TODO: create `scidock test proxy`
+@config.command('bandwidth')
+@click.argument('limit', type=click.IntRange(min=0))
+def bandwidth_configuration(limit: int):
+    # total for all of the concurrent downloads, in KB/s; 0 removes the limit
+    scidock_root = Path('~/.scidock').expanduser()
+
+    with edit_json(scidock_root / 'config.json') as current_config:
+        current_config['bandwidth_limit'] = limit
+
+    click.echo('Successfully configured bandwidth limit!')
+
+
+@config.command('crossref')
+@click.option('--rows', type=click.IntRange(1, 1000), default=None, help='Number of search results requested from CrossRef at once')
+@click.option('--cursor/--no-cursor', default=None,
+              help='Whether to page through the search results with a cursor (unlimited depth) or with offsets (up to 10000 results)')
+def crossref_configuration(rows: int | None, cursor: bool | None):
+    scidock_root = Path('~/.scidock').expanduser()
+
+    with edit_json(scidock_root / 'config.json') as current_config:
+        search_settings = current_config.setdefault('crossref', {})
+        if rows is not None:
+            search_settings['rows'] = rows
+        if cursor is not None:
+            search_settings['cursor'] = cursor
+
+    click.echo('Successfully configured CrossRef search!')
+
+
+@config.command('logging')
+@click.option('--level', 'levels', type=str, multiple=True, metavar='LIBRARY=LEVEL',
+              help='Minimal level of the records from the library (e.g. urllib3=DEBUG). Can be specified multiple times')
+@click.option('--default-level', type=click.Choice(LOGGING_LEVELS, case_sensitive=False), default=None,
+              help='Minimal level of the records from the libraries that are not configured explicitly')
+@click.option('--file-level', type=click.Choice(LOGGING_LEVELS, case_sensitive=False), default=None,
+              help='Minimal level of the records written to the log files')
+@click.option('--json/--no-json', 'json_sink', default=None, help='Whether to additionally write structured logs to scidock.jsonl')
+def logging_configuration(levels: tuple[str, ...], default_level: str | None, file_level: str | None, json_sink: bool | None):
+    scidock_root = Path('~/.scidock').expanduser()
+
+    with edit_json(scidock_root / 'config.json') as current_config:
+        logging_config = current_config.setdefault('logging', {})
+
+        for library_level in levels:
+            library, _, level = library_level.partition('=')
+            if level.upper() not in LOGGING_LEVELS:
+                raise click.BadParameter(f'Unknown logging level in "{library_level}"')
+            logging_config.setdefault('levels', {})[library] = level.upper()
+
+        if default_level is not None:
+            logging_config['default_level'] = default_level.upper()
+        if file_level is not None:
+            logging_config['file_level'] = file_level.upper()
+        if json_sink is not None:
+            logging_config['json'] = json_sink
+
+    click.echo('Successfully configured logging!')
+
 
 @config.command('proxy')
 @click.argument('proxy_type', type=click.Choice(['http', 'socks5'], case_sensitive=False))
 @click.argument('ip', type=IP_ADDRESS)
 @click.argument('port', type=int)
-def proxy_configuration(proxy_type: str, ip: IPv4Address | IPv6Address, port: int):
+@click.option('--add', 'action', flag_value='add', help='Add the proxy to the pool instead of replacing the whole pool with it')
+@click.option('--remove', 'action', flag_value='remove', help='Remove the proxy from the pool')
+def proxy_configuration(proxy_type: str, ip: IPv4Address | IPv6Address, port: int, action: str | None):
     scidock_root = Path('~/.scidock').expanduser()
-    current_config = load_json(scidock_root / 'config.json')
-    current_config['proxy'] = {'type': proxy_type, 'ip': str(ip), 'port': port}
-    dump_json(current_config, scidock_root / 'config.json')
+    proxy_setting = {'type': proxy_type.lower(), 'ip': str(ip), 'port': port}
+
+    with edit_json(scidock_root / 'config.json') as current_config:
+        proxy_settings = load_proxy_settings(current_config)
+
+        match action:
+            case 'add':
+                if proxy_setting not in proxy_settings:
+                    proxy_settings.append(proxy_setting)
+            case 'remove':
+                if proxy_setting not in proxy_settings:
+                    click.echo('This proxy is not configured!', err=True)
+                    return
+                proxy_settings.remove(proxy_setting)
+            case _:
+                proxy_settings = [proxy_setting]
+
+        # the legacy single `proxy` is only dropped once the pool replacing it is in place
+        current_config['proxies'] = proxy_settings
+        current_config.pop('proxy', None)
+
+    click.echo(f'Successfully configured proxy! Proxies in the pool: {len(proxy_settings)}')
+
+
+@click.group()
+def test():
+    pass
+
+
+@test.command('proxy')
+def proxy_test():
+    proxy_pool = get_proxy_pool()
+    if not proxy_pool:
+        click.echo('No proxies are configured! See `scidock config proxy --help`', err=True)
+        return
+
+    progress_bar.start()
+    progress_bar.update(f'Probing {len(proxy_pool)} proxies...')
+    probe_results = proxy_pool.probe_all()
+    progress_bar.stop()
+
+    for state, latency in probe_results:
+        click.echo(f'{state.url}: ' + (f'OK, {latency * 1000:.0f} ms' if latency is not None else 'unavailable'))
+
+
+@click.group()
+def queue():
+    pass
+
+
+@queue.command('add')
+@click.argument('papers', nargs=-1)
+@click.option('-f', '--file', 'papers_file', type=click.File('r', encoding='utf-8'), default=None,
+              help='File with one paper per line (a DOI or a search result like "Title. DOI: 10.1000/xyz")')
+@click.option('--priority', type=int, default=0, help='Jobs with higher priority are downloaded first')
+@click.option('--attempts', type=click.IntRange(min=1), default=3, help='Number of attempts per paper, with exponential backoff in between')
+@require_initialized_repository
+def queue_add(papers: tuple[str, ...], papers_file, priority: int, attempts: int):
+    lines = list(papers) + ([line.strip() for line in papers_file if line.strip()] if papers_file is not None else [])
+
+    queued_papers = []
+    for line in lines:
+        line_dois = crossref.extract_dois(line)
+        if len(line_dois) != 1:
+            click.echo(f'Skipping {line!r}: DOI is either not specified or ambiguous', err=True)
+            continue
+        queued_papers.append((line_dois[0], extract_title(line)))
 
-    click.echo('Successfully configured proxy!')
+    job_ids, completed = add_jobs(get_default_repository_path(), queued_papers, priority, attempts)
+
+    for doi in completed:
+        click.echo(f'{doi} has already been downloaded')
+    click.echo(f'Queued {len(job_ids)} papers! Run `scidock queue run` to download them')
+
+
+@queue.command('run')
+@click.option('--proxy', is_flag=True, default=False, help='Whether to use a proxy in download requests')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=4, help='Number of papers downloaded concurrently')
+@require_initialized_repository
+def queue_run(proxy: bool, jobs: int):
+    proxies = {}
+    if proxy:
+        proxies = get_current_proxy_setting()
+
+    progress_bar.start()
+    progress_bar.update('Downloading the queued papers...')
+    results = run_queue(get_default_repository_path(), proxies, jobs)
+    progress_bar.stop()
+
+    if not results:
+        running_jobs = list_jobs(get_default_repository_path(), ('running',))
+        click.echo(f'{len(running_jobs)} papers are being downloaded by another run!' if running_jobs else 'Nothing to download!')
+        return
+
+    click.echo(f'Downloaded {results["done"]} papers, {results["failed"]} attempts failed. See `scidock queue status` for details')
+
+
+@queue.command('status')
+@click.option('--all', 'show_all', is_flag=True, default=False, help='Whether to list completed and cancelled jobs as well')
+@require_initialized_repository
+def queue_status(show_all: bool):
+    jobs = list_jobs(get_default_repository_path())
+    if not jobs:
+        click.echo('The queue is empty!')
+        return
+
+    states = Counter(job.state for job in jobs)
+    click.echo(', '.join(f'{state}: {states[state]}' for state in JOB_STATES if states[state]))
+
+    for job in jobs:
+        if not show_all and job.state in ('done', 'cancelled'):
+            continue
+
+        details = f' via {job.source}' if job.state == 'done' else f': {job.last_error}' if job.last_error else ''
+        click.echo(f'  #{job.id} [{job.state}, priority {job.priority}, attempt {job.attempts}/{job.max_attempts}] {job}{details}')
+
+
+@queue.command('cancel')
+@click.argument('job_ids', nargs=-1, type=int)
+@click.option('--all', 'cancel_all', is_flag=True, default=False, help='Whether to cancel every queued and running job')
+@require_initialized_repository
+def queue_cancel(job_ids: tuple[int, ...], cancel_all: bool):
+    if not job_ids and not cancel_all:
+        raise click.UsageError('Specify the IDs of the jobs (see `scidock queue status`) or pass --all')
+
+    cancelled = cancel_jobs(get_default_repository_path(), None if cancel_all else list(job_ids))
+    click.echo(f'Cancelled {cancelled} jobs!')
 
 
 def init(repository_path: Path, name: str | None = None):
@@ -150,7 +409,8 @@ def init(repository_path: Path, name: str | None = None):
     new_repository_repr = {new_repository_name: {'path': str(repository_path.absolute())}}
     current_config['repositories'].update(new_repository_repr)
     current_config['default'] = new_repository_name
-    current_config['proxy'] = {}
+    current_config['proxies'] = load_proxy_settings(current_config)
+    current_config.pop('proxy', None)
 
     dump_json({'local': {}, 'recent_searches': {}}, scidock_repo_root / 'content.json')
     dump_json(current_config, scidock_root / 'config.json')
@@ -159,8 +419,9 @@ def init(repository_path: Path, name: str | None = None):
     click.echo('Successfully initialized the repository!')
 
 
-def download(query: str, proxies: dict[str, str] | None) -> bool:
+def download(query: str, proxies: Proxies | None, deadline: float | None = None) -> bool:
     logger.info(f'Received download request with {query = }')
+    set_deadline(deadline)
 
     query_dois = crossref.extract_dois(query)
     if len(query_dois) != 1:
@@ -169,36 +430,25 @@ def download(query: str, proxies: dict[str, str] | None) -> bool:
     progress_bar.start()
     progress_bar.update('Searching for a downloadable copy of the chosen paper...')
 
-    target_doi = query_dois[0]
-
-    target_arxiv_ids = arxiv.extract_arxiv_ids(target_doi, allow_overlap=True, strict=True)
-    if target_arxiv_ids:
-        arxiv.download(target_arxiv_ids[0])
-        progress_bar.stop()
-        click.echo('Successfully downloaded the paper!')
-        return True
-
-    if scihub.download(target_doi, proxies):
-        progress_bar.stop()
-        click.echo('Successfully downloaded the paper!')
-        return True
-
-    attempt_success, recommended_url = attempt_download(target_doi, proxies)
-    if attempt_success:
+    outcome = download_paper(query_dois[0], proxies, extract_title(query))
+    if outcome.success:
         progress_bar.stop()
         click.echo('Successfully downloaded the paper!')
         return True
 
     progress_bar.stop()
-    click.echo('A downloadable version of this work could not be found automatically :(')
+    if outcome.timed_out:
+        click.echo(f'A downloadable version of this work could not be found within {deadline:g} seconds :(')
+    else:
+        click.echo('A downloadable version of this work could not be found automatically :(')
 
-    if recommended_url:
-        click.echo(f'However, you could try and download the paper from the publisher\'s website manually: {recommended_url}')
+    if outcome.recommended_url:
+        click.echo(f'However, you could try and download the paper from the publisher\'s website manually: {outcome.recommended_url}')
 
     return False
 
 
-def search(query: str, proxy: bool, extended: bool, not_interactive: bool):
+def search(query: str, proxy: bool, extended: bool, not_interactive: bool, deadline: float | None = None, settled: bool = False):
     # Suggested Workflow
     # Users get suggestions based on the relevance score provided by CrossRef
     # They are also provided with the option to open a pager (like GNU less) and scroll through more data generated on the fly
@@ -209,6 +459,8 @@ def search(query: str, proxy: bool, extended: bool, not_interactive: bool):
     if proxy:
         proxies = get_current_proxy_setting()
 
+    # the deadline bounds the search itself; the time spent choosing the paper does not count against the download
+    set_deadline(deadline)
     progress_bar.start()
 
     search_results = crossref.search(query)
@@ -216,65 +468,85 @@ def search(query: str, proxy: bool, extended: bool, not_interactive: bool):
     arxiv_results = arxiv.search(query, extended)
     search_prefix, search_results = split_search_results(query, arxiv_results, search_results)
 
+    progress_bar.update('Searching through CrossRef and arXiv...')
+    # a settled prompt is not re-ranked under the cursor, so that the keys sent by the tests land on the same choice every time
+    if not (search_prefix.finished if settled else search_prefix.ready).wait(remaining()):
+        # whatever the engines have found by now is all there is
+        search_prefix.finish()
+    if expired():
+        # nor are more results fetched while browsing, as the prompt itself is not timed
+        search_results = iter(())
     progress_bar.stop()
 
+    # neither choosing the paper nor the speculation below is bounded by the deadline of the search
+    set_deadline(None)
+
+    # the download sources of the highlighted paper are resolved while the user is looking at it
+    speculator = SourceSpeculator(proxies)
+
+    def speculate(paper: str):
+        paper_dois = crossref.extract_dois(paper)
+        speculator.highlight(paper_dois[0] if len(paper_dois) == 1 else None, extract_title(paper))
+
     desired_paper = None
     try:
         if not not_interactive:
             # noinspection PyTypeChecker
             # signature changes at a runtime, see `ui.IterativeInquirerControl`
             desired_paper = questionary.select(message='Choose the suitable paper to add to your library',
-                                               choices=(search_prefix, search_results),
+                                               choices=(search_prefix, search_results, speculate),
                                                pointer='\u276f').ask()
     except ValueError as e:
         if str(e) == 'No choices provided':
             click.echo('Nothing found! :(')
         return
+    finally:
+        speculator.stop()
 
     if desired_paper is not None:
-        download_status = download(desired_paper, proxies)
+        download_status = download(desired_paper, proxies, deadline)
 
         if not download_status:
             update_recent_searches(desired_paper)
 
 
-def open_pdf(query: str):
-    repository_path = get_default_repository_path()
-    repository_content = load_json(f'{repository_path}/.scidock/content.json')
-
+def extract_query_id(query: str) -> str | None:
     query_dois = crossref.extract_dois(query)
     query_arxiv_ids = arxiv.extract_arxiv_ids(query)
     query_ids = query_dois + query_arxiv_ids
     if len(query_ids) > 1:
         raise click.BadParameter('Specified too many IDs: impossible to open single paper')
 
-    filenames = list(repository_content['local'].keys())
-    titles = [entry['title'] for entry in repository_content['local'].values()]
-    dois = [entry['DOI'] for entry in repository_content['local'].values()]
+    return query_ids[0] if query_ids else None
 
-    # noinspection PyTypeChecker
-    # authors of the `rapidfuzz` library incorrectly specified the signature of the function
-    best_title_match = process.extractOne(query, titles, scorer=fuzz.WRatio, score_cutoff=FUZZY_MATCH_RATE,
-                                          processor=default_process)
 
-    best_id_match = None
-    if query_ids:
-        # noinspection PyTypeChecker
-        best_id_match = process.extractOne(query_ids[0], dois, scorer=fuzz.WRatio, score_cutoff=FUZZY_MATCH_RATE,
-                                           processor=default_process)
+def search_library(query: str, all_repositories: bool, limit: int):
+    indexes = load_indexes(get_repository_paths(all_repositories))
+    matches = search_indexes(query, extract_query_id(query), indexes, limit=limit)
 
-    if best_title_match is None and best_id_match is None:
+    if not matches:
         click.echo('Did not find any relevant papers :(')
         return
 
-    best_match = best_id_match if best_id_match is not None else best_title_match
+    for entry, score in matches:
+        click.echo(f'[{score:.0f}] {entry} ({entry.path})')
+
+
+def open_pdf(query: str, all_repositories: bool = False):
+    indexes = load_indexes(get_repository_paths(all_repositories))
+    matches = search_indexes(query, extract_query_id(query), indexes)
+
+    if not matches:
+        click.echo('Did not find any relevant papers :(')
+        return
 
-    best_match_filename = filenames[best_match[2]]
-    best_match_path = f'{repository_path}/{best_match_filename}'
+    best_match, best_match_score = matches[0]
+
+    best_match_path = best_match.path
     if ' ' in best_match_path:
         best_match_path = f'"{best_match_path}"'
 
-    logger.info(f'Best Match Relevance Score: {best_match[1]}')
+    logger.info(f'Best Match Relevance Score: {best_match_score}')
 
     # TODO: verify PDF header (to exclude the possibility of arbitrary code execution)
     # TODO: implement resolving full binary paths
@@ -293,6 +565,108 @@ def open_pdf(query: str):
     click.echo('Successfully opened the file!')
 
 
+def resolve(titles: list[str], output, output_format: str, threshold: int, jobs: int):
+    show_progress = output.name != '<stdout>'
+    if show_progress:
+        progress_bar.start()
+
+    csv_writer = None
+    if output_format == 'csv':
+        csv_writer = csv.writer(output)
+        csv_writer.writerow([field.name for field in fields(Resolution)])
+
+    resolved_amount = 0
+    for index, resolution in enumerate(resolve_titles(titles, threshold / 100, jobs), start=1):
+        if csv_writer is not None:
+            csv_writer.writerow(astuple(resolution))
+        else:
+            output.write(json.dumps(asdict(resolution), ensure_ascii=False) + '\n')
+        output.flush()
+
+        resolved_amount += resolution.DOI is not None
+        if show_progress:
+            progress_bar.update(f'Resolved {resolved_amount} out of {index} processed titles...')
+
+    if show_progress:
+        progress_bar.stop()
+        click.echo(f'Successfully resolved {resolved_amount} titles!')
+
+
+def sync(all_repositories: bool):
+    for repository_path in get_repository_paths(all_repositories):
+        report = sync_repository(repository_path)
+        click.echo(f'{repository_path}: {len(report.added)} added, {len(report.removed)} removed, {len(report.updated)} updated')
+
+        for filename in report.added:
+            click.echo(f'  + {filename}')
+        for filename in report.removed:
+            click.echo(f'  - {filename}')
+
+
+def migrate(layout: str, all_repositories: bool):
+    for repository_path in get_repository_paths(all_repositories):
+        current_layout = get_layout(repository_path)
+
+        progress_bar.start()
+        progress_bar.update(f'Moving the papers of {repository_path} to the {layout} layout...')
+        moved = migrate_repository(repository_path, layout)
+        progress_bar.stop()
+
+        click.echo(f'{repository_path}: {current_layout} -> {layout}, {len(moved)} papers moved')
+
+
+def export(output, output_format: str, all_repositories: bool):
+    entries = load_library(get_repository_paths(all_repositories))
+
+    show_progress = output.name != '<stdout>'
+    if show_progress:
+        progress_bar.start()
+
+    # records are written as soon as their batch is enriched, so the whole bibliography is never held in memory
+    if output_format == 'bibtex':
+        records = export_bibtex(entries)
+    else:
+        records = (json.dumps(record, ensure_ascii=False) for record in export_csl(entries))
+        output.write('[\n')
+
+    for index, record in enumerate(records, start=1):
+        if output_format == 'bibtex':
+            output.write(f'{record}\n')
+        else:
+            output.write(f'{CSL_SEPARATOR if index > 1 else ""}{record}')
+        output.flush()
+
+        if show_progress:
+            progress_bar.update(f'Exported {index} out of {len(entries)} papers...')
+
+    if output_format == 'csljson':
+        output.write('\n]\n')
+
+    if show_progress:
+        progress_bar.stop()
+        click.echo(f'Successfully exported {len(entries)} papers!')
+
+
+def retry(proxies: Proxies | None, jobs: int, attempts: int):
+    repository_path = get_default_repository_path()
+
+    progress_bar.start()
+    progress_bar.update('Retrying the downloads of the recent searches...')
+    report = retry_recent_searches(repository_path, proxies, jobs, attempts)
+    progress_bar.stop()
+
+    if not report.succeeded and not report.failed:
+        click.echo('Nothing to retry!')
+        return
+
+    for title in report.succeeded:
+        click.echo(f'  + {title}')
+    for title, reason in report.failed.items():
+        click.echo(f'  - {title}: {reason}')
+
+    click.echo(f'Successfully downloaded {len(report.succeeded)} out of {len(report.succeeded) + len(report.failed)} papers!')
+
+
 @click.command('init')
 @click.argument('repository_path', type=click.Path(file_okay=False, path_type=Path))
 @click.option('--name', type=str, default=None, help='Name of the repository. Defaults to the name of the folder')
@@ -307,36 +681,115 @@ def init_command(repository_path: Path, name: str | None):
               help='Whether to include abstract and other fields in the search. Defaults to False (search by title only)')
 @click.option('-n', '--not-interactive', is_flag=True, default=False, hidden=True,
               help='Disable user interactions (for CI/CD use only)')
+@click.option('--settled', is_flag=True, default=False, hidden=True,
+              help='Open the prompt only once every search engine has finished (for CI/CD use only)')
+@click.option('--deadline', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Time budget of the search (and, separately, of the download) in seconds, after which the partial results are shown')
 @require_initialized_repository
-def search_command(query: str, proxy: bool, extended: bool, not_interactive: bool):
-    search(query, proxy, extended, not_interactive)
+def search_command(query: str, proxy: bool, extended: bool, not_interactive: bool, settled: bool, deadline: float | None):
+    search(query, proxy, extended, not_interactive, deadline, settled)
 
 
 @click.command('download')
 @click.argument('DOI', type=str)
 @click.option('--proxy', is_flag=True, default=False, help='Whether to use a proxy in download requests')
+@click.option('--deadline', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='Time budget of the download in seconds, after which the sources that are left are skipped')
 @require_initialized_repository
-def download_command(doi: str, proxy: bool):
+def download_command(doi: str, proxy: bool, deadline: float | None):
     proxies = {}
     if proxy:
         proxies = get_current_proxy_setting()
 
-    download(doi, proxies)
+    download(doi, proxies, deadline)
 
 
 @click.command('open')
 @click.argument('query', type=str)
+@click.option('--all', 'all_repositories', is_flag=True, default=False,
+              help='Whether to look through all registered repositories instead of the default one')
 @require_initialized_repository
-def open_command(query: str):
-    open_pdf(query)
+def open_command(query: str, all_repositories: bool):
+    open_pdf(query, all_repositories)
+
+
+@click.command('library')
+@click.argument('query', type=str)
+@click.option('--all', 'all_repositories', is_flag=True, default=False,
+              help='Whether to look through all registered repositories instead of the default one')
+@click.option('--limit', type=int, default=10, help='Maximum number of papers to show')
+@require_initialized_repository
+def library_command(query: str, all_repositories: bool, limit: int):
+    search_library(query, all_repositories, limit)
+
+
+@click.command('sync')
+@click.option('--all', 'all_repositories', is_flag=True, default=False,
+              help='Whether to synchronize all registered repositories instead of the default one')
+@require_initialized_repository
+def sync_command(all_repositories: bool):
+    sync(all_repositories)
+
+
+@click.command('layout')
+@click.argument('layout', type=click.Choice(LAYOUTS, case_sensitive=False))
+@click.option('--all', 'all_repositories', is_flag=True, default=False,
+              help='Whether to migrate all registered repositories instead of the default one')
+@require_initialized_repository
+def layout_command(layout: str, all_repositories: bool):
+    migrate(layout.lower(), all_repositories)
+
+
+@click.command('resolve')
+@click.argument('titles_file', type=click.File('r', encoding='utf-8'))
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-', help='Where to write the results. Defaults to stdout')
+@click.option('--format', 'output_format', type=click.Choice(['csv', 'jsonl'], case_sensitive=False), default='csv',
+              help='Format of the results')
+@click.option('--threshold', type=click.IntRange(0, 100), default=90, help='Minimal title similarity (in percent) to accept a match')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=8, help='Number of titles resolved concurrently')
+def resolve_command(titles_file, output, output_format: str, threshold: int, jobs: int):
+    resolve(titles_file.readlines(), output, output_format.lower(), threshold, jobs)
+
+
+@click.command('export')
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='Where to write the bibliography. Defaults to stdout')
+@click.option('--format', 'output_format', type=click.Choice(['bibtex', 'csljson'], case_sensitive=False), default='bibtex',
+              help='Format of the bibliography')
+@click.option('--all', 'all_repositories', is_flag=True, default=False,
+              help='Whether to export all registered repositories instead of the default one')
+@require_initialized_repository
+def export_command(output, output_format: str, all_repositories: bool):
+    export(output, output_format.lower(), all_repositories)
+
+
+@click.command('retry')
+@click.option('--proxy', is_flag=True, default=False, help='Whether to use a proxy in download requests')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=4, help='Number of papers downloaded concurrently')
+@click.option('--attempts', type=click.IntRange(min=1), default=3, help='Number of attempts per paper, with exponential backoff in between')
+@require_initialized_repository
+def retry_command(proxy: bool, jobs: int, attempts: int):
+    proxies = {}
+    if proxy:
+        proxies = get_current_proxy_setting()
+
+    retry(proxies, jobs, attempts)
 
 
 main.add_command(init_command)
 main.add_command(search_command)
 main.add_command(download_command)
 main.add_command(open_command)
+main.add_command(library_command)
+main.add_command(resolve_command)
+main.add_command(sync_command)
+main.add_command(layout_command)
+main.add_command(export_command)
+main.add_command(retry_command)
 
 main.add_command(config)
+main.add_command(queue)
+main.add_command(test)
 
 if __name__ == '__main__':
     main()
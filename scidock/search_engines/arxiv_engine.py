@@ -1,17 +1,23 @@
+import re
 from collections.abc import Iterator
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 
 import arxiv
 
 from scidock.config import logger
+from scidock.network import session
 from scidock.parsers.query_parser import clear_query, extract_arxiv_ids, extract_names
-from scidock.search_engines.metadata import Metadata
-from scidock.utils import dump_json, get_default_repository_path, load_json
+from scidock.utils import BoundedCache, save_file_to_repo
 
-client = arxiv.Client()
+# requests are spaced out by the shared rate limiter instead of the client's own (per-instance) delay
+client = arxiv.Client(delay_seconds=0)
+# noinspection PyProtectedMember
+client._session = session
 
 __all__ = ('search', 'download', 'extract_arxiv_ids')
 
+METADATA_CACHE_SIZE = 1024
+
 
 @dataclass
 class ArXivItem:
@@ -25,6 +31,49 @@ class ArXivItem:
     def __str__(self):
         return f'{self.title.rstrip(".")}. DOI: {self.DOI}'
 
+    @property
+    def filename(self) -> str:
+        # mirrors `arxiv.Result._get_default_filename`
+        return '.'.join((self.arxiv_id.replace('/', '_'), re.sub(r'[^\w]', '_', self.title or 'UNTITLED'), 'pdf'))
+
+    @property
+    def pdf_url(self) -> str:
+        return f'https://arxiv.org/pdf/{self.arxiv_id}'
+
+
+# results of the recent searches, so that downloading the chosen one does not require another API round trip
+metadata_cache = BoundedCache(METADATA_CACHE_SIZE)
+
+
+def remember(paper: arxiv.Result) -> ArXivItem:
+    item = ArXivItem(paper.title, paper.get_short_id())
+
+    metadata_cache.put(item.arxiv_id, item)
+    return item
+
+
+def lookup(arxiv_id: str) -> ArXivItem | None:
+    item = metadata_cache.get(arxiv_id)
+    if item is not None:
+        logger.debug(f'Found metadata for {arxiv_id = } in the cache')
+        return item
+
+    search_request = arxiv.Search(id_list=[arxiv_id])
+    paper = next(client.results(search_request), None)
+    if paper is None:
+        logger.info(f'arXiv does not have a paper with {arxiv_id = }')
+        return None
+
+    return remember(paper)
+
+
+def fetch_papers(arxiv_ids: list[str]) -> list[arxiv.Result]:
+    search_request = arxiv.Search(id_list=arxiv_ids, max_results=len(arxiv_ids))
+    papers = list(client.results(search_request))
+    for paper in papers:
+        remember(paper)
+    return papers
+
 
 def search(query: str, extended: bool = False) -> Iterator[ArXivItem]:
     arxiv_ids = extract_arxiv_ids(query)
@@ -33,7 +82,7 @@ def search(query: str, extended: bool = False) -> Iterator[ArXivItem]:
     if arxiv_ids:
         search_request = arxiv.Search(id_list=arxiv_ids)
         for paper in client.results(search_request):
-            yield ArXivItem(paper.title, paper.get_short_id())
+            yield remember(paper)
 
         return
 
@@ -50,21 +99,14 @@ def search(query: str, extended: bool = False) -> Iterator[ArXivItem]:
     search_request = arxiv.Search(query=search_query, sort_by=arxiv.SortCriterion.Relevance)
 
     for paper in client.results(search_request):
-        yield ArXivItem(paper.title, paper.get_short_id())
+        yield remember(paper)
 
 
-def download(arxiv_id: str):
-    search_request = arxiv.Search(id_list=[arxiv_id])
-    paper = next(client.results(search_request))
-
-    repository_path = get_default_repository_path()
-    # noinspection PyProtectedMember
-    filename = paper._get_default_filename()
-    logger.info(f'Attempting to download a file with {filename = } for {arxiv_id = }')
+def download(arxiv_id: str) -> bool:
+    paper = lookup(arxiv_id)
+    if paper is None:
+        return False
 
-    paper.download_pdf(dirpath=repository_path)
+    logger.info(f'Attempting to download a file with filename = {paper.filename!r} for {arxiv_id = }')
 
-    content_path = f'{repository_path}/.scidock/content.json'
-    repository_content = load_json(content_path)
-    repository_content['local'][filename] = asdict(Metadata(paper.title, f'10.48550/arXiv.{paper.get_short_id()}'))
-    dump_json(repository_content, content_path)
+    return save_file_to_repo(paper.pdf_url, paper.filename, paper.DOI, paper.title, 'arXiv')
@@ -1,20 +1,35 @@
+import re
 from collections.abc import Iterator
 from dataclasses import dataclass
 from pprint import pformat
+from types import SimpleNamespace
 
 import crossref.restful
 import requests
 from crossref.restful import Etiquette, Works
 
-from scidock.config import logger
+from scidock.config import load_config, logger
+from scidock.network import session
 from scidock.parsers.mathml_parser import parse_document
-from scidock.parsers.query_parser import clear_query, extract_dois, extract_keywords, extract_names, simplify_query
-from scidock.utils import responsive_cache
+from scidock.parsers.query_parser import ARXIV_PATTERN, clear_query, extract_dois, extract_keywords, extract_names, simplify_query
+from scidock.utils import BoundedCache, responsive_cache
 
-crossref.restful.requests = requests.Session()
+# the library calls the functions of the `requests` module directly; only those that send requests are routed through the session
+crossref.restful.requests = SimpleNamespace(get=session.get, post=session.post, head=session.head, Request=requests.Request)
 
 __all__ = ('search',)
 
+WORKS_ENDPOINT = 'https://api.crossref.org/works'
+
+OPEN_ACCESS_CACHE_SIZE = 1024
+OPEN_ACCESS_FIELDS = ('DOI', 'title', 'link', 'relation')
+# `link` and `relation` feed the open access stage of the downloads, see `lookup_open_access`
+SEARCH_FIELDS = ('DOI', 'title', 'score', 'link', 'relation')
+DEFAULT_SEARCH_ROWS = 20
+MAX_SEARCH_OFFSET = 10000  # deeper pages are only reachable with a cursor
+
+ARXIV_RELATION_PATTERN = re.compile(r'^(10\.48550/)?arxiv[.:]', re.IGNORECASE)
+
 etiquette = Etiquette('SciDock', '0.1.0', 'https://github.com/kgleba/scidock', 'kgleba@yandex.ru')
 engine = Works(etiquette=etiquette)
 
@@ -29,9 +44,69 @@ class CrossRefItem:
         return f'{self.title.rstrip(".")}. DOI: {self.DOI}'
 
 
+@dataclass
+class OpenAccessLinks:
+    title: str
+    pdf_links: list[str]
+    preprint_arxiv_ids: list[str]
+
+    def __bool__(self):
+        return bool(self.pdf_links or self.preprint_arxiv_ids)
+
+
+# links of the recent search results, so that downloading the chosen one does not require another API round trip
+open_access_cache = BoundedCache(OPEN_ACCESS_CACHE_SIZE)
+
+
+@dataclass(frozen=True)
+class WorksQuery:
+    # pages through /works with only the fields that are actually used, instead of full records in pages of 100
+    params: tuple[tuple[str, str], ...]
+    rows: int = DEFAULT_SEARCH_ROWS
+    cursor: bool = True
+
+    def __iter__(self) -> Iterator[dict]:
+        request_params = dict(self.params) | {'select': ','.join(SEARCH_FIELDS), 'rows': self.rows}
+        if self.cursor:
+            request_params['cursor'] = '*'
+        else:
+            request_params['offset'] = 0
+
+        while True:
+            message = request_works(request_params)
+            if message is None or not message['items']:
+                return
+
+            yield from message['items']
+
+            if self.cursor:
+                request_params['cursor'] = message['next-cursor']
+            else:
+                request_params['offset'] += self.rows
+                if request_params['offset'] >= MAX_SEARCH_OFFSET:
+                    return
+
+
+def get_search_settings() -> dict:
+    return {'rows': DEFAULT_SEARCH_ROWS, 'cursor': True} | load_config().get('crossref', {})
+
+
+def request_works(request_params: dict) -> dict | None:
+    response = session.get(WORKS_ENDPOINT, params=request_params | {'mailto': etiquette.contact_email},
+                           headers={'User-Agent': str(etiquette)}, timeout=30)
+    if response.status_code == 404:  # noqa: PLR2004 - Not Found
+        return None
+    response.raise_for_status()
+
+    return response.json()['message']
+
+
 @responsive_cache
-def perform_query(*args, **kwargs) -> Works:
-    return engine.query(*args, **kwargs)
+def perform_query(*args, **kwargs) -> WorksQuery:
+    search_settings = get_search_settings()
+    # the library is only used to validate and name the query parameters
+    query_params = engine.query(*args, **kwargs).request_params
+    return WorksQuery(tuple(query_params.items()), search_settings['rows'], search_settings['cursor'])
 
 
 @responsive_cache
@@ -52,20 +127,71 @@ def prepare_query_args(query: str) -> tuple[list[str], dict[str, str]]:
     return keywords, search_params
 
 
+def extract_title(paper: dict) -> str:
+    title = ' / '.join(paper.get('title', ('UNTITLED',)))
+
+    if 'xmlns' in title:
+        title = parse_document(title)
+
+    return title
+
+
+def extract_open_access(paper: dict) -> OpenAccessLinks:
+    pdf_links = [link['URL'] for link in paper.get('link', ()) if link.get('content-type') == 'application/pdf' and link.get('URL')]
+
+    preprint_arxiv_ids = []
+    for relation in paper.get('relation', {}).get('has-preprint', ()):
+        # preprints are referenced either by the arXiv DOI or by the arXiv ID itself
+        arxiv_id = ARXIV_RELATION_PATTERN.sub('', relation.get('id', ''))
+        if relation.get('id-type') == 'arxiv' or arxiv_id != relation.get('id'):
+            arxiv_match = ARXIV_PATTERN.match(arxiv_id)
+            if arxiv_match is not None:
+                preprint_arxiv_ids.append(arxiv_match.group(0))
+
+    return OpenAccessLinks(extract_title(paper), pdf_links, preprint_arxiv_ids)
+
+
 def extract_metadata(paper: dict | None) -> CrossRefItem:
     if paper is None:
         paper = {}
 
-    title = ' / '.join(paper.get('title', ('UNTITLED',)))
+    if paper.get('DOI') is not None:
+        open_access_cache.put(paper['DOI'].lower(), extract_open_access(paper))
 
-    if 'xmlns' in title:
-        title = parse_document(title)
+    return CrossRefItem(extract_title(paper), paper.get('DOI'), paper.get('score', 1000.0))
+
+
+def fetch_works(dois: list[str], fields: tuple[str, ...]) -> list[dict]:
+    # filters of the same name are OR-ed by CrossRef, so a single request covers the whole batch
+    request_params = {
+        'filter': ','.join(f'doi:{doi}' for doi in dois),
+        'select': ','.join(fields),
+        'rows': len(dois),
+    }
+    message = request_works(request_params)
+
+    return message['items'] if message is not None else []
+
+
+def lookup_open_access(doi: str) -> OpenAccessLinks | None:
+    open_access = open_access_cache.get(doi.lower())
+    if open_access is not None:
+        logger.debug(f'Found open access links for {doi = } in the cache')
+        return open_access
+
+    works = fetch_works([doi], OPEN_ACCESS_FIELDS)
+    if not works:
+        return None
 
-    return CrossRefItem(title, paper.get('DOI'), paper.get('score', 1000.0))
+    open_access = extract_open_access(works[0])
+    open_access_cache.put(doi.lower(), open_access)
+    return open_access
 
 
 def search(query: str) -> Iterator[CrossRefItem]:
     plain_query = simplify_query(query)
+    if plain_query is None:  # the query could not be analyzed within the deadline
+        plain_query = clear_query(query)
     search_query = iter(())
 
     if plain_query.strip():
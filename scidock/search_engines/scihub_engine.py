@@ -1,13 +1,90 @@
+import re
+from dataclasses import dataclass
+
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
 from scidock.config import logger
-from scidock.utils import filename_from_metadata, save_file_to_repo
+from scidock.negative_cache import lookup_dead_end, record_dead_end
+from scidock.network import session
+from scidock.proxy_pool import Proxies
+from scidock.utils import KB, BoundedCache, filename_from_metadata, save_file_to_repo, single_flight
 
 # TODO: make mirrors dynamic or more configurable
 SCIHUB_MIRRORS = ['https://sci-hub.ru', 'https://sci-hub.se', 'https://sci-hub.st']
 SCIDB_MIRRORS = ['https://annas-archive.gs/scidb', 'https://annas-archive.se/scidb']
 
+PREVIEW_CHUNK_SIZE = 4 * KB
+LOCATION_CACHE_SIZE = 256
+
+
+class MirrorsUnavailableError(requests.exceptions.ConnectionError):
+    pass
+
+
+@dataclass
+class MirrorCopy:
+    download_link: str
+    filename: str
+    title: str
+
+
+located_copies = BoundedCache(LOCATION_CACHE_SIZE)
+
+
+def has_class(attrs: dict, class_name: str) -> bool:
+    classes = attrs.get('class') or []
+    if isinstance(classes, str):
+        classes = classes.split()
+    return class_name in classes
+
+
+@dataclass
+class PreviewLayout:
+    # elements of the preview page that the parser needs; reading stops as soon as all of them have arrived
+    strainer: SoupStrainer
+    completion_patterns: tuple[re.Pattern, ...]
+    # what the mirror says when it has no copy of the paper, `{doi}` standing for the requested DOI;
+    # any other unparsable page (a captcha, an error page, a changed DOM) is not conclusive
+    missing_pattern: str
+
+    def says_missing(self, preview: str, doi: str) -> bool:
+        return re.search(self.missing_pattern.format(doi=re.escape(doi)), preview, re.IGNORECASE) is not None
+
+
+SCIHUB_LAYOUT = PreviewLayout(
+    SoupStrainer(lambda name, attrs: name == 'button' or (name == 'div' and attrs.get('id') == 'citation')),
+    (re.compile(rb'<button[^>]*>'), re.compile(rb'<div[^>]*id\s*=\s*["\']citation["\'][^>]*>.*?</div>', re.DOTALL)),
+    r"doesn't have the requested document|article not found|не найдено запрошенной|статья не найдена")
+
+SCIDB_LAYOUT = PreviewLayout(
+    SoupStrainer(lambda name, attrs: name == 'a' or (name == 'div' and has_class(attrs, 'font-bold'))),
+    (re.compile(rb'>\s*Download\s*</a>'), re.compile(rb'<div[^>]*class\s*=\s*["\'][^"\']*font-bold[^>]*>.*?</div>', re.DOTALL)),
+    # "not found" alone also turns up in error pages and footers, so the message has to be followed by the DOI itself
+    r'\bnot found\W*{doi}')
+
+
+def read_preview(preview_page: requests.Response, layout: PreviewLayout) -> str:
+    content = bytearray()
+    pending_patterns = layout.completion_patterns
+
+    for chunk in preview_page.iter_content(chunk_size=PREVIEW_CHUNK_SIZE):
+        content += chunk
+
+        pending_patterns = tuple(pattern for pattern in pending_patterns if pattern.search(content) is None)
+        if not pending_patterns:
+            break
+
+    preview_page.close()
+
+    return content.decode(preview_page.encoding or 'utf-8', errors='replace')
+
+
+def parse_preview(preview_page: requests.Response, layout: PreviewLayout) -> tuple[BeautifulSoup, str]:
+    # the text itself is kept for `PreviewLayout.missing_pattern`, which may match outside of the strained elements
+    preview = read_preview(preview_page, layout)
+    return BeautifulSoup(preview, 'html.parser', parse_only=layout.strainer), preview
+
 
 def parse_scihub(soup: BeautifulSoup, doi: str, mirror: str) -> tuple[str | None, str | None, str | None]:
     download_button = soup.find('button')
@@ -25,6 +102,9 @@ def parse_scihub(soup: BeautifulSoup, doi: str, mirror: str) -> tuple[str | None
 
     # TODO: improve citation parsing
     citation_container = soup.find('div', id='citation')
+    if citation_container is None:
+        logger.info('Did not find the citation of the paper')
+        return None, None, None
     citation_italic = citation_container.findChild('i')
     citation_title = citation_italic.text if citation_italic is not None else citation_container.text
 
@@ -47,38 +127,70 @@ def parse_scidb(soup: BeautifulSoup, doi: str) -> tuple[str | None, str | None,
     return download_link, filename, title
 
 
-def download(doi: str, proxies: dict[str, str] | None = None) -> bool:
-    if proxies is None:
-        proxies = {}
+@single_flight(located_copies)
+def locate(doi: str, proxies: Proxies) -> MirrorCopy | None:
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.3'}
-    logger.info(f'Attempting to download a file with DOI = {doi} and proxy configuration: {proxies}')
+    logger.info(f'Attempting to locate a file with DOI = {doi} and proxy configuration: {proxies}')
+
+    # mirrors that are known to have no copy of the paper are skipped, so that repeated attempts reach the rest of them
+    mirrors = [mirror for mirror in SCIHUB_MIRRORS + SCIDB_MIRRORS if lookup_dead_end(mirror, doi) is None]
+    if not mirrors:
+        logger.info(f'None of the Sci-Hub mirrors has a copy of {doi = }')
+        return None
 
-    for mirror in SCIHUB_MIRRORS + SCIDB_MIRRORS:
+    for mirror in mirrors:
         try:
             # TODO: choose a sensible timeout based on the Internet speed
             timeout = 5 if proxies else 2
-            preview_page = requests.get(f'{mirror}/{doi}', proxies=proxies, timeout=timeout, headers=headers, allow_redirects=False)
+            preview_page = session.get(f'{mirror}/{doi}', proxies=proxies, timeout=timeout, headers=headers, allow_redirects=False,
+                                       stream=True)
             break
         except requests.exceptions.Timeout:
             logger.debug(f'Timeout for the {mirror} Sci-Hub mirror')
             continue
     else:
-        print('Unfortunately, all of the Sci-Hub mirrors are unavailable at your location. Try using a proxy')
-        return False
+        raise MirrorsUnavailableError('All of the Sci-Hub mirrors are unavailable')
 
     if preview_page.status_code in (301, 302):
-        return False
-
-    soup = BeautifulSoup(preview_page.text, 'html.parser')
-
-    if 'sci-hub' in mirror:
+        # mirrors redirect to their start page or to a captcha, which says nothing about the paper itself
+        logger.info(f'{mirror} redirected to {preview_page.headers.get("Location")}')
+        preview_page.close()
+        return None
+
+    layout = SCIHUB_LAYOUT if 'sci-hub' in mirror else SCIDB_LAYOUT
+    soup, preview = parse_preview(preview_page, layout)
+    if layout is SCIHUB_LAYOUT:
         download_link, filename, title = parse_scihub(soup, doi, mirror)
-        if any(field is None for field in (download_link, filename, title)):
-            return False
     else:
         download_link, filename, title = parse_scidb(soup, doi)
-        if any(field is None for field in (download_link, filename, title)):
-            return False
 
-    return save_file_to_repo(download_link, filename, doi, title, 'Sci-Hub', proxies)
+    if any(field is None for field in (download_link, filename, title)):
+        # only a page that positively says so is remembered, anything else is retried the next time
+        if preview_page.status_code == 200 and layout.says_missing(preview, doi):  # noqa: PLR2004 - an error page says nothing about the paper
+            record_dead_end(mirror, doi, f'{mirror} has no copy')
+        else:
+            logger.info(f'Could not parse the preview page of {mirror} for {doi = } (status code {preview_page.status_code})')
+        return None
+
+    return MirrorCopy(download_link, filename, title)
+
+
+def download(doi: str, proxies: Proxies | None = None) -> bool:
+    if proxies is None:
+        proxies = {}
+
+    # the copy might have already been located while the user was choosing the paper, see `pipeline.SourceSpeculator`
+    try:
+        mirror_copy = locate(doi, proxies)
+    except MirrorsUnavailableError:
+        print('Unfortunately, all of the Sci-Hub mirrors are unavailable at your location. Try using a proxy')
+        return False
+    finally:
+        # a located copy is used once; the download links of the mirrors expire, so the next download locates it anew
+        located_copies.discard(doi)
+
+    if mirror_copy is None:
+        return False
+
+    return save_file_to_repo(mirror_copy.download_link, mirror_copy.filename, doi, mirror_copy.title, 'Sci-Hub', proxies)
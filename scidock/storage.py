@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import threading
+from dataclasses import asdict, dataclass
+from os import PathLike
+from pathlib import Path
+
+from scidock.config import logger
+
+__all__ = ('StoredPaper', 'add_blob', 'get_temporary_path', 'link_blob', 'lookup', 'register')
+
+KB = 1024
+
+# `FICLONE` from <linux/fs.h>: copy-on-write clone of the whole file (btrfs, XFS, bcachefs, ...)
+FICLONE = 0x40049409
+
+_index_lock = threading.RLock()
+
+
+@dataclass
+class StoredPaper:
+    sha256: str
+    title: str
+    filename: str
+
+
+def get_store_path() -> Path:
+    store_path = Path('~/.scidock/store').expanduser()
+    store_path.mkdir(parents=True, exist_ok=True)
+    return store_path
+
+
+def get_temporary_path() -> Path:
+    temporary_path = get_store_path() / 'tmp'
+    temporary_path.mkdir(exist_ok=True)
+    return temporary_path
+
+
+def get_blob_path(digest: str) -> Path:
+    return get_store_path() / 'blobs' / digest[:2] / f'{digest}.pdf'
+
+
+def _load_index() -> dict:
+    try:
+        with open(get_store_path() / 'index.json', encoding='utf-8') as index_file:
+            return json.load(index_file)
+    except (json.decoder.JSONDecodeError, FileNotFoundError):
+        return {}
+
+
+def _dump_index(index: dict) -> None:
+    index_path = get_store_path() / 'index.json'
+    with open(index_path.with_suffix('.tmp'), 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, ensure_ascii=False)
+    index_path.with_suffix('.tmp').replace(index_path)
+
+
+def hash_file(path: str | PathLike) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(256 * KB):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def add_blob(path: str | PathLike) -> str:
+    # moves the file into the store; an identical blob that is already there is reused
+    digest = hash_file(path)
+    blob_path = get_blob_path(digest)
+
+    # a blob that has been changed through one of its hardlinks (see `link_blob`) is replaced, the changed copy keeps its own inode
+    if blob_path.exists() and hash_file(blob_path) == digest:
+        Path(path).unlink()
+    else:
+        blob_path.parent.mkdir(parents=True, exist_ok=True)
+        Path(path).replace(blob_path)
+
+    return digest
+
+
+def register(doi: str, digest: str, title: str, filename: str) -> None:
+    with _index_lock:
+        index = _load_index()
+        index[doi.lower()] = asdict(StoredPaper(digest, title, filename))
+        _dump_index(index)
+
+
+def lookup(doi: str) -> StoredPaper | None:
+    with _index_lock:
+        entry = _load_index().get(doi.lower())
+
+    if entry is None:
+        return None
+
+    stored_paper = StoredPaper(**entry)
+    blob_path = get_blob_path(stored_paper.sha256)
+    if not blob_path.exists():
+        logger.warning(f'Blob {stored_paper.sha256} for {doi = } is missing from the store')
+        return None
+
+    if hash_file(blob_path) != stored_paper.sha256:
+        logger.warning(f'Blob {stored_paper.sha256} for {doi = } has been modified in one of the repositories')
+        return None
+
+    return stored_paper
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    if platform.system() != 'Linux':
+        return False
+
+    import fcntl  # noqa: PLC0415 - POSIX-only module
+
+    with open(source, 'rb') as source_file, open(destination, 'wb') as destination_file:
+        try:
+            fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            success = False
+        else:
+            success = True
+
+    if not success:
+        destination.unlink()
+    return success
+
+
+def link_blob(digest: str, destination: Path) -> None:
+    # a reflink (an independent copy-on-write clone) where the filesystem supports it, a hardlink when the repository shares
+    # the filesystem with the store, a plain copy otherwise; hardlinked copies are the same file as the blob, see README.md
+    blob_path = get_blob_path(digest)
+
+    if destination.exists():
+        if destination.samefile(blob_path) or hash_file(destination) == digest:
+            return
+        destination.unlink()
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+
+    if _reflink(blob_path, destination):
+        return
+
+    try:
+        os.link(blob_path, destination)
+        return
+    except OSError as e:
+        logger.debug(f'Could not hardlink {blob_path} to {destination}: {e}')
+
+    shutil.copyfile(blob_path, destination)
@@ -0,0 +1,180 @@
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from scidock.config import logger
+from scidock.layout import place_paper, set_layout
+from scidock.parsers.query_parser import ARXIV_PATTERN, DOI_PATTERN
+from scidock.search_engines.metadata import Metadata
+from scidock.utils import KB, dump_json, edit_json
+
+__all__ = ('SyncReport', 'extract_pdf_metadata', 'migrate_repository', 'scan_repository', 'sync_repository')
+
+# metadata of a PDF is usually stored either at the beginning or in the trailer at the end of the file
+METADATA_WINDOW = 64 * KB
+
+PDF_TITLE_PATTERN = re.compile(rb'/Title\s*(?:\(((?:[^()\\]|\\.)*)\)|<([0-9A-Fa-f\s]*)>)', re.DOTALL)
+XMP_TITLE_PATTERN = re.compile(rb'<dc:title>\s*<rdf:Alt>\s*<rdf:li[^>]*>(.*?)</rdf:li>', re.DOTALL)
+BINARY_DOI_PATTERN = re.compile(DOI_PATTERN.pattern.encode())
+FILENAME_ARXIV_PATTERN = re.compile(fr'^{ARXIV_PATTERN.pattern}\.')
+
+# stamps are (size in bytes, modification time in nanoseconds)
+Stamp = tuple[int, int]
+
+
+@dataclass
+class SyncReport:
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+
+
+def scan_repository(repository_path: str | os.PathLike, relative_path: str = '') -> dict[str, Stamp]:
+    stamps = {}
+
+    with os.scandir(Path(repository_path) / relative_path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+
+            entry_path = f'{relative_path}{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                stamps.update(scan_repository(repository_path, f'{entry_path}/'))
+            elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                entry_stat = entry.stat()
+                stamps[entry_path] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+
+    return stamps
+
+
+def decode_pdf_string(literal: bytes | None, hexadecimal: bytes | None) -> str:
+    raw = bytes.fromhex(re.sub(rb'\s', b'', hexadecimal).decode()) if hexadecimal is not None else re.sub(rb'\\([()\\])', rb'\1', literal)
+
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', errors='replace')
+    return raw.decode('latin-1')
+
+
+def extract_pdf_metadata(path: str | os.PathLike) -> Metadata:
+    path = Path(path)
+    with open(path, 'rb') as pdf_file:
+        content = pdf_file.read(METADATA_WINDOW)
+        if path.stat().st_size > METADATA_WINDOW:
+            pdf_file.seek(-METADATA_WINDOW, os.SEEK_END)
+            content += pdf_file.read()
+
+    title = None
+    if (xmp_match := XMP_TITLE_PATTERN.search(content)) is not None:
+        title = xmp_match.group(1).decode('utf-8', errors='replace').strip()
+    elif (title_match := PDF_TITLE_PATTERN.search(content)) is not None:
+        title = decode_pdf_string(*title_match.groups()).strip()
+
+    stem = path.stem
+    arxiv_match = FILENAME_ARXIV_PATTERN.search(path.name)
+    if arxiv_match is not None:
+        stem = stem.removeprefix(arxiv_match.group(0))
+
+    doi = None
+    if (doi_match := BINARY_DOI_PATTERN.search(content)) is not None:
+        doi = doi_match.group(0).decode().rstrip('.')
+    elif arxiv_match is not None:
+        doi = f'10.48550/arXiv.{arxiv_match.group(0).rstrip(".")}'
+
+    if not title:
+        title = stem.replace('_', ' ')
+
+    return Metadata(title, doi)
+
+
+def sync_repository(repository_path: str) -> SyncReport:
+    report = SyncReport()
+    disk_stamps = scan_repository(repository_path)
+
+    with edit_json(f'{repository_path}/.scidock/content.json') as repository_content:
+        local_content = repository_content.setdefault('local', {})
+        stored_stamps = repository_content.setdefault('stamps', {})
+
+        for filename in list(local_content):
+            if filename not in disk_stamps:
+                del local_content[filename]
+                report.removed.append(filename)
+
+        for filename in list(stored_stamps):
+            if filename not in disk_stamps:
+                del stored_stamps[filename]
+
+        for filename, stamp in disk_stamps.items():
+            previous_stamp = stored_stamps.get(filename)
+            if previous_stamp is not None and tuple(previous_stamp) == stamp:
+                continue
+
+            stored_stamps[filename] = stamp
+
+            if filename in local_content:
+                # metadata of the papers downloaded by scidock is more reliable than the one extracted from the file
+                if previous_stamp is not None:
+                    report.updated.append(filename)
+                continue
+
+            try:
+                metadata = extract_pdf_metadata(Path(repository_path) / filename)
+            except OSError as e:
+                logger.warning(f'Could not read {filename}: {e!r}')
+                continue
+
+            local_content[filename] = asdict(metadata)
+            report.added.append(filename)
+
+    logger.info(f'Synchronized {repository_path}: {len(report.added)} added, {len(report.removed)} removed, {len(report.updated)} updated')
+
+    return report
+
+
+def migrate_repository(repository_path: str, layout: str) -> list[str]:
+    # moves the papers in place; an interrupted migration is recorded as far as it went and can simply be run again
+    moved = []
+    vacated_directories = set()
+    root = Path(repository_path)
+    content_path = root / '.scidock' / 'content.json'
+
+    with edit_json(content_path) as repository_content:
+        local_content = repository_content.setdefault('local', {})
+        stored_stamps = repository_content.setdefault('stamps', {})
+
+        try:
+            for filename in list(local_content):
+                target = place_paper(layout, filename, local_content[filename].get('DOI'))
+                if target == filename:
+                    continue
+
+                if (root / target).exists():
+                    logger.warning(f'Could not move {filename} to {target}: the destination already exists')
+                    continue
+
+                try:
+                    (root / target).parent.mkdir(exist_ok=True)
+                    (root / filename).replace(root / target)
+                except OSError as e:
+                    logger.warning(f'Could not move {filename} to {target}: {e!r}')
+                    continue
+
+                vacated_directories.add((root / filename).parent)
+                local_content[target] = local_content.pop(filename)
+                if filename in stored_stamps:
+                    stored_stamps[target] = stored_stamps.pop(filename)
+                moved.append(target)
+        except BaseException:
+            dump_json(repository_content, content_path)
+            raise
+
+    set_layout(repository_path, layout)
+
+    # shards emptied by the migration back to the flat layout
+    for directory in vacated_directories - {root}:
+        if not any(directory.iterdir()):
+            directory.rmdir()
+
+    logger.info(f'Migrated {repository_path} to the {layout} layout: {len(moved)} papers moved')
+
+    return moved
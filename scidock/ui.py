@@ -1,18 +1,94 @@
-from collections.abc import Iterable, Iterator, Sequence
+import threading
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from itertools import islice
 from typing import Any
 
 import questionary
-from questionary.prompts.common import Choice, InquirerControl
+from prompt_toolkit.application import get_app
+from questionary.prompts.common import Choice, InquirerControl, Separator
 from rich.status import Status
 
-__all__ = ('progress_bar',)
+__all__ = ('LiveChoices', 'progress_bar')
 
 ChoiceSequence = Sequence[str | Choice | dict[str, Any]]
 
 
+class LiveChoices:
+    # leading choices that are still being collected while the prompt is already open; every update replaces all of them
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.choices = []
+        self.listeners = []
+        self.ready = threading.Event()
+        self.finished = threading.Event()
+
+    def snapshot(self) -> list:
+        with self.lock:
+            return list(self.choices)
+
+    def subscribe(self, listener: Callable[[], None]):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def update(self, choices: list):
+        with self.lock:
+            self.choices = list(choices)
+            listeners = list(self.listeners)
+
+        if choices:
+            self.ready.set()
+
+        for listener in listeners:
+            listener()
+
+    def finish(self):
+        self.finished.set()
+        self.ready.set()
+
+        with self.lock:
+            listeners = list(self.listeners)
+
+        for listener in listeners:
+            listener()
+
+
+# leading choices, the rest of them and, optionally, the listener of the highlighted choice
+ChoiceStream = tuple[Iterable | LiveChoices, Iterator] | tuple[Iterable | LiveChoices, Iterator, Callable[[Any], None]]
+
+
 class IterativeInquirerControl(InquirerControl):
-    def __init__(self, choices: ChoiceSequence | Iterator | tuple[Iterable, Iterator], *args, **kwargs):
+    def __init__(self, choices: ChoiceSequence | Iterator | ChoiceStream, *args, **kwargs):
         choice_prefix = []
+        self.live_choices = None
+        self.highlight_listener = None
+        self.app = None
+        self.lock = threading.RLock()
+        self.refresh_lock = threading.Lock()
+
+        # an optional third element is called with the value of every highlighted choice
+        if isinstance(choices, tuple) and len(choices) == 3 and callable(choices[2]):  # noqa: PLR2004
+            *choices, self.highlight_listener = choices
+
+        if len(choices) == 2 and isinstance(choices[0], LiveChoices) and isinstance(choices[1], Iterator):  # noqa: PLR2004
+            self.live_choices, self.pending_stream = choices
+            self.WINDOW_SIZE = (self.live_choices.capacity // 10 + 1) * 10
+
+            self.live_choices.ready.wait()
+            initial_choices = self.live_choices.snapshot()
+            if not initial_choices:
+                raise ValueError('No choices provided')
+
+            self.continuation_stream = None
+            self.trace = initial_choices
+            self.trace_index = 0
+
+            super().__init__(initial_choices, *args[1:], **kwargs)
+
+            self.live_choices.subscribe(self.refresh_live_choices)
+            self.refresh_live_choices()
+            self.notify_highlight()
+            return
 
         if len(choices) == 2 and isinstance(choices[0], Iterable) and isinstance(choices[1], Iterator):  # noqa: PLR2004
             choice_prefix, choices = choices
@@ -35,8 +111,68 @@ class IterativeInquirerControl(InquirerControl):
         self.trace_index = 0
 
         super().__init__(initial_choices, *args[1:], **kwargs)
+        self.notify_highlight()
+
+    def _get_choice_tokens(self):
+        # rendering happens in the thread of the application, which is then refreshed on the live updates
+        self.app = get_app()
+        with self.lock:
+            return super()._get_choice_tokens()
+
+    def notify_highlight(self):
+        if self.highlight_listener is not None and self.choices and self.is_selection_valid():
+            self.highlight_listener(self.get_pointed_at().value)
+
+    def refresh_live_choices(self):
+        with self.refresh_lock:
+            self._refresh_live_choices()
+        self.notify_highlight()
+
+        if self.app is not None:
+            self.app.invalidate()
+
+    def _refresh_live_choices(self):
+        live_choices = self.live_choices
+        if live_choices is None:
+            return
+
+        finished = live_choices.finished.is_set()
+        choices = live_choices.snapshot()
+        if finished:
+            # the engines are done with their windows, so the rest of the results can be pulled from them safely
+            choices += [str(choice) for choice in islice(self.pending_stream, max(self.WINDOW_SIZE - len(choices), 0))]
+
+        with self.lock:
+            pointed_value = self.get_pointed_at().value if self.choices else None
+
+            self.trace = choices
+            self.choices = [Choice.build(choice) for choice in choices[:self.WINDOW_SIZE]]
+
+            # the highlighted paper stays highlighted wherever the new ordering puts it
+            selectable = [index for index, choice in enumerate(self.choices) if not choice.disabled and not isinstance(choice, Separator)]
+            pointed_at = [index for index in selectable if self.choices[index].value == pointed_value]
+            self.pointed_at = (pointed_at or selectable or [0])[0]
+            self.trace_index = self.pointed_at
+
+            if finished:
+                self.live_choices = None
+                # `_select_next` expects the trace to reach a whole window past the highlighted choice
+                missing_count = max(self.trace_index + self.WINDOW_SIZE - len(self.trace), 0)
+                self.trace += [str(choice) for choice in islice(self.pending_stream, missing_count)]
+                if len(self.trace) >= self.trace_index + self.WINDOW_SIZE:
+                    self.continuation_stream = self.pending_stream
 
     def select_previous(self) -> None:
+        with self.lock:
+            self._select_previous()
+        self.notify_highlight()
+
+    def select_next(self) -> None:
+        with self.lock:
+            self._select_next()
+        self.notify_highlight()
+
+    def _select_previous(self) -> None:
         if self.continuation_stream is not None and self.pointed_at == 0:
             if self.trace_index == 0:
                 return
@@ -48,7 +184,7 @@ class IterativeInquirerControl(InquirerControl):
 
         self.trace_index -= 1
 
-    def select_next(self) -> None:
+    def _select_next(self) -> None:
         if self.continuation_stream is not None:
             if self.trace_index == len(self.trace) - self.WINDOW_SIZE:
                 self.trace.append(str(next(self.continuation_stream)))
@@ -2,23 +2,38 @@ import json
 import random
 import re
 import string
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from dataclasses import asdict
-from functools import cache, wraps
-from ipaddress import IPv4Address, IPv6Address
+from functools import lru_cache, wraps
 from os import PathLike
 from pathlib import Path
 from typing import Any
 
 import requests
 import tldextract
+import urllib3
 
+from scidock import storage
 from scidock.config import logger
+from scidock.deadline import DeadlineExceededError, check_deadline
+from scidock.downloader import stream_pdf
+from scidock.layout import get_layout, place_paper
+from scidock.network import session
+from scidock.proxy_pool import Proxies, get_proxy_pool
 from scidock.search_engines.metadata import Metadata
 
 KB = 1024
 
+RESPONSIVE_CACHE_SIZE = 4096
+
 random.seed(42)
 
+_json_lock = threading.RLock()
+
 
 def load_json(filename: str | PathLike) -> Any:
     try:
@@ -34,6 +49,20 @@ def dump_json(data: Any, filename: str | PathLike) -> None:
         json.dump(data, file, ensure_ascii=False)
 
 
+@contextmanager
+def edit_json(filename: str | PathLike) -> Iterator[Any]:
+    # read-modify-write under a lock so that concurrent downloads do not overwrite each other's changes
+    with _json_lock:
+        data = load_json(filename)
+        yield data
+        dump_json(data, filename)
+
+
+def register_local_file(repository_path: str | PathLike, filename: str, metadata: Metadata) -> None:
+    with edit_json(f'{repository_path}/.scidock/content.json') as repository_content:
+        repository_content['local'][filename] = asdict(metadata)
+
+
 def extract_domain(url: str) -> str:
     url_metadata = tldextract.extract(url)
     return '.'.join((url_metadata.domain, url_metadata.suffix))
@@ -82,7 +111,7 @@ def remove_outdated_repos(repositories: dict) -> dict:
 
 
 def save_file_to_repo(download_link: str, filename: str, doi: str, title: str, caller_id: str,
-                      proxies: dict[str, str] | None = None) -> bool:
+                      proxies: Proxies | None = None) -> bool:
     if proxies is None:
         proxies = {}
     headers = {
@@ -90,9 +119,8 @@ def save_file_to_repo(download_link: str, filename: str, doi: str, title: str, c
 
     logger.info(f'Attempting to download a file from {caller_id} with {filename = } and {download_link = } for {doi = }')
 
-    repository_path = get_default_repository_path()
     try:
-        download_page = requests.get(download_link, proxies=proxies, stream=True, headers=headers, timeout=5)
+        download_page = session.get(download_link, proxies=proxies, stream=True, headers=headers, timeout=5)
     except requests.exceptions.ConnectTimeout:
         logger.info(f'Download failed as {extract_domain(download_link)} is not responding')
         return False
@@ -101,22 +129,51 @@ def save_file_to_repo(download_link: str, filename: str, doi: str, title: str, c
         logger.info(f'Download failed with {download_page.status_code = }')
         return False
 
-    content_type = download_page.headers.get('Content-Type')
-    if content_type not in ('application/pdf', 'application/octet-stream'):
-        logger.info(f'Download failed as Content-Type of the page is "{content_type}"')
+    # the header is not trusted: HTML error pages are often served as `application/octet-stream`, while some PDFs are not
+    logger.debug(f'Content-Type of the page is "{download_page.headers.get("Content-Type")}"')
+
+    with tempfile.NamedTemporaryFile('wb', dir=storage.get_temporary_path(), suffix='.part', delete=False) as paper_file:
+        try:
+            is_pdf = stream_pdf(download_page, paper_file)
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, DeadlineExceededError) as e:
+            logger.info(f'Download failed midway: {e!r}')
+            is_pdf = False
+
+    if not is_pdf:
+        Path(paper_file.name).unlink()
+        # running out of time is not a failure of the source, so it is not reported as one
+        check_deadline()
         return False
 
-    filename = re.sub('_+', '_', filename)
-    filename = filename.replace('\r', '').replace('\n', '')
+    commit_download(paper_file.name, filename, Metadata(title, doi))
+
+    return True
+
+
+def commit_download(temporary_path: str | PathLike, filename: str, metadata: Metadata) -> None:
+    repository_path = get_default_repository_path()
+
+    digest = storage.add_blob(temporary_path)
+    storage.register(metadata.DOI, digest, metadata.title, filename)
+
+    filename = place_paper(get_layout(repository_path), filename, metadata.DOI)
+    storage.link_blob(digest, Path(repository_path) / filename)
+
+    register_local_file(repository_path, filename, metadata)
 
-    with open(f'{repository_path}/{filename}', 'wb') as paper_file:
-        for chunk in download_page.iter_content(chunk_size=10 * KB):
-            paper_file.write(chunk)
 
-    content_path = f'{repository_path}/.scidock/content.json'
-    repository_content = load_json(content_path)
-    repository_content['local'][filename] = asdict(Metadata(title, doi))
-    dump_json(repository_content, content_path)
+def materialize_stored_paper(doi: str) -> bool:
+    # serves the paper from the shared store (if any repository has already downloaded it) without touching the network
+    stored_paper = storage.lookup(doi)
+    if stored_paper is None:
+        return False
+
+    repository_path = get_default_repository_path()
+    logger.info(f'Found {doi = } in the shared store as {stored_paper.sha256}')
+
+    filename = place_paper(get_layout(repository_path), stored_paper.filename, doi)
+    storage.link_blob(stored_paper.sha256, Path(repository_path) / filename)
+    register_local_file(repository_path, filename, Metadata(stored_paper.title, doi))
 
     return True
 
@@ -125,6 +182,7 @@ def filename_from_metadata(doi: str, title: str) -> str:
     title = title.strip()
     remove_punctuation = str.maketrans('', '', string.punctuation)
     filename = title.translate(remove_punctuation).replace(' ', '_')
+    filename = re.sub('_+', '_', filename).replace('\r', '').replace('\n', '')
     return '.'.join((doi, filename, 'pdf')).replace('/', '.')
 
 
@@ -144,8 +202,79 @@ def random_chain(*iterables, weights: list[float] | None = None):
                 weights.pop(iterator_index)
 
 
+class BoundedCache:
+    # thread-safe mapping that evicts the least recently used entries
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        with self.lock:
+            return key in self.data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.data:
+                return default
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def update(self, mapping: dict):
+        for key, value in mapping.items():
+            self.put(key, value)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+def single_flight(cache: BoundedCache):
+    # concurrent calls with the same first argument wait for the one in progress and share its result; `None` is not cached
+    def decorator(func):
+        # a lock lives only as long as some call holds or waits for it, so that the keys seen once do not pile up
+        key_locks = {}
+        key_users = Counter()
+        key_locks_guard = threading.Lock()
+
+        @wraps(func)
+        def single_flight_wrapper(key, *args, **kwargs):
+            with key_locks_guard:
+                key_lock = key_locks.setdefault(key, threading.Lock())
+                key_users[key] += 1
+
+            try:
+                with key_lock:
+                    result = cache.get(key)
+                    if result is None:
+                        result = func(key, *args, **kwargs)
+                        if result is not None:
+                            cache.put(key, result)
+            finally:
+                with key_locks_guard:
+                    key_users[key] -= 1
+                    if not key_users[key]:
+                        del key_locks[key], key_users[key]
+
+            return result
+
+        return single_flight_wrapper
+
+    return decorator
+
+
 def responsive_cache(func):
-    func = cache(func)
+    func = lru_cache(maxsize=RESPONSIVE_CACHE_SIZE)(func)
 
     def format_args(args) -> str:
         return ', '.join(map(repr, args))
@@ -157,23 +286,23 @@ def responsive_cache(func):
     def notification_wrapper(*args, **kwargs):
         hits = func.cache_info().hits
         func_return = func(*args, **kwargs)
-        func_args = ', '.join((format_args(args), format_kwargs(kwargs)))
+        cache_hit = func.cache_info().hits > hits
 
-        logger.debug(f'Cache for {func.__name__}({func_args}) {"hit" if func.cache_info().hits > hits else "missed"}')
+        # arguments are only formatted if some sink actually accepts DEBUG records
+        logger.opt(lazy=True).debug('Cache for {}({}) {}', lambda: func.__name__,
+                                    lambda: ', '.join((format_args(args), format_kwargs(kwargs))),
+                                    lambda: 'hit' if cache_hit else 'missed')
 
         return func_return
 
     return notification_wrapper
 
 
-def format_requests_proxy(proxy_type: str, ip: IPv4Address | IPv6Address, port: int):
-    connection_string = f'{proxy_type}://{ip}:{port}'
-    return {'http': connection_string, 'https': connection_string}
-
-
-def get_current_proxy_setting():
-    scidock_root = Path('~/.scidock').expanduser()
-    current_config = load_json(scidock_root / 'config.json')
-    return format_requests_proxy(*current_config['proxy'].values())
+def get_current_proxy_setting() -> Proxies:
+    proxy_pool = get_proxy_pool()
+    if not proxy_pool:
+        logger.warning('No proxies are configured! See `scidock config proxy --help`')
+        return {}
+    return proxy_pool
 
 # TODO: consider creating context managers for working with different config files
@@ -0,0 +1,85 @@
+# Local stand-in for the scidock-nlp server with the same API and crude heuristics instead of the NLP models
+# Usage: python -m tests.nlp_server [--port 8000], then run scidock with SCIDOCK_NLP_SERVER=http://127.0.0.1:8000
+
+import argparse
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STOP_WORDS = {'a', 'an', 'and', 'by', 'for', 'from', 'in', 'of', 'on', 'the', 'to', 'with'}
+NAME_PATTERN = re.compile(r'\bby ((?:[A-Z][\w-]+ ?)+)', re.IGNORECASE)
+
+
+def analyze(query: str) -> dict:
+    names = [match.strip() for match in NAME_PATTERN.findall(query)]
+    words = [word for word in re.findall(r'\w+', query) if word.lower() not in STOP_WORDS]
+
+    return {
+        'extract_names': names or None,
+        'extract_keywords': words,
+        'remove_stop_words': ' '.join(words),
+    }
+
+
+def complex_analysis(query: str) -> dict:
+    # like the real server, the analysis of the query without the names (see `clear_query`) is returned as well
+    analysis = {query: analyze(query)}
+
+    cleared_query = query
+    for name in analysis[query]['extract_names'] or ():
+        cleared_query = re.sub(f' *{re.escape(name)} *', ' ', cleared_query)
+    analysis[cleared_query] = analyze(cleared_query)
+
+    return analysis
+
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if self.path in self.server.failures:
+            self.send_error(self.server.failures[self.path])
+            return
+
+        match self.path:
+            case '/complex_analysis':
+                response = complex_analysis(request['query'])
+            case '/batch_analysis':
+                response = {}
+                for query in request['queries']:
+                    response.update(complex_analysis(query))
+            case _:
+                self.send_error(404)
+                return
+
+        self.server.request_log.append(self.path)
+
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), AnalysisHandler)
+    server.request_log = []
+    # status codes that the endpoints respond with instead of the analysis
+    server.failures = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument('--port', type=int, default=8000)
+    arguments = argument_parser.parse_args()
+
+    nlp_server = ThreadingHTTPServer(('127.0.0.1', arguments.port), AnalysisHandler)
+    nlp_server.request_log = []
+    nlp_server.failures = {}
+    nlp_server.serve_forever()
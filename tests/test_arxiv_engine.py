@@ -0,0 +1,39 @@
+# ruff: noqa: S101
+
+import arxiv
+import pytest
+
+from scidock.search_engines import arxiv_engine
+from scidock.search_engines.arxiv_engine import download, lookup
+
+PAPER = arxiv.Result('http://arxiv.org/abs/1912.01412v1', title='Deep Learning: for Symbolic (Mathematics)')
+
+
+@pytest.fixture
+def results(monkeypatch: pytest.MonkeyPatch) -> list[arxiv.Result]:
+    papers = []
+    monkeypatch.setattr(arxiv_engine.client, 'results', lambda search_request: iter(papers))
+    monkeypatch.setattr(arxiv_engine, 'metadata_cache', arxiv_engine.BoundedCache(arxiv_engine.METADATA_CACHE_SIZE))
+    return papers
+
+
+def test_unknown_id_is_a_failed_source(results: list[arxiv.Result], monkeypatch: pytest.MonkeyPatch):
+    def save_file_to_repo(*args) -> bool:
+        raise AssertionError('Nothing to download')
+
+    monkeypatch.setattr(arxiv_engine, 'save_file_to_repo', save_file_to_repo)
+
+    assert lookup('1912.99999') is None
+    assert download('1912.99999') is False
+
+
+def test_filename_matches_the_arxiv_client(results: list[arxiv.Result], monkeypatch: pytest.MonkeyPatch):
+    saved = []
+    monkeypatch.setattr(arxiv_engine, 'save_file_to_repo', lambda *args: saved.append(args) or True)
+    results.append(PAPER)
+
+    assert download('1912.01412v1')
+    # noinspection PyProtectedMember
+    assert saved == [('https://arxiv.org/pdf/1912.01412v1', PAPER._get_default_filename(), '10.48550/arXiv.1912.01412v1',
+                      PAPER.title, 'arXiv')]
+    assert saved[0][1] == '1912.01412v1.Deep_Learning__for_Symbolic__Mathematics_.pdf'
@@ -0,0 +1,80 @@
+# ruff: noqa: S101
+
+import gzip
+import io
+import time
+
+import pytest
+import requests
+import urllib3
+
+from scidock import downloader
+from scidock.downloader import stream_pdf
+from scidock.network import TokenBucket
+
+PDF_BODY = b'%PDF-1.7\n' + bytes(range(256)) * 384
+
+
+def make_response(body: bytes, headers: dict | None = None) -> requests.Response:
+    response = requests.Response()
+    response.raw = urllib3.HTTPResponse(io.BytesIO(body), headers=headers, preload_content=False)
+    response.headers = response.raw.headers
+    response.status_code = 200
+    return response
+
+
+def gzip_with_long_header(body: bytes) -> bytes:
+    # the file name field alone is longer than the first read, so that read decodes to nothing
+    compressed = io.BytesIO()
+    with gzip.GzipFile(filename='x' * 4096, mode='wb', fileobj=compressed) as gzip_file:
+        gzip_file.write(body)
+    return compressed.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def no_bandwidth_limit(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(downloader, 'get_bandwidth_limiter', lambda: None)
+
+
+def test_pdf_is_streamed():
+    paper_file = io.BytesIO()
+
+    assert stream_pdf(make_response(PDF_BODY, {'Content-Length': str(len(PDF_BODY))}), paper_file)
+    assert paper_file.getvalue() == PDF_BODY
+
+
+def test_html_is_rejected_by_signature():
+    # served as a binary file, but actually an error page
+    paper_file = io.BytesIO()
+    body = b'<html><body>Article not found</body></html>' * 100
+
+    assert not stream_pdf(make_response(body, {'Content-Type': 'application/octet-stream'}), paper_file)
+    assert paper_file.getvalue() == b''
+
+
+def test_empty_compressed_chunk_is_not_the_end():
+    paper_file = io.BytesIO()
+    body = gzip_with_long_header(PDF_BODY)
+
+    assert stream_pdf(make_response(body, {'Content-Encoding': 'gzip', 'Content-Length': str(len(body))}), paper_file)
+    assert paper_file.getvalue() == PDF_BODY
+
+
+def test_truncated_body_is_not_committed():
+    truncated_body = PDF_BODY[:len(PDF_BODY) // 2]
+
+    with pytest.raises(urllib3.exceptions.IncompleteRead):
+        stream_pdf(make_response(truncated_body, {'Content-Length': str(len(PDF_BODY))}), io.BytesIO())
+
+
+def test_bandwidth_cap(monkeypatch: pytest.MonkeyPatch):
+    # 32 KB are available at once, the rest of the body has to wait for 128 KB/s
+    monkeypatch.setattr(downloader, 'get_bandwidth_limiter', lambda: TokenBucket(32 * 1024, 0.25))
+    paper_file = io.BytesIO()
+
+    start_time = time.monotonic()
+    assert stream_pdf(make_response(PDF_BODY), paper_file)
+    elapsed_time = time.monotonic() - start_time
+
+    assert paper_file.getvalue() == PDF_BODY
+    assert elapsed_time >= (len(PDF_BODY) - 32 * 1024) / (128 * 1024) * 0.9
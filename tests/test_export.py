@@ -0,0 +1,98 @@
+# ruff: noqa: S101
+
+import json
+from pathlib import Path
+
+import pytest
+
+from scidock import export
+from scidock.export import csl_from_crossref, export_bibtex, export_csl, to_bibtex
+from scidock.library import LibraryEntry
+
+CACHED_CSL = {
+    'id': '10.1000/cached',
+    'type': 'article-journal',
+    'title': 'Profit & Loss of 100% Coverage',
+    'author': [{'family': 'Lample', 'given': 'Guillaume'}, {'literal': 'The Team'}],
+    'issued': {'date-parts': [[2019, 12, 2]]},
+    'container-title': 'Journal_of {Tests}',
+    'page': '1-10',
+    'DOI': '10.1000/cached',
+}
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> Path:
+    (tmp_path / '.scidock').mkdir()
+    (tmp_path / '.scidock' / 'metadata.json').write_text(json.dumps({'10.1000/cached': CACHED_CSL}), encoding='utf-8')
+    return tmp_path
+
+
+def test_csl_from_crossref():
+    work = {'DOI': '10.1000/work', 'type': 'proceedings-article', 'title': ['Main title', 'Subtitle'],
+            'author': [{'family': 'Doe', 'given': 'Jane', 'sequence': 'first'}], 'issued': {'date-parts': [[None]]},
+            'container-title': ['Proceedings'], 'volume': '', 'publisher': 'Publisher'}
+
+    assert csl_from_crossref(work) == {'id': '10.1000/work', 'type': 'paper-conference', 'title': 'Main title / Subtitle',
+                                       'author': [{'family': 'Doe', 'given': 'Jane'}], 'DOI': '10.1000/work',
+                                       'container-title': 'Proceedings', 'publisher': 'Publisher'}
+
+
+def test_to_bibtex():
+    used_keys = set()
+
+    assert to_bibtex(CACHED_CSL, used_keys) == (
+        '@article{lample2019profit,\n'
+        '  author = {Lample, Guillaume and {The Team}},\n'
+        '  title = {Profit \\& Loss of 100\\% Coverage},\n'
+        '  journal = {Journal\\_of \\{Tests\\}},\n'
+        '  pages = {1-10},\n'
+        '  doi = {10.1000/cached},\n'
+        '  year = {2019}\n'
+        '}\n'
+    )
+    assert to_bibtex(CACHED_CSL, used_keys).startswith('@article{lample2019profit2,\n')
+    assert to_bibtex({'title': '', 'type': 'unknown'}, used_keys) == '@misc{unknown,\n\n}\n'
+
+    # identifiers are written verbatim, while every other field, author names included, is escaped
+    csl = {'type': 'report', 'title': 'C:\\Temp_Files', 'author': [{'family': 'Smith & Co'}, {'literal': 'R&D Team'}],
+           'DOI': '10.1002/(SICI)1097_4636#x%y', 'URL': 'https://ex.org/a_b?x=1&y=2'}
+    assert to_bibtex(csl, used_keys) == (
+        '@techreport{smithcoc,\n'
+        '  author = {Smith \\& Co and {R\\&D Team}},\n'
+        '  title = {C:\\textbackslash{}Temp\\_Files},\n'
+        '  doi = {10.1002/(SICI)1097_4636#x%y},\n'
+        '  url = {https://ex.org/a_b?x=1&y=2}\n'
+        '}\n'
+    )
+
+
+def test_export_from_cache_is_offline(repository: Path, monkeypatch: pytest.MonkeyPatch):
+    def fetch_metadata(dois: list[str]) -> dict[str, dict]:
+        raise AssertionError(f'Unexpected request for {dois}')
+
+    monkeypatch.setattr(export, 'fetch_metadata', fetch_metadata)
+    entries = [LibraryEntry(str(repository), 'cached.pdf', 'Local title', '10.1000/CACHED'),
+               LibraryEntry(str(repository), 'no_doi.pdf', 'Paper without a DOI', None)]
+
+    assert list(export_csl(entries)) == [CACHED_CSL, {'id': 'no_doi.pdf', 'type': 'article', 'title': 'Paper without a DOI'}]
+    assert [record.splitlines()[0] for record in export_bibtex(entries)] == ['@article{lample2019profit,', '@misc{unknownpaper,']
+
+
+def test_missing_metadata_is_cached(repository: Path, monkeypatch: pytest.MonkeyPatch):
+    requested = []
+
+    def fetch_metadata(dois: list[str]) -> dict[str, dict]:
+        requested.append(dois)
+        return {'10.1000/found': {'id': '10.1000/found', 'type': 'article', 'title': 'Found', 'DOI': '10.1000/found'}}
+
+    monkeypatch.setattr(export, 'fetch_metadata', fetch_metadata)
+    entries = [LibraryEntry(str(repository), 'found.pdf', 'Found', '10.1000/found'),
+               LibraryEntry(str(repository), 'unknown.pdf', 'Unknown to the sources', '10.1000/unknown')]
+
+    assert [csl['title'] for csl in export_csl(entries)] == ['Found', 'Unknown to the sources']
+    assert [csl['title'] for csl in export_csl(entries)] == ['Found', 'Unknown to the sources']
+    assert requested == [['10.1000/found', '10.1000/unknown']]
+
+    with open(repository / '.scidock' / 'metadata.json', encoding='utf-8') as metadata_file:
+        assert set(json.load(metadata_file)) == {'10.1000/cached', '10.1000/found', '10.1000/unknown'}
@@ -5,6 +5,7 @@ import shutil
 from pathlib import Path
 
 import pytest
+from click.testing import CliRunner
 
 from scidock import scidock
 from . import SEARCH_TEST_CASES, SearchTestCase
@@ -41,7 +42,8 @@ def test_repo_init(test_path: Path):
 
     assert config.get('repositories') == {'test_repo': {'path': str(test_path.absolute())}}
     assert config.get('default') == 'test_repo'
-    assert config.get('proxy') == {}
+    assert config.get('proxies') == []
+    assert 'proxy' not in config
 
 
 def test_duplicate_init(test_path: Path):
@@ -71,6 +73,23 @@ def test_init_path_only(tmp_path: Path):
     assert config.get('default') == tmp_path.name
 
 
+def test_proxy_configuration_keeps_legacy_setting(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    config_path = tmp_path / '.scidock' / 'config.json'
+    config_path.parent.mkdir()
+    legacy_proxy = {'type': 'socks5', 'ip': '127.0.0.1', 'port': 1080}
+    config_path.write_text(json.dumps({'proxy': legacy_proxy}), encoding='utf-8')
+
+    # removing an unknown proxy must leave the configuration intact
+    result = CliRunner().invoke(scidock.main, ['config', 'proxy', 'socks5', '127.0.0.1', '1081', '--remove'])
+    assert 'not configured' in result.output
+    assert json.loads(config_path.read_text(encoding='utf-8')) == {'proxy': legacy_proxy}
+
+    CliRunner().invoke(scidock.main, ['config', 'proxy', 'http', '127.0.0.1', '8080', '--add'])
+    assert json.loads(config_path.read_text(encoding='utf-8')) == \
+           {'proxies': [legacy_proxy, {'type': 'http', 'ip': '127.0.0.1', 'port': 8080}]}
+
+
 @pytest.mark.parametrize('test_case', SEARCH_TEST_CASES)
 def test_file_presence(test_case: SearchTestCase):
     test_path = Path('./repo')
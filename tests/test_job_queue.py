@@ -0,0 +1,161 @@
+# ruff: noqa: S101
+
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+
+import pytest
+import requests
+
+from scidock import job_queue
+from scidock.job_queue import (
+    STALE_HEARTBEAT,
+    add_jobs,
+    cancel_jobs,
+    claim_job,
+    connect,
+    finish_job,
+    list_jobs,
+    recover_stale_jobs,
+    release_jobs,
+    run_queue,
+)
+from scidock.pipeline import DownloadOutcome
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> str:
+    (tmp_path / '.scidock').mkdir()
+    return str(tmp_path)
+
+
+@pytest.fixture
+def downloads(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    downloaded = []
+
+    def download_paper(doi: str, proxies=None, title: str | None = None) -> DownloadOutcome:
+        downloaded.append(doi)
+        return DownloadOutcome(True, 'Sci-Hub')
+
+    monkeypatch.setattr(job_queue, 'download_paper', download_paper)
+    monkeypatch.setattr(job_queue, 'backoff_delay', lambda attempt: 0.0)
+    return downloaded
+
+
+def get_states(repository: str) -> dict[str, str]:
+    return {job.doi: job.state for job in list_jobs(repository)}
+
+
+def dead_worker() -> str:
+    # a worker of this machine whose process has already exited
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return f'{socket.gethostname()}:{process.pid}/0'
+
+
+def test_claim_order_and_release(repository: str):
+    add_jobs(repository, [('10.1000/low', None), ('10.1000/high', None)], priority=0)
+    add_jobs(repository, [('10.1000/high', 'High')], priority=5)
+
+    with closing(connect(repository)) as connection:
+        job = claim_job(connection, 'worker/0')
+        assert (job.doi, job.state, job.attempts) == ('10.1000/high', 'running', 1)
+        assert claim_job(connection, 'worker/1').doi == '10.1000/low'
+        assert claim_job(connection, 'worker/2') is None
+
+    # an interrupted run gives its jobs back without spending their attempts
+    release_jobs(repository, 'worker')
+    assert {job.doi: (job.state, job.attempts, job.worker) for job in list_jobs(repository)} == \
+           {'10.1000/high': ('queued', 0, None), '10.1000/low': ('queued', 0, None)}
+
+
+def test_finish_with_backoff(repository: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(job_queue, 'backoff_delay', lambda attempt: 60.0)
+    add_jobs(repository, [('10.1000/flaky', None)], max_attempts=2)
+
+    with closing(connect(repository)) as connection:
+        job = claim_job(connection, 'worker/0')
+        finish_job(connection, job, None, 'ConnectionError()')
+        [queued_job] = list_jobs(repository)
+        assert (queued_job.state, queued_job.last_error) == ('queued', 'ConnectionError()')
+
+        # the job is not due before its backoff has passed
+        assert claim_job(connection, 'worker/0') == queued_job.not_before > time.time()
+        connection.execute('UPDATE jobs SET not_before = 0')
+
+        job = claim_job(connection, 'worker/0')
+        assert job.attempts == 2  # noqa: PLR2004 - second attempt
+        finish_job(connection, job, None, 'ConnectionError()')
+
+    assert get_states(repository) == {'10.1000/flaky': 'failed'}
+
+
+def test_crash_recovery(repository: str):
+    papers = [('10.1000/dead-process', None), ('10.1000/stale-heartbeat', None), ('10.1000/last-attempt', None), ('10.1000/alive', None)]
+    add_jobs(repository, papers[:3], max_attempts=3)
+    add_jobs(repository, papers[3:], max_attempts=1)
+
+    with closing(connect(repository)) as connection:
+        for worker in (dead_worker(), 'another-host:1/0', dead_worker(), f'{socket.gethostname()}:{os.getpid()}/0'):
+            claim_job(connection, worker)
+        connection.execute('UPDATE jobs SET heartbeat = ? WHERE doi = ?', (time.time() - STALE_HEARTBEAT - 1, '10.1000/stale-heartbeat'))
+        connection.execute('UPDATE jobs SET attempts = max_attempts WHERE doi = ?', ('10.1000/last-attempt',))
+
+    assert recover_stale_jobs(repository) == 3  # noqa: PLR2004 - all but the live worker
+    jobs = {job.doi: job for job in list_jobs(repository)}
+    assert {doi: job.state for doi, job in jobs.items()} == {'10.1000/dead-process': 'queued', '10.1000/stale-heartbeat': 'queued',
+                                                              '10.1000/last-attempt': 'failed', '10.1000/alive': 'running'}
+    assert jobs['10.1000/dead-process'].last_error == 'Interrupted'
+    assert jobs['10.1000/dead-process'].attempts == 1
+
+
+def test_completed_jobs_are_never_downloaded_again(repository: str, downloads: list[str]):
+    add_jobs(repository, [('10.1000/a', None), ('10.1000/b', None)])
+
+    assert run_queue(repository, jobs=2)['done'] == 2  # noqa: PLR2004 - both jobs
+    assert sorted(downloads) == ['10.1000/a', '10.1000/b']
+
+    # DOIs are case-insensitive
+    job_ids, completed = add_jobs(repository, [('10.1000/A', None), ('10.1000/c', None)])
+    assert completed == ['10.1000/A']
+    assert len(job_ids) == 1
+
+    run_queue(repository, jobs=2)
+    assert sorted(downloads) == ['10.1000/a', '10.1000/b', '10.1000/c']
+    assert get_states(repository) == {'10.1000/a': 'done', '10.1000/b': 'done', '10.1000/c': 'done'}
+
+
+def test_cancel_during_run(repository: str, monkeypatch: pytest.MonkeyPatch):
+    def download_paper(doi: str, proxies=None, title: str | None = None) -> DownloadOutcome:
+        # the user cancels the job while its download is in progress
+        cancel_jobs(repository)
+        return DownloadOutcome(True, 'Sci-Hub')
+
+    monkeypatch.setattr(job_queue, 'download_paper', download_paper)
+    add_jobs(repository, [('10.1000/cancelled', None), ('10.1000/never-started', None)])
+
+    run_queue(repository, jobs=1)
+    assert get_states(repository) == {'10.1000/cancelled': 'cancelled', '10.1000/never-started': 'cancelled'}
+
+
+def test_failed_attempts_are_retried(repository: str, monkeypatch: pytest.MonkeyPatch):
+    outcomes = [requests.exceptions.ConnectionError('Mirror is down'), DownloadOutcome(False, recommended_url='https://doi.org/10.1000/x'),
+                DownloadOutcome(True, 'publisher')]
+
+    def download_paper(doi: str, proxies=None, title: str | None = None) -> DownloadOutcome:
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(job_queue, 'download_paper', download_paper)
+    monkeypatch.setattr(job_queue, 'backoff_delay', lambda attempt: 0.0)
+    add_jobs(repository, [('10.1000/x', None)], max_attempts=3)
+
+    assert run_queue(repository, jobs=1) == {'failed': 2, 'done': 1}
+    [job] = list_jobs(repository)
+    assert (job.state, job.attempts, job.source, job.last_error) == ('done', 3, 'publisher', None)
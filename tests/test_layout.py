@@ -0,0 +1,68 @@
+# ruff: noqa: S101
+
+import json
+from pathlib import Path
+
+import pytest
+
+from scidock.layout import get_layout, place_paper
+from scidock.sync import migrate_repository
+
+PAPERS = {'paper.pdf': {'title': 'Paper', 'DOI': '10.1000/Paper'}, 'no_doi.pdf': {'title': 'Paper without a DOI', 'DOI': None}}
+
+
+def load_content(repository: Path) -> dict:
+    return json.loads((repository / '.scidock' / 'content.json').read_text(encoding='utf-8'))
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> Path:
+    (tmp_path / '.scidock').mkdir()
+    content = {'local': PAPERS, 'stamps': {'paper.pdf': [1, 2]}, 'recent_searches': {}}
+    (tmp_path / '.scidock' / 'content.json').write_text(json.dumps(content), encoding='utf-8')
+
+    for filename in PAPERS:
+        (tmp_path / filename).write_bytes(f'%PDF-1.7 {filename}'.encode())
+
+    return tmp_path
+
+
+def test_flat_to_sharded_and_back(repository: Path):
+    sharded_paths = {filename: place_paper('sharded', filename, metadata['DOI']) for filename, metadata in PAPERS.items()}
+    # papers with a DOI are sharded by the DOI, the rest by their filename
+    assert sharded_paths['paper.pdf'] == place_paper('sharded', 'paper.pdf', '10.1000/paper')
+    assert sharded_paths['paper.pdf'] != place_paper('sharded', 'paper.pdf', None)
+
+    assert sorted(migrate_repository(str(repository), 'sharded')) == sorted(sharded_paths.values())
+    assert get_layout(str(repository)) == 'sharded'
+    for filename, path in sharded_paths.items():
+        assert (repository / path).read_bytes() == f'%PDF-1.7 {filename}'.encode()
+        assert not (repository / filename).exists()
+
+    content = load_content(repository)
+    assert content['local'] == {sharded_paths[filename]: metadata for filename, metadata in PAPERS.items()}
+    assert content['stamps'] == {sharded_paths['paper.pdf']: [1, 2]}
+
+    # migrating again moves nothing
+    assert migrate_repository(str(repository), 'sharded') == []
+
+    assert sorted(migrate_repository(str(repository), 'flat')) == sorted(PAPERS)
+    assert get_layout(str(repository)) == 'flat'
+    assert load_content(repository)['local'] == PAPERS
+    assert load_content(repository)['stamps'] == {'paper.pdf': [1, 2]}
+    # the emptied shards are removed
+    assert sorted(path.name for path in repository.iterdir()) == ['.scidock', 'no_doi.pdf', 'paper.pdf']
+
+
+def test_existing_destination_is_kept(repository: Path):
+    blocked_path = repository / place_paper('sharded', 'paper.pdf', '10.1000/Paper')
+    blocked_path.parent.mkdir()
+    blocked_path.write_bytes(b'%PDF-1.7 another paper')
+
+    assert migrate_repository(str(repository), 'sharded') == [place_paper('sharded', 'no_doi.pdf', None)]
+
+    # the paper stays where it was, and is recorded there
+    assert (repository / 'paper.pdf').read_bytes() == b'%PDF-1.7 paper.pdf'
+    assert blocked_path.read_bytes() == b'%PDF-1.7 another paper'
+    assert load_content(repository)['local']['paper.pdf'] == PAPERS['paper.pdf']
+    assert get_layout(str(repository)) == 'sharded'
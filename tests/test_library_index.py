@@ -0,0 +1,92 @@
+# ruff: noqa: S101
+
+import json
+from pathlib import Path
+
+import pytest
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from scidock.library import FUZZY_MATCH_RATE, LibraryEntry
+from scidock.library_index import load_index, read_index, search_indexes
+
+TITLES = {
+    'symbolic.pdf': ('Deep Learning for Symbolic Mathematics', '10.48550/arXiv.1912.01412'),
+    'attention.pdf': ('Attention Is All You Need', '10.48550/arXiv.1706.03762'),
+    'folding.pdf': ('Highly accurate protein structure prediction with AlphaFold', '10.1038/s41586-021-03819-2'),
+    'résumé.pdf': ('Résumé of Stochastic Gradient Descent Methods', None),
+    'ising.pdf': ('Topological Insulators and the Quantum Spin Hall Effect', '10.1103/RevModPhys.82.3045'),
+    'graphs.pdf': ('Graph Neural Networks: A Review of Methods and Applications', '10.1016/j.aiopen.2021.01.001'),
+    'sparse.pdf': ('Sparse Representation for Computer Vision and Pattern Recognition', '10.1109/JPROC.2010.2044470'),
+    'diffusion.pdf': ('Denoising Diffusion Probabilistic Models', '10.48550/arXiv.2006.11239'),
+}
+
+QUERIES = ('deep learning symbolic math', 'attention is all you need', 'alphafold protein structure', 'resume of stochastic gradient',
+           'quantum spin hall', 'graph neural netwrks review', 'denoising diffusion', 'sparse representation vision')
+
+
+def make_repository(repository_path: Path, titles: dict[str, tuple[str, str | None]]):
+    (repository_path / '.scidock').mkdir(exist_ok=True)
+    content = {'local': {filename: {'title': title, 'DOI': doi} for filename, (title, doi) in titles.items()}, 'recent_searches': {}}
+    (repository_path / '.scidock' / 'content.json').write_text(json.dumps(content, ensure_ascii=False), encoding='utf-8')
+
+
+def full_scan(query: str, repository_path: str) -> list[tuple[LibraryEntry, float]]:
+    # noinspection PyTypeChecker
+    title_matches = process.extract(query, [title for title, _ in TITLES.values()], scorer=fuzz.WRatio, score_cutoff=FUZZY_MATCH_RATE,
+                                    processor=default_process, limit=1)
+    filenames = list(TITLES)
+    return [(LibraryEntry(repository_path, filenames[index], *TITLES[filenames[index]]), score) for _, score, index in title_matches]
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> str:
+    make_repository(tmp_path, TITLES)
+    return str(tmp_path)
+
+
+def test_index_round_trip(repository: str):
+    built_index = load_index(repository)
+    index_path = Path(repository) / '.scidock' / 'index.bin'
+    assert index_path.exists()
+
+    loaded_index = read_index(repository, index_path)
+    assert loaded_index.stamp == built_index.stamp
+    assert [loaded_index.entry(entry_index) for entry_index in range(len(loaded_index))] == \
+           [LibraryEntry(repository, filename, title, doi) for filename, (title, doi) in TITLES.items()]
+    assert [loaded_index.normalized_titles[entry_index] for entry_index in range(len(loaded_index))] == \
+           [default_process(title) for title, _ in TITLES.values()]
+    assert loaded_index.ngrams == built_index.ngrams
+    assert bytes(loaded_index.postings) == bytes(built_index.postings)
+    assert bytes(loaded_index.postings_offsets) == bytes(built_index.postings_offsets)
+
+
+def test_outdated_index_is_rebuilt(repository: str):
+    load_index(repository)
+    make_repository(Path(repository), TITLES | {'new.pdf': ('A Paper Added Later', '10.1000/new')})
+
+    assert search_indexes('paper added later', None, [load_index(repository)])[0][0].filename == 'new.pdf'
+
+
+def test_corrupted_index_is_rebuilt(repository: str):
+    load_index(repository)
+    index_path = Path(repository) / '.scidock' / 'index.bin'
+    index_path.write_bytes(b'SDIX' + b'\xff' * 64)
+
+    assert len(load_index(repository)) == len(TITLES)
+    assert read_index(repository, index_path) is not None
+
+
+def test_ngram_filter_agrees_with_full_scan(repository: str):
+    index = load_index(repository)
+
+    for query in QUERIES:
+        assert index.find_candidates(default_process(query)) is not None
+        assert search_indexes(query, None, [index]) == full_scan(query, repository), query
+
+
+def test_id_match_takes_precedence(repository: str):
+    index = load_index(repository)
+
+    assert search_indexes('anything', '10.48550/ARXIV.1706.03762', [index]) == \
+           [(LibraryEntry(repository, 'attention.pdf', *TITLES['attention.pdf']), 100.0)]
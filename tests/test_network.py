@@ -0,0 +1,94 @@
+# ruff: noqa: S101
+
+import gc
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scidock import deadline, utils
+from scidock.network import ConcurrencyLimiter, TokenBucket, session
+from scidock.proxy_pool import ProxyPool
+from scidock.search_engines import crossref_engine
+
+BODY_SIZE = 64 * 1024
+SLOTS = 2
+
+
+class BodyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(BODY_SIZE))
+        self.end_headers()
+        self.wfile.write(b'x' * BODY_SIZE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server(monkeypatch: pytest.MonkeyPatch):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), BodyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    limiter = ConcurrencyLimiter(SLOTS)
+    monkeypatch.setattr('scidock.network.concurrency_limiter', limiter)
+
+    yield f'http://127.0.0.1:{server.server_port}/', limiter
+
+    server.shutdown()
+
+
+def free_slots(limiter: ConcurrencyLimiter) -> int:
+    return limiter.semaphores['127.0.0.1']._value
+
+
+def test_streamed_response_holds_slot(local_server):
+    url, limiter = local_server
+
+    response = session.get(url, stream=True, timeout=5)
+    assert free_slots(limiter) == SLOTS - 1
+    response.raw.read()
+    assert free_slots(limiter) == SLOTS
+
+    response = session.get(url, stream=True, timeout=5)
+    response.raw.read(16)
+    response.close()
+    assert free_slots(limiter) == SLOTS
+
+    response = session.get(url, stream=True, timeout=5)
+    response.raw.read(16)
+    del response
+    gc.collect()
+    assert free_slots(limiter) == SLOTS
+
+    session.get(url, timeout=5)
+    assert free_slots(limiter) == SLOTS
+
+
+def test_rate_limit_wait_is_bounded_by_deadline():
+    bucket = TokenBucket(1, 60.0)
+    bucket.acquire()
+
+    deadline.set_deadline(1.0)
+    try:
+        with pytest.raises(deadline.DeadlineExceededError):
+            bucket.acquire()
+    finally:
+        deadline.set_deadline(None)
+
+    # the failed reservation is given back
+    assert bucket.tokens > -1.0
+
+
+def test_crossref_library_builds_urls():
+    assert crossref_engine.engine.query('deep learning').url == 'https://api.crossref.org/works?query=deep+learning'
+
+
+def test_empty_proxy_pool_connects_directly(local_server, monkeypatch: pytest.MonkeyPatch):
+    url, _ = local_server
+
+    assert session.get(url, proxies=ProxyPool([]), timeout=5).status_code == 200  # noqa: PLR2004 - OK
+
+    monkeypatch.setattr(utils, 'get_proxy_pool', lambda: ProxyPool([]))
+    assert utils.get_current_proxy_setting() == {}
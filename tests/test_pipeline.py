@@ -0,0 +1,92 @@
+# ruff: noqa: S101
+
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from scidock import negative_cache, pipeline
+from scidock.negative_cache import lookup_dead_end, record_dead_end
+from scidock.pipeline import prefetch_sources
+from scidock.utils import BoundedCache, single_flight
+
+ARXIV_DOI = '10.48550/arXiv.1912.01412'
+DOI = '10.1000/paper'
+
+
+@pytest.fixture
+def probes(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    # every stage of the speculation just reports that it has been reached
+    probed = []
+    monkeypatch.setattr(negative_cache, 'get_negative_cache_path', lambda: tmp_path / 'negative_cache.json')
+    monkeypatch.setattr(pipeline.storage, 'lookup', lambda doi: probed.append('store'))
+    monkeypatch.setattr(pipeline.arxiv, 'lookup', lambda arxiv_id: probed.append('arXiv'))
+    monkeypatch.setattr(pipeline.crossref, 'lookup_open_access', lambda doi: probed.append('open access'))
+    monkeypatch.setattr(pipeline, 'prefetch_landing_page', lambda doi, proxies: probed.append('publisher'))
+
+    def locate(doi: str, proxies: dict):
+        probed.append('Sci-Hub')
+        record_dead_end('https://sci-hub.ru', doi, 'https://sci-hub.ru has no copy')
+
+    monkeypatch.setattr(pipeline.scihub, 'locate', locate)
+    return probed
+
+
+@pytest.mark.parametrize(('doi', 'stages'), [(ARXIV_DOI, ['store', 'arXiv']), (DOI, ['store', 'open access', 'Sci-Hub', 'publisher'])])
+def test_prefetch_walks_through_the_stages(probes: list[str], doi: str, stages: list[str]):
+    prefetch_sources(doi, None, None, threading.Event())
+    assert probes == stages
+
+
+@pytest.mark.parametrize('doi', [ARXIV_DOI, DOI])
+def test_prefetch_stops_once_cancelled(probes: list[str], monkeypatch: pytest.MonkeyPatch, doi: str):
+    cancelled = threading.Event()
+
+    def lookup(doi: str):
+        # the user moves on while the store is being checked
+        probes.append('store')
+        cancelled.set()
+
+    monkeypatch.setattr(pipeline.storage, 'lookup', lookup)
+    prefetch_sources(doi, None, None, cancelled)
+    assert probes == ['store']
+
+    prefetch_sources(doi, None, None, cancelled)
+    assert probes == ['store']
+
+
+def test_speculative_probes_record_no_dead_ends(probes: list[str]):
+    prefetch_sources(DOI, None, None, threading.Event())
+    assert 'Sci-Hub' in probes
+    assert lookup_dead_end('https://sci-hub.ru', DOI) is None
+
+    # the actual download does record what it finds
+    pipeline.scihub.locate(DOI, {})
+    assert lookup_dead_end('https://sci-hub.ru', DOI) is not None
+
+
+def test_single_flight_releases_key_locks():
+    calls = []
+
+    @single_flight(BoundedCache(16))
+    def resolve(key: str) -> str | None:
+        calls.append(key)
+        if key == 'a':
+            # keeps the first call in flight until the others have joined it
+            time.sleep(0.1)
+        return None if key.startswith('missing') else key.upper()
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(resolve, ['a', 'a', 'a', 'missing'])) == ['A', 'A', 'A', None]
+
+    # concurrent calls share a single one; `None` is not cached, so it is requested again
+    assert calls.count('a') == 1
+    assert resolve('missing') is None
+    assert calls.count('missing') == 2  # noqa: PLR2004 - the second call is not shared
+
+    for index in range(100):
+        resolve(f'missing-{index}')
+    assert inspect.getclosurevars(resolve).nonlocals['key_locks'] == {}
@@ -0,0 +1,67 @@
+# ruff: noqa: S101, I001
+
+import pytest
+import requests
+
+from scidock.parsers import query_parser
+from .nlp_server import start_server
+
+
+@pytest.fixture
+def nlp_server(monkeypatch: pytest.MonkeyPatch):
+    server = start_server()
+    monkeypatch.setattr(query_parser, 'NLP_SERVER', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setattr(query_parser, 'remote_data', query_parser.BoundedCache(query_parser.ANALYSIS_CACHE_SIZE))
+
+    yield server
+
+    server.shutdown()
+
+
+def test_batched_analysis(nlp_server):
+    titles = [f'deep learning for symbolic mathematics, part {i}' for i in range(1000)]
+
+    query_parser.analyze_queries(titles)
+
+    assert nlp_server.request_log == ['/batch_analysis'] * (len(titles) // query_parser.ANALYSIS_BATCH_SIZE)
+    assert query_parser.extract_keywords(titles[0]) == ['deep', 'learning', 'symbolic', 'mathematics', 'part', '0']
+    assert len(nlp_server.request_log) == len(titles) // query_parser.ANALYSIS_BATCH_SIZE  # served from the cache
+
+
+@pytest.mark.parametrize('failures', [{'/batch_analysis': 503}, {'/batch_analysis': 404, '/complex_analysis': 503}],
+                         ids=['batch', 'fallback'])
+def test_server_errors_are_raised(nlp_server, failures: dict[str, int]):
+    nlp_server.failures = failures
+
+    # an error page is reported as such rather than parsed as the analysis
+    with pytest.raises(requests.exceptions.HTTPError, match='503'):
+        query_parser.analyze_queries(['deep learning', 'symbolic mathematics'])
+    assert len(query_parser.remote_data) == 0
+
+
+def test_analysis_of_cleared_query(nlp_server):
+    query = 'deep learning for symbolic mathematics by Guillaume Lample'
+
+    assert query_parser.extract_names(query) == ['Guillaume Lample']
+    assert query_parser.simplify_query(query) == 'deep learning symbolic mathematics'
+    assert nlp_server.request_log == ['/complex_analysis']
+
+
+def test_bounded_analysis_cache(nlp_server, monkeypatch: pytest.MonkeyPatch):
+    cache_size = 10
+    monkeypatch.setattr(query_parser, 'remote_data', query_parser.BoundedCache(cache_size))
+
+    query_parser.analyze_queries([f'query number {i}' for i in range(100)])
+
+    assert len(query_parser.remote_data) == cache_size
+
+
+def test_tokenized_ids(nlp_server):
+    # regex metacharacters in DOIs used to break the removal of the IDs from the query
+    query = 'symbolic mathematics 10.1002/(SICI)1097-4636(199603)31:3 and arXiv.1912.01412v1 by Guillaume Lample'
+
+    assert [span.kind for span in query_parser.tokenize_query(query)] == ['text', 'doi', 'text', 'arxiv_id', 'text']
+    assert query_parser.extract_dois(query) == ['10.1002/(SICI)1097-4636(199603)31:3']
+    assert query_parser.extract_arxiv_ids(query, strict=True) == ['1912.01412v1']
+    assert query_parser.extract_arxiv_ids('10.48550/arXiv.1912.01412', strict=True, allow_overlap=True) == ['1912.01412']
+    assert query_parser.clear_query(query).split() == ['symbolic', 'mathematics', 'and', 'by']
@@ -0,0 +1,50 @@
+# ruff: noqa: S101
+
+from types import SimpleNamespace
+
+import arxiv
+import pytest
+import requests
+
+from scidock import resolver
+from scidock.deadline import DeadlineExceededError
+from scidock.resolver import Resolution, resolve_titles
+
+TITLES = {
+    'Deep Learning for Symbolic Mathematics': [SimpleNamespace(title='Deep Learning for Symbolic Mathematics', DOI='10.1000/found')],
+    'Unreachable CrossRef': requests.exceptions.ConnectionError('CrossRef is down'),
+    'Out of time': DeadlineExceededError('The time budget of the command has run out'),
+    'Nothing similar': [SimpleNamespace(title='Completely different paper', DOI='10.1000/other')],
+}
+
+
+def search(results: dict):
+    def search_engine(title: str):
+        result = results[title]
+        if isinstance(result, Exception):
+            raise result
+        return iter(result)
+
+    return search_engine
+
+
+@pytest.fixture
+def engines(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(resolver, 'analyze_queries', lambda titles: None)
+    monkeypatch.setattr(resolver.crossref, 'search', search(TITLES))
+    monkeypatch.setattr(resolver.arxiv, 'search',
+                        search({'Nothing similar': arxiv.ArxivError('https://export.arxiv.org', 3, 'Page empty')}))
+
+
+def test_failures_do_not_abort_the_batch(engines):
+    resolutions = list(resolve_titles(TITLES, 0.9, 2))
+
+    assert [resolution.title for resolution in resolutions] == list(TITLES)
+    assert resolutions[0] == Resolution('Deep Learning for Symbolic Mathematics', '10.1000/found',
+                                        'Deep Learning for Symbolic Mathematics', 1.0)
+    assert resolutions[1].DOI is None
+    assert resolutions[1].reason.startswith('ConnectionError')
+    assert resolutions[2].DOI is None
+    assert resolutions[2].reason.startswith('DeadlineExceededError')
+    assert resolutions[3].DOI is None
+    assert resolutions[3].reason.startswith('ArxivError')
@@ -0,0 +1,143 @@
+# ruff: noqa: S101
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pytest
+
+from scidock import negative_cache
+from scidock.negative_cache import DAY, lookup_dead_end, record_dead_end
+from scidock.search_engines import scihub_engine
+from scidock.search_engines.scihub_engine import MirrorCopy, locate
+from scidock.utils import filename_from_metadata
+
+MIRROR = 'https://sci-hub.ru'
+DOI = '10.1000/paper'
+
+FOUND_PAGE = ("<html><div id='buttons'><button onclick=\"location.href='//cdn.sci-hub.ru/paper.pdf'\">save</button></div>"
+              "<div id='citation'><i>Paper Title</i></div></html>")
+MISSING_PAGE = "<html><p id='smile'>:(</p><p>Unfortunately, Sci-Hub doesn't have the requested document:</p></html>"
+SCIDB_MIRROR = 'https://annas-archive.se/scidb'
+SCIDB_MISSING_PAGE = f"<html><div class='text-xl'>SciDB</div><p>Not found: “{DOI}”</p></html>"
+# "not found" turns up in text that has nothing to do with the paper
+SCIDB_UNRELATED_PAGE = ("<html><p>Checking your browser before accessing the archive.</p>"
+                        f"<footer>Link not found or broken? Report it along with {DOI}.</footer></html>")
+CAPTCHA_PAGE = "<html><form><img src='/captcha.png'><input name='answer'></form></html>"
+
+
+@dataclass
+class FakeResponse:
+    status_code: int
+    text: str = ''
+    headers: dict = field(default_factory=dict)
+    encoding: str = 'utf-8'
+
+    def iter_content(self, chunk_size: int):
+        content = self.text.encode()
+        for start in range(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def negative_cache_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / 'negative_cache.json'
+    monkeypatch.setattr(negative_cache, 'get_negative_cache_path', lambda: path)
+    return path
+
+
+@pytest.fixture
+def mirror_response(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(scihub_engine, 'SCIHUB_MIRRORS', [MIRROR])
+    monkeypatch.setattr(scihub_engine, 'SCIDB_MIRRORS', [])
+
+    def respond_with(response: FakeResponse):
+        monkeypatch.setattr(scihub_engine.session, 'get', lambda url, **kwargs: response)
+
+    return respond_with
+
+
+def test_found_copy_is_located(mirror_response):
+    mirror_response(FakeResponse(200, FOUND_PAGE))
+
+    try:
+        assert locate(DOI, {}) == MirrorCopy('https://cdn.sci-hub.ru/paper.pdf', filename_from_metadata(DOI, 'Paper Title'), 'Paper Title')
+        assert lookup_dead_end(MIRROR, DOI) is None
+    finally:
+        scihub_engine.located_copies.discard(DOI)
+
+
+def test_located_copy_is_used_once(mirror_response, monkeypatch: pytest.MonkeyPatch):
+    requested, saved = [], []
+
+    def get(url: str, **kwargs) -> FakeResponse:
+        requested.append(url)
+        return FakeResponse(200, FOUND_PAGE)
+
+    monkeypatch.setattr(scihub_engine.session, 'get', get)
+    monkeypatch.setattr(scihub_engine, 'save_file_to_repo', lambda download_link, *args: saved.append(download_link) or True)
+
+    # the copy located while the paper was highlighted is downloaded, but the next download locates it again
+    locate(DOI, {})
+    assert scihub_engine.download(DOI)
+    assert scihub_engine.download(DOI)
+    assert requested == [f'{MIRROR}/{DOI}'] * 2
+    assert saved == ['https://cdn.sci-hub.ru/paper.pdf'] * 2
+    assert DOI not in scihub_engine.located_copies
+
+
+def test_missing_copy_is_recorded(mirror_response):
+    mirror_response(FakeResponse(200, MISSING_PAGE))
+
+    assert locate(DOI, {}) is None
+    assert lookup_dead_end(MIRROR, DOI)['reason'] == f'{MIRROR} has no copy'
+
+
+@pytest.mark.parametrize(('page', 'recorded'), [(SCIDB_MISSING_PAGE, True), (SCIDB_UNRELATED_PAGE, False)], ids=['missing', 'unrelated'])
+def test_scidb_missing_copy(monkeypatch: pytest.MonkeyPatch, page: str, recorded: bool):
+    monkeypatch.setattr(scihub_engine, 'SCIHUB_MIRRORS', [])
+    monkeypatch.setattr(scihub_engine, 'SCIDB_MIRRORS', [SCIDB_MIRROR])
+    monkeypatch.setattr(scihub_engine.session, 'get', lambda url, **kwargs: FakeResponse(200, page))
+
+    assert locate(DOI, {}) is None
+    assert (lookup_dead_end(SCIDB_MIRROR, DOI) is not None) is recorded
+
+
+@pytest.mark.parametrize('response', [
+    FakeResponse(302, headers={'Location': 'https://sci-hub.ru/'}),
+    FakeResponse(200, CAPTCHA_PAGE),
+    FakeResponse(503, '<html>Service Unavailable</html>'),
+    # an error page that happens to contain the message
+    FakeResponse(404, MISSING_PAGE),
+    # the body was cut right after the download button
+    FakeResponse(200, FOUND_PAGE[:FOUND_PAGE.index('<div id=')]),
+], ids=['redirect', 'captcha', 'server error', 'error page', 'partial body'])
+def test_inconclusive_pages_are_not_recorded(mirror_response, response: FakeResponse, negative_cache_path: Path):
+    mirror_response(response)
+
+    assert locate(DOI, {}) is None
+    assert lookup_dead_end(MIRROR, DOI) is None
+    assert not negative_cache_path.exists()
+
+
+def test_dead_ends_expire(monkeypatch: pytest.MonkeyPatch, negative_cache_path: Path):
+    now = 1_000_000.0
+    monkeypatch.setattr(negative_cache.time, 'time', lambda: now)
+
+    record_dead_end(MIRROR, DOI, 'no copy')
+    record_dead_end('publisher', DOI, 'no open access')
+    assert lookup_dead_end(MIRROR, DOI.upper())['reason'] == 'no copy'
+
+    # publishers change their pages more often than mirrors get new papers
+    now += 3 * DAY
+    assert lookup_dead_end('publisher', DOI) is None
+    assert lookup_dead_end(MIRROR, DOI) is not None
+
+    now += 4 * DAY
+    assert lookup_dead_end(MIRROR, DOI) is None
+
+    # expired entries are dropped on the next write
+    record_dead_end(MIRROR, '10.1000/other', 'no copy')
+    assert negative_cache_path.read_text(encoding='utf-8').count(DOI) == 0
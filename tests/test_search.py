@@ -1,16 +1,29 @@
 # ruff: noqa: S101, I001
 
 import re
+import time
 from pathlib import Path
 
 import pexpect
 import pytest
 
-from scidock import scidock
+from scidock import deadline, scidock
+from scidock.parsers import query_parser
+from scidock.search_engines.arxiv_engine import ArXivItem
+from scidock.search_engines.crossref_engine import CrossRefItem
 from . import SEARCH_TEST_CASES, SearchTestCase
 
 # source: https://stackoverflow.com/questions/14693701/how-can-i-remove-the-ansi-escape-sequences-from-a-string-in-python
 ANSI_ESCAPE_PATTERN = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+# a rendered choice, either highlighted or not; separators are made of dashes only
+CHOICE_PATTERN = re.compile(r'^ [\u276f ] (?!-+$)(\S.*)$')
+
+
+def read_choices(process: pexpect.spawn) -> list[str]:
+    # the settled prompt renders the whole first screen at once
+    process.expect(pexpect.TIMEOUT, timeout=1)
+    screen = re.sub(ANSI_ESCAPE_PATTERN, '', process.before.decode()).replace('\r', '')
+    return [match.group(1) for match in map(CHOICE_PATTERN.match, screen.split('\n')) if match is not None]
 
 
 @pytest.fixture(scope='session')
@@ -22,12 +35,17 @@ def _init_repo():
 @pytest.mark.parametrize('test_case', SEARCH_TEST_CASES)
 def test_search_tui(test_case: SearchTestCase):
     query = test_case.query
-    step = test_case.position - 1
     expected_title = test_case.title
 
-    process = pexpect.spawn(f'scidock search "{query}"')
+    # the prompt opens with the first result and is filled in live, so the keys are sent only once all of the results are in place
+    process = pexpect.spawn(f'scidock search "{query}" --settled', dimensions=(200, 1000))
     process.expect('Choose the suitable paper to add to your library')
-    process.send(b'\x1b[B' * step + b'\x0d')
+
+    # the order of the results depends on the re-ranking, so the paper is looked up by its title rather than by a fixed offset
+    choices = read_choices(process)
+    assert expected_title in choices
+    # scrolling past the first screen pulls more results from the engines, and scrolling back returns to the same paper
+    process.send(b'\x1b[B' * (choices.index(expected_title) + test_case.scroll) + b'\x1b[A' * test_case.scroll + b'\x0d')
     process.expect(pexpect.EOF)
 
     response = process.before.decode()
@@ -48,3 +66,83 @@ def test_nonsensical_inputs():
     response = process.before.decode()
 
     assert 'Nothing found! :(' in response
+
+
+def test_search_window_reranking(monkeypatch: pytest.MonkeyPatch):
+    # only the IDs are removed from the query, the names are left to the NLP server
+    monkeypatch.setattr(scidock, 'clear_query', lambda query: query_parser.join_text(query_parser.tokenize_query(query)))
+
+    crossref_window = [CrossRefItem('Unrelated work on soft drinks', '10.1000/a', 100.0),
+                       CrossRefItem('Symbolic mathematics in education', '10.1000/b', 50.0),
+                       CrossRefItem('Deep Learning for Symbolic Mathematics', '10.1000/c', 40.0)]
+    arxiv_window = [ArXivItem('Deep learning for symbolic mathematics', '1912.01412'),
+                    ArXivItem('Learning to prove theorems', '2001.00001')]
+
+    ranked_window = scidock.rerank_search_window('deep learning for symbolic mathematics', crossref_window, arxiv_window)
+    ranked_dois = [result.DOI for result, _ in ranked_window]
+    scores = dict(zip(ranked_dois, (score for _, score in ranked_window), strict=True))
+
+    # an exact title match blends the full similarity with the relevance of the engine: its rank for arXiv, its score for CrossRef
+    assert ranked_dois[:3] == ['10.48550/arXiv.1912.01412', '10.1000/c', '10.1000/b']
+    assert scores['10.48550/arXiv.1912.01412'] == pytest.approx(1.0)
+    assert scores['10.1000/c'] == pytest.approx(scidock.SIMILARITY_WEIGHT + (1 - scidock.SIMILARITY_WEIGHT) * 0.4)
+    # the most relevant result of CrossRef is outranked by the titles that resemble the query
+    assert scores['10.1000/a'] < scores['10.1000/b']
+
+    ranked_window = scidock.rerank_search_window('deep learning for symbolic mathematics 10.1000/a', crossref_window, arxiv_window)
+    assert [result.DOI for result, _ in ranked_window][:3] == ['10.1000/a', '10.48550/arXiv.1912.01412', '10.1000/c']
+
+
+def test_prompt_is_not_timed(monkeypatch: pytest.MonkeyPatch):
+    def crossref_search(query: str):
+        yield CrossRefItem('Deep Learning for Symbolic Mathematics', '10.1000/c', 40.0)
+        # the rest of the results arrives only after the budget of the search is spent
+        time.sleep(0.5)
+        yield CrossRefItem('Symbolic mathematics in education', '10.1000/b', 50.0)
+
+    prompt = {}
+
+    def select(message: str, choices: tuple, pointer: str):
+        def ask():
+            search_prefix, search_results, _ = choices
+            prompt.update(remaining=deadline.remaining(), prefix=search_prefix.snapshot(), rest=list(search_results))
+
+        return type('Question', (), {'ask': staticmethod(ask)})
+
+    monkeypatch.setattr(scidock, 'clear_query', lambda query: query)
+    monkeypatch.setattr(scidock.crossref, 'search', crossref_search)
+    monkeypatch.setattr(scidock.arxiv, 'search', lambda query, extended: iter(()))
+    monkeypatch.setattr(scidock.questionary, 'select', select)
+
+    scidock.search('deep learning for symbolic mathematics', False, False, False, deadline=0.2, settled=True)
+    # lets the late result reach the collector, which must leave the finished prompt alone
+    time.sleep(0.5)
+
+    # neither the user nor the speculation over the highlighted paper is hurried by the budget of the search
+    assert prompt['remaining'] is None
+    assert [choice for choice in prompt['prefix'] if isinstance(choice, str)] == \
+           ['Deep Learning for Symbolic Mathematics. DOI: 10.1000/c']
+    assert prompt['rest'] == []
+
+
+def test_unexpected_engine_failures_are_logged(monkeypatch: pytest.MonkeyPatch):
+    def crossref_results():
+        # a malformed item of CrossRef
+        raise KeyError('title')
+        yield
+
+    monkeypatch.setattr(scidock, 'clear_query', lambda query: query)
+    arxiv_results = iter([ArXivItem('Deep learning', '1912.01412')])
+    messages = []
+    handler_id = scidock.logger.add(messages.append, level='ERROR', format='{message}\n{exception}')
+    try:
+        live_results, _ = scidock.split_search_results('deep learning', arxiv_results, crossref_results())
+        assert live_results.finished.wait(5)
+    finally:
+        scidock.logger.remove(handler_id)
+
+    # the other engine is not affected, and the failure is not swallowed
+    assert live_results.snapshot() == ['Deep learning. DOI: 10.48550/arXiv.1912.01412']
+    assert len(messages) == 1
+    assert messages[0].startswith('CrossRef search failed unexpectedly')
+    assert "KeyError: 'title'" in messages[0]
@@ -0,0 +1,86 @@
+# ruff: noqa: S101
+
+import tempfile
+from pathlib import Path
+
+import pytest
+
+from scidock import storage
+from scidock.storage import StoredPaper, add_blob, get_blob_path, hash_file, link_blob, lookup, register
+
+PAPER = b'%PDF-1.7 paper'
+DOI = '10.1000/Paper'
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    # the store lives in ~/.scidock/store
+    monkeypatch.setenv('HOME', str(tmp_path))
+    return tmp_path
+
+
+def download(content: bytes) -> Path:
+    # like `utils.save_file_to_repo`, which streams into the temporary directory of the store
+    with tempfile.NamedTemporaryFile('wb', dir=storage.get_temporary_path(), suffix='.part', delete=False) as paper_file:
+        paper_file.write(content)
+    return Path(paper_file.name)
+
+
+def test_same_content_is_stored_once():
+    first_download, second_download = download(PAPER), download(PAPER)
+
+    digest = add_blob(first_download)
+    assert add_blob(second_download) == digest
+    assert not first_download.exists()
+    assert not second_download.exists()
+
+    assert get_blob_path(digest).read_bytes() == PAPER
+    assert len(list(get_blob_path(digest).parent.iterdir())) == 1
+
+
+def test_linking_into_repositories(home: Path):
+    digest = add_blob(download(PAPER))
+    register(DOI, digest, 'Paper', 'paper.pdf')
+    destinations = [home / 'first' / 'paper.pdf', home / 'second' / 'papers' / 'paper.pdf']
+
+    for destination in destinations:
+        link_blob(digest, destination)
+        assert destination.read_bytes() == PAPER
+
+    # linking again leaves the copy alone
+    inode = destinations[0].stat().st_ino
+    link_blob(digest, destinations[0])
+    assert destinations[0].stat().st_ino == inode
+
+    assert lookup(DOI.upper()) == StoredPaper(digest, 'Paper', 'paper.pdf')
+
+
+def test_different_file_is_replaced(home: Path):
+    digest = add_blob(download(PAPER))
+    destination = home / 'repository' / 'paper.pdf'
+    destination.parent.mkdir()
+    destination.write_bytes(b'<html>Error page</html>')
+
+    link_blob(digest, destination)
+    assert destination.read_bytes() == PAPER
+    assert get_blob_path(digest).read_bytes() == PAPER
+
+
+def test_modified_blob_is_not_served(home: Path, monkeypatch: pytest.MonkeyPatch):
+    # a hardlinked copy, as on filesystems without reflinks
+    monkeypatch.setattr(storage, '_reflink', lambda source, destination: False)
+    digest = add_blob(download(PAPER))
+    register(DOI, digest, 'Paper', 'paper.pdf')
+    destination = home / 'repository' / 'paper.pdf'
+    link_blob(digest, destination)
+
+    with open(destination, 'ab') as annotated_copy:
+        annotated_copy.write(b' annotations')
+
+    assert lookup(DOI) is None
+
+    # the next download puts the original back into the store, while the annotated copy is kept
+    assert add_blob(download(PAPER)) == digest
+    assert hash_file(get_blob_path(digest)) == digest
+    assert destination.read_bytes() == PAPER + b' annotations'
+    assert lookup(DOI) is not None
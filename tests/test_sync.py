@@ -0,0 +1,75 @@
+# ruff: noqa: S101
+
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from scidock.search_engines.metadata import Metadata
+from scidock.sync import SyncReport, extract_pdf_metadata, sync_repository
+
+DOWNLOADED_METADATA = {'title': 'Deep Learning for Symbolic Mathematics', 'DOI': '10.48550/arXiv.1912.01412'}
+
+
+def make_pdf(path: Path, title: str, doi: str | None = None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doi_line = f'/Subject (doi:{doi} published online)\n' if doi is not None else ''
+    path.write_bytes(f'%PDF-1.7\n1 0 obj\n<< /Title ({title})\n{doi_line}>>\nendobj\n%%EOF\n'.encode('latin-1'))
+
+
+def load_content(repository: Path) -> dict:
+    with open(repository / '.scidock' / 'content.json', encoding='utf-8') as content_file:
+        return json.load(content_file)
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> Path:
+    (tmp_path / '.scidock').mkdir()
+    content = {'local': {'downloaded.pdf': DOWNLOADED_METADATA, 'gone.pdf': {'title': 'Gone', 'DOI': '10.1000/gone'}},
+               'recent_searches': {}}
+    (tmp_path / '.scidock' / 'content.json').write_text(json.dumps(content), encoding='utf-8')
+
+    # the title embedded by the publisher is ignored for the papers downloaded by scidock
+    make_pdf(tmp_path / 'downloaded.pdf', 'Embedded title')
+    make_pdf(tmp_path / 'manual.pdf', 'Manually Added Paper', '10.1000/manual')
+    make_pdf(tmp_path / 'ab' / 'sharded.pdf', 'Sharded Paper')
+    (tmp_path / 'notes.txt').write_text('not a paper', encoding='utf-8')
+
+    return tmp_path
+
+
+def test_extract_pdf_metadata(tmp_path: Path):
+    make_pdf(tmp_path / 'paper.pdf', r'Escaped \(parentheses\)', '10.1000/paper.')
+    assert extract_pdf_metadata(tmp_path / 'paper.pdf') == Metadata('Escaped (parentheses)', '10.1000/paper')
+
+    (tmp_path / '1912.01412.Deep_Learning.pdf').write_bytes(b'%PDF-1.7\n%%EOF\n')
+    assert extract_pdf_metadata(tmp_path / '1912.01412.Deep_Learning.pdf') == Metadata('Deep Learning', '10.48550/arXiv.1912.01412')
+
+
+def test_sync_repository(repository: Path):
+    report = sync_repository(str(repository))
+    assert sorted(report.added) == ['ab/sharded.pdf', 'manual.pdf']
+    assert (report.removed, report.updated) == (['gone.pdf'], [])
+
+    local_content = load_content(repository)['local']
+    assert local_content == {
+        'downloaded.pdf': DOWNLOADED_METADATA,
+        'manual.pdf': {'title': 'Manually Added Paper', 'DOI': '10.1000/manual'},
+        'ab/sharded.pdf': {'title': 'Sharded Paper', 'DOI': None},
+    }
+
+    # nothing has changed since the last synchronization
+    assert sync_repository(str(repository)) == SyncReport()
+
+    with open(repository / 'downloaded.pdf', 'ab') as paper_file:
+        paper_file.write(b'% incremental update\n')
+    stat = (repository / 'downloaded.pdf').stat()
+    os.utime(repository / 'downloaded.pdf', ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    (repository / 'manual.pdf').unlink()
+
+    assert sync_repository(str(repository)) == SyncReport(removed=['manual.pdf'], updated=['downloaded.pdf'])
+
+    content = load_content(repository)
+    assert content['local']['downloaded.pdf'] == DOWNLOADED_METADATA
+    assert set(content['stamps']) == {'downloaded.pdf', 'ab/sharded.pdf'}
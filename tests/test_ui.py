@@ -0,0 +1,57 @@
+# ruff: noqa: S101
+
+from itertools import count
+
+from scidock.ui import IterativeInquirerControl, LiveChoices
+
+CAPACITY = 14  # a window of 20 choices
+
+
+def get_values(control: IterativeInquirerControl) -> list[str]:
+    return [choice.value for choice in control.choices]
+
+
+def test_live_choices_hand_over_to_the_stream():
+    live_choices = LiveChoices(CAPACITY)
+    live_choices.update(['a', 'b'])
+    pulled = []
+    stream = (pulled.append(index) or f'paper {index}' for index in count())
+
+    control = IterativeInquirerControl((live_choices, stream))
+    assert control.WINDOW_SIZE == 20  # noqa: PLR2004
+    assert get_values(control) == ['a', 'b']
+    # the engines are still filling their windows, so the rest of the results is not touched yet
+    assert control.continuation_stream is None
+    assert not pulled
+
+    # the highlighted paper keeps the cursor when the engines finish with a new ordering
+    live_choices.update(['b', 'a', 'c'])
+    live_choices.finish()
+    assert control.continuation_stream is stream
+    assert control.get_pointed_at().value == 'a'
+    assert get_values(control) == ['b', 'a', 'c'] + [f'paper {index}' for index in range(17)]
+
+    # past the first window, the results are fetched one by one
+    for _ in range(30):
+        control.select_next()
+    assert control.get_pointed_at().value == 'paper 28'
+    assert len(pulled) == 48  # noqa: PLR2004 - a window ahead of the cursor
+
+    for _ in range(30):
+        control.select_previous()
+    assert control.get_pointed_at().value == 'a'
+    assert len(pulled) == 48  # noqa: PLR2004 - nothing is fetched again
+
+
+def test_short_results_wrap_around():
+    live_choices = LiveChoices(CAPACITY)
+    live_choices.update(['a', 'b'])
+    live_choices.finish()
+
+    control = IterativeInquirerControl((live_choices, iter(['c'])))
+    assert control.continuation_stream is None
+    assert get_values(control) == ['a', 'b', 'c']
+
+    for _ in range(4):
+        control.select_next()
+    assert control.get_pointed_at().value == 'b'
@@ -0,0 +1,84 @@
+# ruff: noqa: S101
+
+from dataclasses import dataclass, field
+
+import pytest
+
+from scidock.parsers import web_parser
+from scidock.parsers.web_parser import LandingPage, download_from_landing, find_publisher
+
+
+@dataclass
+class FakeResponse:
+    url: str
+    text: str = ''
+    headers: dict = field(default_factory=lambda: {'Content-Type': 'text/html'})
+    closed: bool = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_landing(doi: str, response: FakeResponse) -> LandingPage:
+    landing = LandingPage(doi, {})
+    landing._response = response
+    return landing
+
+
+@pytest.fixture
+def saved_files(monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, str, str]]:
+    saved = []
+
+    def save_file_to_repo(download_link: str, filename: str, doi: str, title: str, caller_id: str, proxies=None) -> bool:
+        saved.append((download_link, title, caller_id))
+        return True
+
+    monkeypatch.setattr(web_parser, 'save_file_to_repo', save_file_to_repo)
+    return saved
+
+
+def test_find_publisher():
+    assert find_publisher(doi='10.3390/math11010001').name == 'MDPI'
+    assert find_publisher(doi='10.48550/arXiv.1912.01412').name == 'arXiv'
+    assert find_publisher(domain='ieee.org').name == 'IEEE'
+    assert find_publisher(doi='10.1016/j.ipm.2005.12.001') is None
+    assert find_publisher(domain='example.com') is None
+
+
+def test_prefix_dispatch_skips_landing_page(saved_files):
+    # the arXiv handler does not need the landing page, so it must not be requested at all
+    landing = LandingPage('10.48550/arXiv.1912.01412', {})
+
+    assert download_from_landing('10.48550/arXiv.1912.01412', 'Deep Learning for Symbolic Mathematics', landing, {}) == \
+           (True, 'https://arxiv.org/pdf/1912.01412')
+    assert saved_files == [('https://arxiv.org/pdf/1912.01412', 'Deep Learning for Symbolic Mathematics', 'arXiv')]
+    assert landing._response is None
+
+
+def test_prefix_dispatch_without_page_title(saved_files):
+    doi = '10.3390/math11010001'
+    landing = make_landing(doi, FakeResponse('https://www.mdpi.com/2227-7390/11/1/1', '<html><h2>No title here</h2></html>'))
+
+    assert download_from_landing(doi, None, landing, {}) == (True, 'https://www.mdpi.com/2227-7390/11/1/1/pdf')
+    assert saved_files == [('https://www.mdpi.com/2227-7390/11/1/1/pdf', doi, 'MDPI')]
+
+
+def test_domain_dispatch_after_redirect(saved_files):
+    # the DOI prefix is unknown, but the page it redirects to belongs to a registered publisher
+    doi = '10.1234/chapter.1'
+    landing = make_landing(doi, FakeResponse('https://www.intechopen.com/chapters/42',
+                                             '<html><h1 class="title"> Chapter title </h1></html>'))
+
+    assert download_from_landing(doi, None, landing, {}) == (True, 'https://www.intechopen.com/chapter/pdf-download/42')
+    assert saved_files == [('https://www.intechopen.com/chapter/pdf-download/42', 'Chapter title', 'IntechOpen')]
+
+
+def test_landing_page_is_closed(saved_files):
+    doi = '10.3390/math11010001'
+    response = FakeResponse('https://www.mdpi.com/2227-7390/11/1/1', '<html><h1 class="title">Title</h1></html>')
+    # as if the page has been prefetched, see `pipeline.SourceSpeculator`
+    web_parser.landing_pages.put(doi, make_landing(doi, response))
+
+    assert web_parser.attempt_download(doi) == (True, 'https://www.mdpi.com/2227-7390/11/1/1/pdf')
+    assert response.closed
+    assert doi not in web_parser.landing_pages